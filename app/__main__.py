@@ -1,8 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from app.routers import migrate_saphana_to_snowflake
+from app.utils.metrics import render_metrics
 
 
 app = FastAPI(title="SAP HANA to Snowflake Migration")
@@ -23,6 +24,12 @@ app.include_router(migrate_saphana_to_snowflake.router,
 def root():
     return {"message": "Welcome to SAP HANA to Snowflake migration tool"}
 
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 def main():
     uvicorn.run("app.__main__:app", host="0.0.0.0", reload=False, workers=4)
 
@@ -1,2 +1,81 @@
-from app.config.env_loader import get_env_variable, API_KEY, AWS_ACCESS_KEY_ID, S3_BUCKET_NAME, S3_BUCKET_PATH, S3_REGION , AWS_SECRET_ACCESS_KEY, APP_NAME, PRESIGNED_URL_EXPIRY, WEBAPP_USERNAME, WEBAPP_PASSWORD, WEBAPP_REMEMBERME, WEBAPP_AUTH_URL, WEBAPP_URL
-from app.config.redis_config import redis_client
+from app.config.env_loader import (
+    get_env_variable,
+    API_KEY,
+    AWS_ACCESS_KEY_ID,
+    S3_BUCKET_NAME,
+    S3_BUCKET_PATH,
+    S3_REGION,
+    S3_ENDPOINT_URL,
+    S3_READ_BLOCK_SIZE,
+    S3_READ_CACHE_BYTES,
+    S3_UPLOAD_PART_SIZE,
+    S3_UPLOAD_CONCURRENCY,
+    S3_MAX_POOL_CONNECTIONS,
+    AWS_SECRET_ACCESS_KEY,
+    APP_NAME,
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_ASYNC,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_RATES,
+    LOG_MAX_MESSAGE_LENGTH,
+    LOG_PAYLOADS,
+    LOG_MAX_PAYLOAD_LENGTH,
+    PRESIGNED_URL_EXPIRY,
+    WEBAPP_USERNAME,
+    WEBAPP_PASSWORD,
+    WEBAPP_REMEMBERME,
+    WEBAPP_AUTH_URL,
+    WEBAPP_URL,
+    WEBAPP_TOKEN_TTL,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_TIMEOUT,
+    MIGRATION_CONCURRENCY,
+    CONVERSION_CACHE_ENABLED,
+    CONVERSION_CACHE_TTL,
+    CONVERSION_CACHE_MAX_ENTRIES,
+    CONVERSION_CACHE_DIR,
+    CONVERSION_CACHE_DISK_MAX_BYTES,
+    LOCAL_VIEW_TRANSLATOR_ENABLED,
+    LOCAL_SCHEMA_TRANSLATOR_ENABLED,
+    VIEW_CHUNKING_ENABLED,
+    VIEW_CHUNK_MIN_NODES,
+    VIEW_CHUNK_CONCURRENCY,
+    LLM_MODEL_TIERS,
+    HEDGING_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_WINDOW,
+    HEDGE_BUDGET_RATIO,
+    HEDGE_BUDGET_MIN,
+    PACKING_ENABLED,
+    PACKING_MAX_MEMBER_BYTES,
+    PACKING_TOKEN_BUDGET,
+    PACKING_MAX_WAIT,
+    SQL_REWRITE_ENABLED,
+    SQL_REWRITE_RULES,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_STREAMING_ENABLED,
+    LLM_STREAM_PREAMBLE_LIMIT,
+    LLM_MALFORMED_RETRIES,
+    WORKER_PROCESSES,
+    WORKER_CONCURRENCY,
+    SCHEDULER_MAX_CONCURRENCY,
+    JOB_VISIBILITY_TIMEOUT,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF,
+    JOB_RESULT_TTL,
+    STATUS_FLUSH_INTERVAL,
+    JOB_POLL_INTERVAL,
+    CHECKPOINT_TTL,
+    PROMETHEUS_MULTIPROC_DIR,
+    TRACING_ENABLED,
+)
+from app.config.redis_config import async_redis_client
+from app.config.s3_config import s3_client
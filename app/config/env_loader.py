@@ -14,6 +14,19 @@ def get_env_variable(key: str, default_value: str = None) -> str:
     return os.getenv(key, default_value)
 
 APP_NAME = get_env_variable("APP_NAME", "My FastAPI Application")
+LOG_LEVEL = get_env_variable("LOG_LEVEL", "DEBUG").upper()
+# "text" or "json" (one JSON object per line).
+LOG_FORMAT = get_env_variable("LOG_FORMAT", "text").lower()
+# Write log records from a background thread instead of the logging thread.
+LOG_ASYNC = get_env_variable("LOG_ASYNC", "true").lower() == "true"
+LOG_QUEUE_SIZE = int(get_env_variable("LOG_QUEUE_SIZE", 10000))
+# Per-level sample rates, e.g. "DEBUG=0.1,INFO=0.5"; other levels are kept.
+LOG_SAMPLE_RATES = get_env_variable("LOG_SAMPLE_RATES", "")
+LOG_MAX_MESSAGE_LENGTH = int(get_env_variable("LOG_MAX_MESSAGE_LENGTH", 4000))
+# Log prompts and completions in full instead of their first
+# LOG_MAX_PAYLOAD_LENGTH characters.
+LOG_PAYLOADS = get_env_variable("LOG_PAYLOADS", "false").lower() == "true"
+LOG_MAX_PAYLOAD_LENGTH = int(get_env_variable("LOG_MAX_PAYLOAD_LENGTH", 500))
 VERSION = get_env_variable("VERSION", "0.1.0")
 API_KEY = get_env_variable("API_KEY")
 AWS_ACCESS_KEY_ID = get_env_variable("AWS_ACCESS_KEY_ID")
@@ -21,9 +34,92 @@ AWS_SECRET_ACCESS_KEY = get_env_variable("AWS_SECRET_ACCESS_KEY")
 S3_REGION = get_env_variable("S3_REGION", "")
 S3_BUCKET_PATH= get_env_variable("S3_BUCKET_PATH", "")
 S3_BUCKET_NAME = get_env_variable("S3_BUCKET_NAME")
+S3_ENDPOINT_URL = get_env_variable("S3_ENDPOINT_URL")
+S3_READ_BLOCK_SIZE = int(get_env_variable("S3_READ_BLOCK_SIZE", 1024 * 1024))
+S3_READ_CACHE_BYTES = int(get_env_variable(
+    "S3_READ_CACHE_BYTES", 64 * 1024 * 1024))
+S3_UPLOAD_PART_SIZE = int(get_env_variable(
+    "S3_UPLOAD_PART_SIZE", 8 * 1024 * 1024))
+S3_UPLOAD_CONCURRENCY = int(get_env_variable("S3_UPLOAD_CONCURRENCY", 4))
+S3_MAX_POOL_CONNECTIONS = int(get_env_variable("S3_MAX_POOL_CONNECTIONS", 50))
 PRESIGNED_URL_EXPIRY = get_env_variable("PRESIGNED_URL_EXPIRY")
 WEBAPP_USERNAME = get_env_variable("WEBAPP_USERNAME")
 WEBAPP_PASSWORD = get_env_variable("WEBAPP_PASSWORD")
 WEBAPP_REMEMBERME = get_env_variable("WEBAPP_REMEMBER")
 WEBAPP_AUTH_URL = get_env_variable("WEBAPP_AUTH_URL")
 WEBAPP_URL = get_env_variable("WEBAPP_URL")
+# Lifetime of a web app token that does not carry an expiry itself.
+WEBAPP_TOKEN_TTL = int(get_env_variable("WEBAPP_TOKEN_TTL", 3600))
+HTTP_MAX_CONNECTIONS = int(get_env_variable("HTTP_MAX_CONNECTIONS", 100))
+HTTP_KEEPALIVE_EXPIRY = float(get_env_variable("HTTP_KEEPALIVE_EXPIRY", 60.0))
+HTTP_TIMEOUT = float(get_env_variable("HTTP_TIMEOUT", 30.0))
+MIGRATION_CONCURRENCY = int(get_env_variable("MIGRATION_CONCURRENCY", 8))
+CONVERSION_CACHE_ENABLED = get_env_variable(
+    "CONVERSION_CACHE_ENABLED", "true").lower() == "true"
+CONVERSION_CACHE_TTL = int(get_env_variable(
+    "CONVERSION_CACHE_TTL", 7 * 24 * 60 * 60))
+CONVERSION_CACHE_MAX_ENTRIES = int(get_env_variable(
+    "CONVERSION_CACHE_MAX_ENTRIES", 10000))
+CONVERSION_CACHE_DIR = get_env_variable("CONVERSION_CACHE_DIR")
+CONVERSION_CACHE_DISK_MAX_BYTES = int(get_env_variable(
+    "CONVERSION_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024))
+LOCAL_VIEW_TRANSLATOR_ENABLED = get_env_variable(
+    "LOCAL_VIEW_TRANSLATOR_ENABLED", "true").lower() == "true"
+LOCAL_SCHEMA_TRANSLATOR_ENABLED = get_env_variable(
+    "LOCAL_SCHEMA_TRANSLATOR_ENABLED", "true").lower() == "true"
+VIEW_CHUNKING_ENABLED = get_env_variable(
+    "VIEW_CHUNKING_ENABLED", "true").lower() == "true"
+VIEW_CHUNK_MIN_NODES = int(get_env_variable("VIEW_CHUNK_MIN_NODES", 8))
+VIEW_CHUNK_CONCURRENCY = int(get_env_variable("VIEW_CHUNK_CONCURRENCY", 8))
+# JSON list of model tiers for LLM conversions, see MODEL_TIERS in
+# app/services/migration_service.py for the format and the defaults.
+LLM_MODEL_TIERS = get_env_variable("LLM_MODEL_TIERS")
+# Duplicate LLM conversions still running after the HEDGE_PERCENTILE latency
+# of their file type; each job may send HEDGE_BUDGET_MIN plus
+# HEDGE_BUDGET_RATIO of its requests as duplicates.
+HEDGING_ENABLED = get_env_variable("HEDGING_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(get_env_variable("HEDGE_PERCENTILE", 0.95))
+HEDGE_MIN_SAMPLES = int(get_env_variable("HEDGE_MIN_SAMPLES", 20))
+HEDGE_WINDOW = int(get_env_variable("HEDGE_WINDOW", 200))
+HEDGE_BUDGET_RATIO = float(get_env_variable("HEDGE_BUDGET_RATIO", 0.05))
+HEDGE_BUDGET_MIN = int(get_env_variable("HEDGE_BUDGET_MIN", 2))
+# Functions and schemas of at most PACKING_MAX_MEMBER_BYTES are converted
+# together, up to PACKING_TOKEN_BUDGET prompt tokens per request; a member
+# waits at most PACKING_MAX_WAIT seconds for others to join it.
+PACKING_ENABLED = get_env_variable("PACKING_ENABLED", "false").lower() == "true"
+PACKING_MAX_MEMBER_BYTES = int(get_env_variable("PACKING_MAX_MEMBER_BYTES", 2048))
+PACKING_TOKEN_BUDGET = int(get_env_variable("PACKING_TOKEN_BUDGET", 1200))
+PACKING_MAX_WAIT = float(get_env_variable("PACKING_MAX_WAIT", 0.1))
+SQL_REWRITE_ENABLED = get_env_variable(
+    "SQL_REWRITE_ENABLED", "true").lower() == "true"
+# JSON file extending or overriding the default HANA -> Snowflake rewrite rules.
+SQL_REWRITE_RULES = get_env_variable("SQL_REWRITE_RULES")
+# LLM quota per process; divide the account quota by the number of worker
+# processes.
+LLM_REQUESTS_PER_MINUTE = int(get_env_variable("LLM_REQUESTS_PER_MINUTE", 500))
+LLM_TOKENS_PER_MINUTE = int(get_env_variable("LLM_TOKENS_PER_MINUTE", 200000))
+LLM_MAX_CONCURRENCY = int(get_env_variable("LLM_MAX_CONCURRENCY", 16))
+LLM_MAX_RETRIES = int(get_env_variable("LLM_MAX_RETRIES", 6))
+LLM_RETRY_BASE_DELAY = float(get_env_variable("LLM_RETRY_BASE_DELAY", 1.0))
+LLM_RETRY_MAX_DELAY = float(get_env_variable("LLM_RETRY_MAX_DELAY", 60.0))
+LLM_STREAMING_ENABLED = get_env_variable(
+    "LLM_STREAMING_ENABLED", "true").lower() == "true"
+LLM_STREAM_PREAMBLE_LIMIT = int(get_env_variable("LLM_STREAM_PREAMBLE_LIMIT", 512))
+LLM_MALFORMED_RETRIES = int(get_env_variable("LLM_MALFORMED_RETRIES", 2))
+WORKER_PROCESSES = int(get_env_variable("WORKER_PROCESSES", 1))
+# Jobs a worker process runs at once; their member conversions share
+# SCHEDULER_MAX_CONCURRENCY slots.
+WORKER_CONCURRENCY = int(get_env_variable("WORKER_CONCURRENCY", 8))
+SCHEDULER_MAX_CONCURRENCY = int(get_env_variable("SCHEDULER_MAX_CONCURRENCY", 16))
+JOB_VISIBILITY_TIMEOUT = int(get_env_variable("JOB_VISIBILITY_TIMEOUT", 300))
+JOB_MAX_ATTEMPTS = int(get_env_variable("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_BACKOFF = int(get_env_variable("JOB_RETRY_BACKOFF", 30))
+JOB_RESULT_TTL = int(get_env_variable("JOB_RESULT_TTL", 7 * 24 * 60 * 60))
+# Seconds progress updates are held back to be written together with the
+# updates of other members and jobs.
+STATUS_FLUSH_INTERVAL = float(get_env_variable("STATUS_FLUSH_INTERVAL", 0.25))
+JOB_POLL_INTERVAL = float(get_env_variable("JOB_POLL_INTERVAL", 1.0))
+CHECKPOINT_TTL = int(get_env_variable("CHECKPOINT_TTL", 7 * 24 * 60 * 60))
+# Shared by the API and worker processes so that /metrics aggregates them.
+PROMETHEUS_MULTIPROC_DIR = get_env_variable("PROMETHEUS_MULTIPROC_DIR")
+TRACING_ENABLED = get_env_variable("TRACING_ENABLED", "false").lower() == "true"
@@ -1,14 +1,20 @@
-import redis
+import redis.asyncio
 from app.config.env_loader import get_env_variable
 
 REDIS_HOST = get_env_variable('REDIS_HOST', 'localhost')
 REDIS_PORT = int(get_env_variable('REDIS_PORT', 6379))
 REDIS_DB = int(get_env_variable('REDIS_DB', 0))
+REDIS_MAX_CONNECTIONS = int(get_env_variable('REDIS_MAX_CONNECTIONS', 32))
 
-redis_client = redis.StrictRedis(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    db=REDIS_DB,
-    decode_responses=True
+# Replies are parsed by hiredis when it is installed; callers wait for a
+# free connection once REDIS_MAX_CONNECTIONS are in use instead of opening
+# more.
+async_redis_client = redis.asyncio.StrictRedis(
+    connection_pool=redis.asyncio.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        decode_responses=True,
+        max_connections=REDIS_MAX_CONNECTIONS,
+    )
 )
-
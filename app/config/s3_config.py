@@ -0,0 +1,25 @@
+import boto3
+from botocore.config import Config
+
+from app.config.env_loader import (
+    AWS_ACCESS_KEY_ID,
+    AWS_SECRET_ACCESS_KEY,
+    S3_REGION,
+    S3_ENDPOINT_URL,
+    S3_MAX_POOL_CONNECTIONS,
+)
+
+# Shared by all jobs of a process; boto3 clients are thread-safe, and the
+# pool has to cover the ranged reads and part uploads of concurrent jobs.
+s3_client = boto3.client(
+    's3',
+    aws_access_key_id=AWS_ACCESS_KEY_ID,
+    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+    region_name=S3_REGION or None,
+    endpoint_url=S3_ENDPOINT_URL,
+    config=Config(
+        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        retries={"max_attempts": 5, "mode": "standard"},
+    )
+)
@@ -1,189 +1,127 @@
-import io
+import asyncio
 import json
-import os
-import zipfile
-
-import boto3
-import httpx
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-
-from app.config import (
-    WEBAPP_USERNAME,
-    WEBAPP_PASSWORD,
-    WEBAPP_REMEMBERME,
-    WEBAPP_AUTH_URL,
-    WEBAPP_URL,
-    AWS_ACCESS_KEY_ID,
-    S3_REGION,
-    AWS_SECRET_ACCESS_KEY,
-    S3_BUCKET_NAME,
-    S3_BUCKET_PATH,
-    redis_client,
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.schemas import (
+    ConvertFileRequest,
+    ConvertBatchRequest,
+    StatusResponse,
+    StatusDetailResponse,
+    BatchStatusResponse,
+    CacheStatsResponse,
 )
-from app.status_manager import update_status
-from app.schemas import ConvertFileRequest, StatusResponse
-from app.services import (
-    convert_function_to_snowflake,
-    convert_schema_to_snowflake,
-    convert_view_into_snowflake,
+from app.services import conversion_cache, job_queue, JobCheckpoint, JobInProgressError
+from app.schemas.response_models import BatchConversionResponse, FileConversionResponse
+from app.status_manager import (
+    TERMINAL_STATUSES,
+    fetch_status,
+    get_batch_status,
+    get_status_snapshot,
+    reset_batch_statuses,
+    status_broadcaster,
 )
-from app.schemas.response_models import FileConversionResponse
 from app.utils import logger
 
 
 router = APIRouter()
 
+# Seconds between keep-alive comments on idle status streams.
+SSE_KEEPALIVE_INTERVAL = 15
+
 
-async def process_sap_hana_file(request: ConvertFileRequest):
+@router.post("/sap-hana-to-snowflake", response_model=FileConversionResponse)
+async def convert_sap_hana_file(request: ConvertFileRequest):
     """
-    This function will handle the file conversion in the background.
+    Endpoint to accept file conversion request and queue it for the workers.
     """
     try:
-        logger.info("Starting file conversion process.")
-        update_status(request.file_uuid, "Started", '0%')
-
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=S3_REGION
-        )
-        logger.info("S3 client initialized.")
-        local_file_path = r"./saphanafiles"
-
-        os.makedirs(local_file_path, exist_ok=True)
-
-        if request.s3_link.startswith("s3://"):
-            s3_parts = request.s3_link[5:].split("/", 1)
-            bucket_name = s3_parts[0]
-            s3_key = s3_parts[1]
-            logger.info(f"Extracted bucket: {bucket_name}, key: {s3_key}")
-        else:
-            raise ValueError(
-                "Invalid S3 URL format, expected 's3://<bucket>/<key>'")
-
-        file_name = os.path.basename(s3_key)
-        local_file_path = os.path.join(local_file_path, file_name)
-
-        try:
-            s3_client.download_file(bucket_name, s3_key, local_file_path)
-            logger.info(f"File downloaded successfully: {local_file_path}")
-        except Exception as e:
-            logger.error(f"Failed to download file: {e}")
-            raise
-
-        if not os.path.exists(local_file_path):
-            logger.error(f"ZIP file not found: {local_file_path}")
-            raise FileNotFoundError(f"ZIP file not found: {local_file_path}")
-        else:
-            logger.info(f"Opening ZIP file: {local_file_path}")
-
-        converted_files = []
-        with zipfile.ZipFile(local_file_path, "r") as zip_ref:
-            file_list = [f for f in zip_ref.infolist() if not f.is_dir()]
-            total_files = len(file_list)
-
-            for idx, zip_info in enumerate(file_list, start=1):
-                logger.info(f"Processing file: {zip_info.filename}")
-                file_content = zip_ref.read(zip_info.filename)
-                file_extension = zip_info.filename.rsplit('.', 1)[-1].lower()
-
-                if file_extension == "calculationview" or file_extension == "xml":
-                    converted_content = await convert_view_into_snowflake(file_content)
-                elif file_extension == "hdbdd":
-                    converted_content = await convert_schema_to_snowflake(file_content)
-                elif file_extension == "hdbscalarfunction":
-                    converted_content = await convert_function_to_snowflake(file_content)
-                else:
-                    logger.warning(f"Unknown file extension '{
-                                   file_extension}', skipping.")
-                    continue
-
-                converted_files.append((zip_info.filename.rsplit('.', 1)[
-                                       0] + ".sql", converted_content))
-                update_status(request.file_uuid, 'In Progress',
-                              f"{int((idx / total_files) * 100)}%")
-
-        if not converted_files:
-            logger.error("No valid files to convert.")
-            raise HTTPException(
-                status_code=400, detail="No valid files to convert.")
-
-        logger.info("All files processed and converted.")
-
-        zip_output = io.BytesIO()
-        with zipfile.ZipFile(zip_output, "w") as zip_ref:
-            for filename, content in converted_files:
-                if content is not None:
-                    zip_ref.writestr(filename, content)
-            else:
-                logger.error(f"Content for {filename} is None, skipping file.")
-
-        zip_output.seek(0)
-        logger.info("ZIP archive with converted files is ready.")
-
-        s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=S3_BUCKET_PATH)
-        logger.info(f"Folder '{S3_BUCKET_PATH}' created in bucket '{
-                    S3_BUCKET_NAME}'.")
-
-        converted_zip_key = f"{S3_BUCKET_PATH}{
-            request.file_uuid}.zip"
-        s3_client.upload_fileobj(
-            zip_output, S3_BUCKET_NAME, converted_zip_key)
-        logger.info("Successfully uploaded the converted ZIP file to S3.")
+        await job_queue.reserve(request.file_uuid)
+        await JobCheckpoint(request.file_uuid).clear()
+        await job_queue.enqueue(request.file_uuid, request.dict())
+    except JobInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to queue conversion for file_uuid: {
+                     request.file_uuid}, Details: {str(e)}")
+        raise HTTPException(
+            status_code=503, detail="Failed to queue the conversion request")
 
-        s3_uri = f"s3://{S3_BUCKET_NAME}/{converted_zip_key}"
+    return FileConversionResponse(status="Accepted", message="File conversion process started.", file_uuid=request.file_uuid)
 
-        logger.info(f"Generated S3 URI: {s3_uri}")
 
-        auth_payload = {
-            "username": WEBAPP_USERNAME,
-            "password": WEBAPP_PASSWORD,
-            "rememberMe": WEBAPP_REMEMBERME
-        }
+@router.post("/sap-hana-to-snowflake/batch", response_model=BatchConversionResponse)
+async def convert_sap_hana_batch(request: ConvertBatchRequest):
+    """
+    Endpoint to queue several archives as one job. Members with the same
+    content are converted once across all archives; every archive gets its
+    own output, status and webhook.
+    """
+    file_uuids = [archive.file_uuid for archive in request.archives]
+    if not file_uuids:
+        raise HTTPException(status_code=400, detail="The batch has no archives")
+    if len(set(file_uuids)) != len(file_uuids) or request.batch_uuid in file_uuids:
+        raise HTTPException(
+            status_code=400, detail="batch_uuid and the archives' file_uuids must be unique")
 
-        async with httpx.AsyncClient() as client:
-            auth_response = await client.post(WEBAPP_AUTH_URL, json=auth_payload)
-            auth_response.raise_for_status()
-            access_token = auth_response.json().get("id_token")
+    try:
+        await job_queue.reserve(request.batch_uuid, *file_uuids)
+        await asyncio.gather(*(JobCheckpoint(file_uuid).clear() for file_uuid in file_uuids))
+        await reset_batch_statuses(request.batch_uuid, file_uuids)
+        await job_queue.enqueue(request.batch_uuid, request.dict())
+    except JobInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to queue batch conversion for batch_uuid: {
+                     request.batch_uuid}, Details: {str(e)}")
+        raise HTTPException(
+            status_code=503, detail="Failed to queue the conversion request")
 
-            if not access_token:
-                logger.error("Authentication failed: No access token received")
-                raise ValueError(
-                    "Authentication failed: No access token received")
+    return BatchConversionResponse(status="Accepted", message=f"Conversion of {len(file_uuids)} archives started.", batch_uuid=request.batch_uuid, file_uuids=file_uuids)
 
-            logger.info("Authentication successful, access token obtained.")
 
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "file_uuid": request.file_uuid,
-                "s3_link": s3_uri
-            }
+@router.post("/resume/{file_uuid}", response_model=FileConversionResponse)
+async def resume_sap_hana_file(file_uuid: str):
+    """
+    Endpoint to re-queue a failed or partially converted job. Only members
+    that are missing or failed are converted again, and the upload and
+    webhook steps are repeated only when the output changes.
+    """
+    checkpoint = JobCheckpoint(file_uuid)
+    try:
+        meta, members = await checkpoint.load()
+    except Exception as e:
+        logger.error(f"Failed to load checkpoint for file_uuid: {
+                     file_uuid}, Details: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail="Failed to load the job checkpoint")
 
-            webhook_response = await client.post(WEBAPP_URL, json=payload, headers=headers)
-            webhook_response.raise_for_status()
+    if not meta.get("payload"):
+        logger.warning(f"No checkpoint found for file_uuid: {file_uuid}")
+        raise HTTPException(
+            status_code=404, detail=f"No checkpoint found for file_uuid: {file_uuid}")
 
-            logger.info("Webhook response: %s, %s",
-                        webhook_response.status_code, webhook_response.text)
+    failed = await checkpoint.failed_members(members)
+    if not failed and meta.get("webhook_sent"):
+        return FileConversionResponse(status="Completed", message="Nothing to resume, the conversion already completed.", file_uuid=file_uuid)
 
-            update_status(request.file_uuid, "Completed", "100%")
+    try:
+        await job_queue.reserve(file_uuid)
+        if failed:
+            logger.info(f"Resuming file_uuid: {file_uuid} with {
+                        len(failed)} failed members.")
+            await checkpoint.reset_delivery()
+        await job_queue.enqueue(file_uuid, json.loads(meta["payload"]))
+    except JobInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        logger.error(f"An error occurred: {e}")
-        update_status(request.file_uuid, "Failed", "")
+        logger.error(f"Failed to queue resumed conversion for file_uuid: {
+                     file_uuid}, Details: {str(e)}")
         raise HTTPException(
-            status_code=500, detail="An internal error occurred.")
+            status_code=503, detail="Failed to queue the conversion request")
 
-
-@router.post("/sap-hana-to-snowflake", response_model=FileConversionResponse)
-async def convert_sap_hana_file(request: ConvertFileRequest, background_tasks: BackgroundTasks):
-    """
-    Endpoint to accept file conversion request and trigger background processing.
-    """
-    background_tasks.add_task(process_sap_hana_file, request)
-    return FileConversionResponse(status="Accepted", message="File conversion process started.", file_uuid=request.file_uuid)
+    return FileConversionResponse(status="Accepted", message="File conversion resumed.", file_uuid=file_uuid)
 
 
 @router.get("/status/{file_uuid}", response_model=StatusResponse)
@@ -191,15 +129,13 @@ async def get_status(file_uuid: str):
     try:
         logger.info(f"Fetching status for file_uuid: {file_uuid}")
 
-        status_data = redis_client.get(file_uuid)
+        status_data = await fetch_status(file_uuid)
 
         if status_data is None:
             logger.warning(f"No status found for file_uuid: {file_uuid}")
             raise HTTPException(
                 status_code=404, detail=f"No status found for file_uuid: {file_uuid}")
 
-        status_data = json.loads(status_data)
-
         if not status_data:
             logger.error(f"Invalid status data for file_uuid: {file_uuid}")
             raise HTTPException(status_code=400, detail="Invalid status data")
@@ -212,6 +148,9 @@ async def get_status(file_uuid: str):
 
         return StatusResponse(status=status, percentage=percentage)
 
+    except HTTPException:
+        raise
+
     except json.JSONDecodeError as e:
         logger.error(f"JSON decoding error for file_uuid: {
                      file_uuid}, Details: {str(e)}")
@@ -223,3 +162,77 @@ async def get_status(file_uuid: str):
                      file_uuid}, Details: {str(e)}")
         raise HTTPException(
             status_code=500, detail="An error occurred while fetching the status")
+
+
+@router.get("/status/{file_uuid}/members", response_model=StatusDetailResponse)
+async def get_status_detail(file_uuid: str):
+    """
+    Return the job status together with the status of every archive member.
+    """
+    snapshot = await get_status_snapshot(file_uuid)
+    if snapshot is None:
+        raise HTTPException(
+            status_code=404, detail=f"No status found for file_uuid: {file_uuid}")
+    return StatusDetailResponse(**snapshot)
+
+
+@router.get("/batch/{batch_uuid}/status", response_model=BatchStatusResponse)
+async def get_batch_status_summary(batch_uuid: str):
+    """
+    Return the status of a batch, the number of archives per status and the
+    status of every archive, read in a single round trip.
+    """
+    batch = await get_batch_status(batch_uuid)
+    if batch is None:
+        raise HTTPException(
+            status_code=404, detail=f"No batch found for batch_uuid: {batch_uuid}")
+    return BatchStatusResponse(**batch)
+
+
+@router.get("/status/{file_uuid}/events")
+async def stream_status(file_uuid: str):
+    """
+    Stream status transitions as Server-Sent Events. The first event is a
+    snapshot with all member statuses, later events carry the job status and
+    the members that changed. The stream ends when the job completes or
+    fails.
+    """
+    queue = status_broadcaster.subscribe(file_uuid)
+    snapshot = await get_status_snapshot(file_uuid)
+    if snapshot is None:
+        status_broadcaster.unsubscribe(file_uuid, queue)
+        raise HTTPException(
+            status_code=404, detail=f"No status found for file_uuid: {file_uuid}")
+
+    async def events():
+        try:
+            event = snapshot
+            yield f"event: snapshot\ndata: {json.dumps(event)}\n\n"
+            while event["status"] not in TERMINAL_STATUSES:
+                try:
+                    data = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if data is None:
+                    event = await get_status_snapshot(file_uuid)
+                    if event is None:
+                        return
+                    yield f"event: snapshot\ndata: {json.dumps(event)}\n\n"
+                else:
+                    event = json.loads(data)
+                    yield f"event: status\ndata: {data}\n\n"
+        finally:
+            status_broadcaster.unsubscribe(file_uuid, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+async def get_cache_stats():
+    """
+    Return conversion cache hit/miss counters and the estimated LLM time saved.
+    """
+    return CacheStatsResponse(**await conversion_cache.stats())
@@ -1 +1 @@
-from app.schemas.response_models import ConvertFileRequest, StatusResponse
+from app.schemas.response_models import ConvertFileRequest, ConvertBatchRequest, StatusResponse, StatusDetailResponse, BatchStatusResponse, CacheStatsResponse
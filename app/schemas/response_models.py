@@ -1,9 +1,22 @@
+from typing import Dict, List, Optional
+
 from pydantic import BaseModel
 
 
 class ConvertFileRequest(BaseModel):
     file_uuid: str
     s3_link: str
+    concurrency: Optional[int] = None
+    baseline_file_uuid: Optional[str] = None
+    # -3 to 3; each level doubles the job's share of the conversion slots.
+    priority: Optional[int] = None
+
+
+class ConvertBatchRequest(BaseModel):
+    batch_uuid: str
+    archives: List[ConvertFileRequest]
+    concurrency: Optional[int] = None
+    priority: Optional[int] = None
 
 
 class StatusResponse(BaseModel):
@@ -11,7 +24,36 @@ class StatusResponse(BaseModel):
     percentage: str
 
 
+class StatusDetailResponse(BaseModel):
+    status: str
+    percentage: str
+    members: Dict[str, str]
+
+
+class BatchStatusResponse(BaseModel):
+    status: str
+    percentage: str
+    counts: Dict[str, int]
+    archives: Dict[str, StatusResponse]
+
+
 class FileConversionResponse(BaseModel):
     status: str
     message: str
     file_uuid: str
+
+
+class BatchConversionResponse(BaseModel):
+    status: str
+    message: str
+    batch_uuid: str
+    file_uuids: List[str]
+
+
+class CacheStatsResponse(BaseModel):
+    hits: int
+    hits_by_tier: Dict[str, int]
+    misses: int
+    hit_ratio: float
+    saved_seconds: float
+    entries: int
@@ -1 +1,12 @@
 from app.services.migration_service import convert_schema_to_snowflake, convert_view_into_snowflake, convert_function_to_snowflake
+from app.services.sql_rewriter import rewrite_sql
+from app.services.cache_service import conversion_cache
+from app.services.http_clients import close_http_clients, get_http_client, get_llm_session
+from app.services.llm_client import chat_completion, llm_rate_limiter
+from app.services.webapp_client import webapp_client
+from app.services.s3_reader import S3RangeReader, parse_s3_link
+from app.services.s3_writer import S3MultipartWriter, StreamingZipWriter
+from app.services.checkpoint_service import JobCheckpoint
+from app.services.manifest_service import ArchiveManifest, BaselineArchive
+from app.services.job_queue import job_queue, JobInProgressError, PermanentJobError
+from app.services.migration_job import process_batch, process_sap_hana_file
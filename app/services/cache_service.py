@@ -0,0 +1,300 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+import redis
+
+from app.config import (
+    CONVERSION_CACHE_ENABLED,
+    CONVERSION_CACHE_TTL,
+    CONVERSION_CACHE_MAX_ENTRIES,
+    CONVERSION_CACHE_DIR,
+    CONVERSION_CACHE_DISK_MAX_BYTES,
+    async_redis_client,
+)
+from app.utils import logger
+
+
+CACHE_KEY_PREFIX = "conversion_cache"
+CACHE_INDEX_KEY = f"{CACHE_KEY_PREFIX}:lru"
+CACHE_STATS_KEY = f"{CACHE_KEY_PREFIX}:stats"
+
+
+def build_cache_key(content, prompt_version, model, temperature):
+    """
+    Build a content-addressed cache key for a converted member.
+
+    :param content: Raw member content (bytes or str)
+    :param prompt_version: Version of the prompt template used for the conversion
+    :param model: LLM model name
+    :param temperature: LLM sampling temperature
+    :return: Hex digest identifying the conversion
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+
+    digest = hashlib.sha256(content)
+    digest.update(f"|{prompt_version}|{model}|{temperature}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ConversionAbandoned(Exception):
+    """Raised to the callers waiting for a conversion whose caller was
+    cancelled; they convert again instead."""
+
+
+class ConversionCache:
+    """
+    Two-tier cache for converted SQL: an optional local on-disk tier in front
+    of a shared Redis tier. Both tiers are LRU-bounded, Redis entries also
+    expire after CONVERSION_CACHE_TTL seconds. Concurrent requests for the
+    same key share a single in-flight conversion.
+    """
+
+    def __init__(self, enabled=True, ttl=CONVERSION_CACHE_TTL,
+                 max_entries=CONVERSION_CACHE_MAX_ENTRIES, cache_dir=None,
+                 disk_max_bytes=CONVERSION_CACHE_DISK_MAX_BYTES):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_bytes = None
+        self._disk_lock = threading.Lock()
+        self._inflight = {}
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    async def get_or_convert(self, cache_key, convert):
+        """
+        Return the cached conversion for cache_key, or run convert() and cache
+        its result. Failed conversions (None) are never cached.
+
+        :param cache_key: Key built with build_cache_key
+        :param convert: Zero-argument coroutine function performing the conversion
+        :return: Converted SQL or None
+        """
+        if not self.enabled:
+            return await convert()
+
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            try:
+                sql = await asyncio.shield(inflight)
+            except ConversionAbandoned:
+                # The caller converting the key was cancelled; take over.
+                return await self.get_or_convert(cache_key, convert)
+            await self._record("hits_inflight")
+            return sql
+
+        # Registered before the lookups, which yield to the event loop, so
+        # that concurrent requests for the key wait for this one.
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            entry = await self._get_disk(cache_key)
+            if entry is not None:
+                await self._record("hits_disk", entry.get("elapsed", 0))
+            else:
+                entry = await self._get_redis(cache_key)
+                if entry is not None:
+                    await self._record("hits_redis", entry.get("elapsed", 0))
+                    await self._set_disk(cache_key, entry)
+
+            if entry is not None:
+                sql = entry["sql"]
+            else:
+                await self._record("misses")
+                started = time.monotonic()
+                sql = await convert()
+                if sql is not None:
+                    entry = {"sql": sql, "elapsed": time.monotonic() - started}
+                    await self._set_redis(cache_key, entry)
+                    await self._set_disk(cache_key, entry)
+            future.set_result(sql)
+            return sql
+        except asyncio.CancelledError:
+            # Only this caller was cancelled; the others convert again.
+            future.set_exception(ConversionAbandoned(cache_key))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting.
+            future.exception()
+            raise
+        finally:
+            del self._inflight[cache_key]
+
+    async def stats(self):
+        """
+        Return the shared hit/miss counters and the estimated LLM time saved.
+        """
+        try:
+            pipe = async_redis_client.pipeline(transaction=False)
+            pipe.hgetall(CACHE_STATS_KEY)
+            pipe.zcard(CACHE_INDEX_KEY)
+            raw, entries = await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to read conversion cache stats: {e}")
+            raw, entries = {}, 0
+
+        hits = {
+            tier: int(raw.get(f"hits_{tier}", 0))
+            for tier in ("inflight", "disk", "redis")
+        }
+        misses = int(raw.get("misses", 0))
+        total = sum(hits.values()) + misses
+        return {
+            "hits": sum(hits.values()),
+            "hits_by_tier": hits,
+            "misses": misses,
+            "hit_ratio": round(sum(hits.values()) / total, 4) if total else 0.0,
+            "saved_seconds": round(float(raw.get("saved_seconds", 0.0)), 3),
+            "entries": entries,
+        }
+
+    async def _record(self, counter, saved_seconds=0):
+        try:
+            pipe = async_redis_client.pipeline(transaction=False)
+            pipe.hincrby(CACHE_STATS_KEY, counter, 1)
+            if saved_seconds:
+                pipe.hincrbyfloat(CACHE_STATS_KEY, "saved_seconds",
+                                  saved_seconds)
+            await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to update conversion cache stats: {e}")
+
+    def _entry_key(self, cache_key):
+        return f"{CACHE_KEY_PREFIX}:entry:{cache_key}"
+
+    async def _get_redis(self, cache_key):
+        try:
+            raw = await async_redis_client.get(self._entry_key(cache_key))
+            if raw is None:
+                return None
+            pipe = async_redis_client.pipeline(transaction=False)
+            pipe.zadd(CACHE_INDEX_KEY, {cache_key: time.time()})
+            pipe.expire(self._entry_key(cache_key), self.ttl)
+            await pipe.execute()
+            return json.loads(raw)
+        except (redis.RedisError, json.JSONDecodeError) as e:
+            logger.warning(f"Conversion cache lookup failed for {
+                           cache_key}: {e}")
+            return None
+
+    async def _set_redis(self, cache_key, entry):
+        try:
+            now = time.time()
+            pipe = async_redis_client.pipeline(transaction=False)
+            pipe.set(self._entry_key(cache_key), json.dumps(entry), ex=self.ttl)
+            pipe.zadd(CACHE_INDEX_KEY, {cache_key: now})
+            # Drop index entries whose values have already expired.
+            pipe.zremrangebyscore(CACHE_INDEX_KEY, "-inf", now - self.ttl)
+            pipe.zcard(CACHE_INDEX_KEY)
+            size = (await pipe.execute())[-1]
+
+            overflow = size - self.max_entries
+            if overflow > 0:
+                evicted = [key for key, _ in
+                           await async_redis_client.zpopmin(CACHE_INDEX_KEY, overflow)]
+                if evicted:
+                    await async_redis_client.delete(
+                        *(self._entry_key(key) for key in evicted))
+                    logger.info(f"Evicted {len(evicted)} entries from the conversion cache.")
+        except redis.RedisError as e:
+            logger.warning(f"Failed to store conversion cache entry {
+                           cache_key}: {e}")
+
+    def _disk_path(self, cache_key):
+        return os.path.join(self.cache_dir, cache_key[:2], f"{cache_key}.json")
+
+    # The disk tier's file operations run in worker threads so that they
+    # never block the event loop.
+
+    async def _get_disk(self, cache_key):
+        if not self.cache_dir:
+            return None
+        return await asyncio.to_thread(self._read_disk, cache_key)
+
+    async def _set_disk(self, cache_key, entry):
+        if not self.cache_dir:
+            return
+        await asyncio.to_thread(self._write_disk, cache_key, entry)
+
+    def _read_disk(self, cache_key):
+        path = self._disk_path(cache_key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Failed to read disk cache entry {path}: {e}")
+            return None
+
+    def _write_disk(self, cache_key, entry):
+        path = self._disk_path(cache_key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+
+            # Size accounting and eviction are shared by the writing threads.
+            with self._disk_lock:
+                if self._disk_bytes is None:
+                    self._disk_bytes = sum(
+                        size for _, size, _ in self._scan_disk())
+                else:
+                    self._disk_bytes += os.path.getsize(path)
+
+                if self._disk_bytes > self.disk_max_bytes:
+                    self._evict_disk()
+        except OSError as e:
+            logger.warning(f"Failed to write disk cache entry {path}: {e}")
+
+    def _scan_disk(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _evict_disk(self):
+        """
+        Remove least recently used files until the disk tier is back under
+        90% of its size limit.
+        """
+        entries = sorted(self._scan_disk(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_max_bytes * 0.9
+
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                total -= size
+
+        self._disk_bytes = total
+
+
+conversion_cache = ConversionCache(
+    enabled=CONVERSION_CACHE_ENABLED,
+    cache_dir=CONVERSION_CACHE_DIR,
+)
@@ -0,0 +1,486 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.utils import logger
+
+
+# HANA CDS / SQL type -> Snowflake type. Types taking a length or precision
+# use "{args}" which is replaced by the arguments given in the CDS source.
+TYPE_MAPPING = {
+    # CDS primitive types
+    "String": "VARCHAR({args})",
+    "LargeString": "VARCHAR",
+    "Binary": "BINARY({args})",
+    "LargeBinary": "BINARY",
+    "Integer": "INTEGER",
+    "Integer64": "BIGINT",
+    "Decimal": "NUMBER({args})",
+    "DecimalFloat": "FLOAT",
+    "BinaryFloat": "FLOAT",
+    "LocalDate": "DATE",
+    "LocalTime": "TIME",
+    "UTCDateTime": "TIMESTAMP_TZ",
+    "UTCTimestamp": "TIMESTAMP_TZ",
+    "Boolean": "BOOLEAN",
+    # hana.* native types
+    "hana.ALPHANUM": "VARCHAR({args})",
+    "hana.SMALLINT": "SMALLINT",
+    "hana.TINYINT": "TINYINT",
+    "hana.SMALLDECIMAL": "FLOAT",
+    "hana.REAL": "FLOAT",
+    "hana.CHAR": "CHAR({args})",
+    "hana.NCHAR": "CHAR({args})",
+    "hana.VARCHAR": "VARCHAR({args})",
+    "hana.NVARCHAR": "VARCHAR({args})",
+    "hana.CLOB": "VARCHAR",
+    "hana.NCLOB": "VARCHAR",
+    "hana.BINARY": "BINARY({args})",
+    "hana.VARBINARY": "BINARY({args})",
+    "hana.BLOB": "BINARY",
+    "hana.ST_POINT": "GEOGRAPHY",
+    "hana.ST_GEOMETRY": "GEOGRAPHY",
+    # SQL type names that appear in older CDS sources
+    "DATE": "DATE",
+    "TIME": "TIME",
+    "SECONDDATE": "TIMESTAMP_TZ",
+    "TIMESTAMP": "TIMESTAMP_TZ",
+    "BIGINT": "BIGINT",
+    "DOUBLE": "FLOAT",
+    "DECIMAL": "NUMBER({args})",
+    "NVARCHAR": "VARCHAR({args})",
+    "VARCHAR": "VARCHAR({args})",
+}
+
+TOKEN_PATTERN = re.compile(
+    r"""(?P<skip>\s+|//[^\n]*|/\*.*?\*/)"""
+    r"""|(?P<string>'(?:[^']|'')*')"""
+    r"""|(?P<number>-?\d+(?:\.\d+)?)"""
+    r"""|(?P<name>"[^"]+"|[A-Za-z_$][\w$]*)"""
+    r"""|(?P<symbol>::|\.\.|[{}()\[\];:,.=@#*<>!+\-/])""",
+    re.DOTALL,
+)
+
+# Keywords that introduce constructs the parser hands over to the LLM.
+UNSUPPORTED_DEFINITIONS = ("view", "define", "table", "const", "annotation",
+                           "aspect", "extend", "service", "action")
+
+
+class UnsupportedSchemaError(Exception):
+    """Raised when a CDS source contains constructs the local parser rejects."""
+
+
+@dataclass
+class Column:
+    name: str
+    data_type: str
+    key: bool = False
+    not_null: bool = False
+    default: Optional[str] = None
+
+
+@dataclass
+class Element:
+    name: str
+    type_name: Optional[str] = None
+    type_args: List[str] = field(default_factory=list)
+    elements: Optional[List["Element"]] = None
+    association: Optional[str] = None
+    foreign_keys: List[str] = field(default_factory=list)
+    managed: bool = True
+    key: bool = False
+    not_null: bool = False
+    default: Optional[str] = None
+
+
+@dataclass
+class Entity:
+    name: str
+    schema: Optional[str]
+    elements: List[Element]
+
+
+@dataclass
+class CdsModel:
+    namespace: Optional[str] = None
+    types: Dict[str, Element] = field(default_factory=dict)
+    entities: List[Entity] = field(default_factory=list)
+
+
+def _tokenize(source):
+    tokens = []
+    position = 0
+    while position < len(source):
+        match = TOKEN_PATTERN.match(source, position)
+        if match is None:
+            raise UnsupportedSchemaError(
+                f"Unexpected character {source[position]!r} at offset {position}")
+        position = match.end()
+        if match.lastgroup != "skip":
+            tokens.append(match.group(match.lastgroup))
+    return tokens
+
+
+class CdsParser:
+    """
+    Recursive-descent parser for the subset of HANA CDS used in .hdbdd
+    files: namespaces, contexts, types, structured types and entities with
+    scalar, structured and association elements.
+    """
+
+    def __init__(self, source):
+        self.tokens = _tokenize(source)
+        self.position = 0
+        self.model = CdsModel()
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise UnsupportedSchemaError("Unexpected end of CDS source")
+        self.position += 1
+        return token
+
+    def expect(self, expected):
+        token = self.next()
+        if token != expected:
+            raise UnsupportedSchemaError(f"Expected '{expected}', found '{token}'")
+        return token
+
+    def accept(self, expected):
+        if self.peek() is not None and self.peek().lower() == expected.lower():
+            self.position += 1
+            return True
+        return False
+
+    def name(self):
+        token = self.next()
+        if not re.match(r'^("[^"]+"|[A-Za-z_$][\w$]*)$', token):
+            raise UnsupportedSchemaError(f"Expected a name, found '{token}'")
+        return token.strip('"')
+
+    def qualified_name(self):
+        parts = [self.name()]
+        while self.peek() in (".", "::"):
+            parts.append(self.next())
+            parts.append(self.name())
+        return "".join(parts)
+
+    def parse(self):
+        schema = None
+        while self.peek() is not None:
+            if self.accept("namespace"):
+                self.model.namespace = self.qualified_name()
+                self.expect(";")
+            elif self.accept("using"):
+                self.qualified_name()
+                if self.accept("as"):
+                    self.name()
+                self.expect(";")
+            else:
+                annotations = self.annotations()
+                schema = annotations.get("Schema", schema)
+                self.definition([], schema)
+        return self.model
+
+    def annotations(self):
+        annotations = {}
+        while self.accept("@"):
+            name = self.qualified_name()
+            value = None
+            if self.accept(":"):
+                value = self.annotation_value()
+            annotations[name] = value
+        return annotations
+
+    def annotation_value(self):
+        token = self.next()
+        if token in ("{", "["):
+            closing = "}" if token == "{" else "]"
+            depth = 1
+            while depth:
+                current = self.next()
+                if current == token:
+                    depth += 1
+                elif current == closing:
+                    depth -= 1
+            return None
+        if token == "#":
+            return self.name()
+        if token.startswith("'"):
+            return token[1:-1].replace("''", "'")
+        return token
+
+    def definition(self, path, schema):
+        keyword = self.next().lower()
+        if keyword == "context":
+            name = self.name()
+            self.expect("{")
+            while not self.accept("}"):
+                annotations = self.annotations()
+                self.definition(path + [name], annotations.get("Schema", schema))
+            self.accept(";")
+        elif keyword == "type":
+            name = self.name()
+            element = Element(name=name)
+            if self.accept(":"):
+                self.type_reference(element)
+            else:
+                element.elements = self.element_block()
+            self.accept(";")
+            self.model.types[".".join(path + [name])] = element
+            self.model.types.setdefault(name, element)
+        elif keyword == "entity":
+            name = self.name()
+            elements = self.element_block()
+            self.accept(";")
+            self.model.entities.append(
+                Entity(name=".".join(path + [name]), schema=schema, elements=elements))
+        elif keyword in UNSUPPORTED_DEFINITIONS:
+            raise UnsupportedSchemaError(f"Unsupported CDS definition '{keyword}'")
+        else:
+            raise UnsupportedSchemaError(f"Unexpected token '{keyword}'")
+
+    def element_block(self):
+        self.expect("{")
+        elements = []
+        while not self.accept("}"):
+            self.annotations()
+            elements.append(self.element())
+        return elements
+
+    def element(self):
+        element = Element(name="")
+        if self.accept("key"):
+            element.key = True
+        self.accept("element")
+        element.name = self.name()
+        self.expect(":")
+
+        if self.peek() == "{":
+            element.elements = self.element_block()
+        elif self.peek() and self.peek().lower() == "association":
+            self.association(element)
+        else:
+            self.type_reference(element)
+
+        while self.peek() != ";":
+            if self.accept("not"):
+                self.expect("null")
+                element.not_null = True
+            elif self.accept("null"):
+                element.not_null = False
+            elif self.accept("default"):
+                element.default = self.default_value()
+            elif self.peek() == "=":
+                raise UnsupportedSchemaError(
+                    f"Calculated element '{element.name}' is not supported")
+            else:
+                raise UnsupportedSchemaError(
+                    f"Unsupported modifier '{self.peek()}' on '{element.name}'")
+        self.expect(";")
+        return element
+
+    def default_value(self):
+        token = self.next()
+        if token.startswith("'") or re.match(r"^-?\d", token):
+            return token
+        if token.lower() in ("true", "false", "null"):
+            return token.upper()
+        raise UnsupportedSchemaError(f"Unsupported default value '{token}'")
+
+    def type_reference(self, element):
+        element.type_name = self.qualified_name()
+        if self.accept("("):
+            while not self.accept(")"):
+                token = self.next()
+                if token != ",":
+                    element.type_args.append(token)
+
+    def association(self, element):
+        self.next()
+        if self.accept("["):
+            while not self.accept("]"):
+                self.next()
+        self.expect("to")
+        element.association = self.qualified_name()
+        if self.accept("{"):
+            while not self.accept("}"):
+                token = self.next()
+                if token != ",":
+                    element.foreign_keys.append(token.strip('"'))
+        elif self.accept("on"):
+            element.managed = False
+            while self.peek() not in (";", None):
+                self.next()
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def map_type(type_name, type_args):
+    """
+    Map a HANA CDS or SQL type to its Snowflake equivalent.
+
+    :raises UnsupportedSchemaError: If the type has no mapping
+    """
+    target = TYPE_MAPPING.get(type_name) or TYPE_MAPPING.get(type_name.upper())
+    if target is None:
+        raise UnsupportedSchemaError(f"Unsupported type '{type_name}'")
+    if "{args}" in target:
+        if not type_args:
+            return target.replace("({args})", "")
+        return target.replace("{args}", ", ".join(type_args))
+    return target
+
+
+class ColumnBuilder:
+    """Flatten entity elements into table columns, resolving custom types,
+    structured types and managed associations."""
+
+    def __init__(self, model):
+        self.model = model
+        self.entities = {entity.name: entity for entity in model.entities}
+        for entity in model.entities:
+            self.entities[runtime_name(model.namespace, entity.name)] = entity
+            self.entities.setdefault(entity.name.rsplit(".", 1)[-1], entity)
+
+    def columns(self, elements, prefix="", key=False, depth=0):
+        if depth > 16:
+            raise UnsupportedSchemaError("Type definitions are nested too deeply")
+
+        columns = []
+        for element in elements:
+            name = f"{prefix}{element.name}"
+            is_key = key or element.key
+
+            if element.association is not None:
+                if element.managed:
+                    columns.extend(self.association_columns(element, name, is_key, depth))
+                continue
+
+            if element.elements is not None:
+                columns.extend(self.columns(
+                    element.elements, f"{name}.", is_key, depth + 1))
+                continue
+
+            custom_type = self.model.types.get(element.type_name)
+            if custom_type is not None and custom_type is not element:
+                if custom_type.elements is not None:
+                    columns.extend(self.columns(
+                        custom_type.elements, f"{name}.", is_key, depth + 1))
+                    continue
+                resolved = Element(
+                    name=element.name, key=element.key, not_null=element.not_null,
+                    default=element.default, type_name=custom_type.type_name,
+                    type_args=custom_type.type_args,
+                    elements=custom_type.elements)
+                columns.extend(self.columns([resolved], prefix, key, depth + 1))
+                continue
+
+            columns.append(Column(
+                name=name,
+                data_type=map_type(element.type_name, element.type_args),
+                key=is_key,
+                not_null=element.not_null or is_key,
+                default=element.default,
+            ))
+        return columns
+
+    def association_columns(self, element, name, key, depth):
+        target = self.entities.get(element.association)
+        if target is None:
+            raise UnsupportedSchemaError(
+                f"Association target '{element.association}' is not defined in this file")
+
+        target_columns = self.columns(target.elements, depth=depth + 1)
+        wanted = element.foreign_keys or [
+            column.name for column in target_columns if column.key]
+
+        columns = []
+        for foreign_key in wanted:
+            column = next((c for c in target_columns if c.name == foreign_key), None)
+            if column is None:
+                raise UnsupportedSchemaError(
+                    f"Foreign key '{foreign_key}' not found on '{target.name}'")
+            columns.append(Column(name=f"{name}.{column.name}",
+                                  data_type=column.data_type, key=key, not_null=key))
+        return columns
+
+
+def runtime_name(namespace, name):
+    """
+    Catalog name HANA gives a CDS artifact, namespace::Context.Name; this is
+    also the columnObjectName calculation views use to reference it.
+    """
+    return f"{namespace}::{name}" if namespace else name
+
+
+def render_create_table(entity, columns, namespace=None):
+    table = quote_identifier(runtime_name(namespace, entity.name))
+    if entity.schema:
+        table = f"{quote_identifier(entity.schema)}.{table}"
+
+    lines = []
+    for column in columns:
+        line = f"    {quote_identifier(column.name)} {column.data_type}"
+        if column.not_null:
+            line += " NOT NULL"
+        if column.default is not None:
+            line += f" DEFAULT {column.default}"
+        lines.append(line)
+
+    keys = [quote_identifier(column.name) for column in columns if column.key]
+    if keys:
+        lines.append(f"    PRIMARY KEY ({', '.join(keys)})")
+
+    return f"CREATE OR REPLACE TABLE {table} (\n" + ",\n".join(lines) + "\n);"
+
+
+def translate_cds_schema(source):
+    """
+    Translate a HANA CDS (.hdbdd) source into Snowflake CREATE TABLE
+    statements without calling the LLM.
+
+    :param source: CDS source (bytes or str)
+    :return: Snowflake DDL
+    :raises UnsupportedSchemaError: If the source uses constructs the parser
+        does not support
+    """
+    if isinstance(source, bytes):
+        try:
+            source = source.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            raise UnsupportedSchemaError(f"CDS source is not valid UTF-8: {e}")
+
+    model = CdsParser(source).parse()
+    if not model.entities:
+        raise UnsupportedSchemaError("CDS source defines no entities")
+
+    builder = ColumnBuilder(model)
+    statements = [render_create_table(entity, builder.columns(entity.elements),
+                                      model.namespace)
+                  for entity in model.entities]
+
+    logger.info(f"Translated CDS source locally ({len(statements)} entities).")
+    return "\n\n".join(statements)
+
+
+def type_mapping_reference(skip=()):
+    """
+    Render the type-mapping table for inclusion in LLM prompts.
+
+    :param skip: SQL type names that are mapped after the conversion; they are
+        left out together with the types whose name does not change
+    """
+    lines = []
+    for hana, snowflake in TYPE_MAPPING.items():
+        sql_name = hana.split(".")[-1].upper()
+        if sql_name in skip or sql_name == snowflake.split("(")[0]:
+            continue
+        lines.append(f"{hana} -> {snowflake.replace('({args})', '(...)')}")
+    return "\n".join(lines)
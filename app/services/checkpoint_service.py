@@ -0,0 +1,106 @@
+import json
+
+from app.config import CHECKPOINT_TTL, async_redis_client
+from app.utils import logger
+
+
+CHECKPOINT_KEY_PREFIX = "checkpoint"
+
+MEMBER_DONE = "done"
+MEMBER_FAILED = "failed"
+MEMBER_SKIPPED = "skipped"
+
+
+class JobCheckpoint:
+    """
+    Per-job progress persisted in Redis under the job's file_uuid.
+
+    Every archive member's result is recorded as soon as it is converted,
+    together with the CRC and size from the zip directory, so a retried or
+    resumed job only converts members that are missing or failed. Delivery
+    stages (upload, webhook) are recorded as well so they are not repeated.
+    """
+
+    def __init__(self, file_uuid, ttl=CHECKPOINT_TTL):
+        self.file_uuid = file_uuid
+        self.ttl = ttl
+        self.meta_key = f"{CHECKPOINT_KEY_PREFIX}:{file_uuid}:meta"
+        self.members_key = f"{CHECKPOINT_KEY_PREFIX}:{file_uuid}:members"
+
+    async def load(self):
+        """
+        Return the job metadata and the recorded members keyed by file name.
+        """
+        pipe = async_redis_client.pipeline()
+        pipe.hgetall(self.meta_key)
+        pipe.hgetall(self.members_key)
+        meta, members = await pipe.execute()
+        return meta, {name: json.loads(entry) for name, entry in members.items()}
+
+    async def exists(self):
+        return bool(await async_redis_client.exists(self.meta_key))
+
+    async def start(self, payload):
+        await self._set_meta({"payload": json.dumps(payload)})
+
+    async def mark_stage(self, stage, value="1"):
+        await self._set_meta({stage: value})
+
+    async def reset_delivery(self):
+        """
+        Forget the upload and webhook stages so they run again.
+        """
+        await async_redis_client.hdel(self.meta_key, "s3_uri", "webhook_sent")
+
+    async def clear(self):
+        await async_redis_client.delete(self.meta_key, self.members_key)
+
+    async def record_member(self, zip_info, status, output=None, sql=None,
+                            sha256=None, reused=False):
+        """
+        Record a member's result. reused marks members copied from a
+        baseline archive, which have no SQL of their own.
+        """
+        entry = {
+            "status": status,
+            "crc": zip_info.CRC,
+            "size": zip_info.file_size,
+        }
+        if output is not None:
+            entry["output"] = output
+        if sql is not None:
+            entry["sql"] = sql
+        if sha256 is not None:
+            entry["sha256"] = sha256
+        if reused:
+            entry["reused"] = True
+
+        pipe = async_redis_client.pipeline()
+        pipe.hset(self.members_key, zip_info.filename, json.dumps(entry))
+        pipe.expire(self.members_key, self.ttl)
+        await pipe.execute()
+
+    def restorable(self, zip_info, members):
+        """
+        Return the recorded entry for a member when it can be reused, i.e. it
+        was converted (or skipped) from identical content.
+        """
+        entry = members.get(zip_info.filename)
+        if entry is None or entry["status"] == MEMBER_FAILED:
+            return None
+        if entry.get("crc") != zip_info.CRC or entry.get("size") != zip_info.file_size:
+            logger.info(f"Member {zip_info.filename} changed since the checkpoint.")
+            return None
+        return entry
+
+    async def failed_members(self, members=None):
+        if members is None:
+            _, members = await self.load()
+        return [name for name, entry in members.items()
+                if entry["status"] == MEMBER_FAILED]
+
+    async def _set_meta(self, mapping):
+        pipe = async_redis_client.pipeline()
+        pipe.hset(self.meta_key, mapping=mapping)
+        pipe.expire(self.meta_key, self.ttl)
+        await pipe.execute()
@@ -0,0 +1,143 @@
+import asyncio
+import contextvars
+import math
+import time
+from collections import defaultdict, deque
+
+from app.config import (
+    HEDGING_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_WINDOW,
+    HEDGE_BUDGET_RATIO,
+    HEDGE_BUDGET_MIN,
+)
+from app.services.scheduler import conversion_scheduler
+from app.utils import logger
+from app.utils.metrics import LLM_HEDGES_TOTAL
+
+
+class HedgeBudget:
+    """
+    Extra LLM requests one job may spend on hedging: HEDGE_BUDGET_MIN plus
+    HEDGE_BUDGET_RATIO of the requests it made so far.
+    """
+
+    def __init__(self, ratio=HEDGE_BUDGET_RATIO, minimum=HEDGE_BUDGET_MIN):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.requests = 0
+        self.hedges = 0
+
+    def take(self):
+        """Reserve one hedged request, or return False when none is left."""
+        if self.hedges >= self.minimum + self.ratio * self.requests:
+            return False
+        self.hedges += 1
+        return True
+
+
+# HedgeBudget of the job running in the current task; jobs without one are
+# not hedged.
+hedge_budget = contextvars.ContextVar("hedge_budget", default=None)
+
+
+class LatencyTracker:
+    """Latencies of the last `window` requests per key."""
+
+    def __init__(self, window=HEDGE_WINDOW):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, key, seconds):
+        self._samples[key].append(seconds)
+
+    def percentile(self, key, fraction, min_samples=HEDGE_MIN_SAMPLES):
+        """
+        Latency below which `fraction` of the recorded requests finished, or
+        None with fewer than min_samples of them.
+        """
+        samples = self._samples.get(key)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class RequestHedger:
+    """
+    Sends a duplicate of an LLM conversion that is still running after the
+    HEDGE_PERCENTILE latency of its file type and tier, takes the first of
+    the two to succeed and cancels the other. Each job's HedgeBudget caps the
+    duplicates, and each duplicate waits for a conversion slot of its job.
+    """
+
+    def __init__(self, enabled=HEDGING_ENABLED, percentile=HEDGE_PERCENTILE):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.latencies = LatencyTracker()
+
+    async def run(self, file_type, tier, call):
+        """
+        Run call(), hedging it when enabled.
+
+        :param call: Returns a new awaitable of the conversion each time, whose
+            result is the SQL or None
+        """
+        budget = hedge_budget.get()
+        if not self.enabled or budget is None:
+            return await call()
+
+        key = (file_type, tier)
+        budget.requests += 1
+        delay = self.latencies.percentile(key, self.percentile)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(call())
+        # Cancelled requests are recorded too, their latency as a lower bound.
+        primary.add_done_callback(
+            lambda _: self.latencies.record(key, time.monotonic() - started))
+        try:
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+            if not budget.take():
+                LLM_HEDGES_TOTAL.labels(file_type, "budget_exhausted").inc()
+                return await primary
+
+            logger.info(f"{file_type} conversion on tier '{tier}' still running after {
+                        delay:.1f}s, sending a hedged request.")
+            hedge = asyncio.ensure_future(self._hedge(call))
+            try:
+                return await self._first_result(file_type, primary, hedge)
+            finally:
+                hedge.cancel()
+        finally:
+            primary.cancel()
+
+    @staticmethod
+    async def _hedge(call):
+        # The primary runs in the slot of its conversion; the duplicate takes
+        # one more of the job's slots, so hedges stay within the global cap.
+        async with conversion_scheduler.job_slot():
+            return await call()
+
+    async def _first_result(self, file_type, primary, hedge):
+        """Result of the first of the requests to return SQL, else None."""
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif task.result() is not None:
+                    LLM_HEDGES_TOTAL.labels(
+                        file_type, "hedge_won" if task is hedge else "primary_won").inc()
+                    return task.result()
+        if error is not None:
+            raise error
+        return None
+
+
+request_hedger = RequestHedger()
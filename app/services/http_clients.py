@@ -0,0 +1,63 @@
+import asyncio
+
+import aiohttp
+import httpx
+
+from app.config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_TIMEOUT,
+)
+from app.utils import logger
+
+
+# Clients are bound to the event loop they were created on; a process runs
+# one loop for its lifetime, so in practice each is created once.
+_http_client = None
+_http_client_loop = None
+_llm_session = None
+_llm_session_loop = None
+
+
+def get_http_client():
+    """
+    Process-wide httpx client with a keep-alive connection pool, for the
+    web app's auth and webhook endpoints.
+    """
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY),
+            timeout=HTTP_TIMEOUT)
+        _http_client_loop = loop
+    return _http_client
+
+
+def get_llm_session():
+    """
+    Process-wide aiohttp session for the OpenAI client, which otherwise opens
+    a new session, and a new TLS connection, for every request.
+    """
+    global _llm_session, _llm_session_loop
+    loop = asyncio.get_running_loop()
+    if _llm_session is None or _llm_session.closed or _llm_session_loop is not loop:
+        _llm_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS, keepalive_timeout=HTTP_KEEPALIVE_EXPIRY,
+            ttl_dns_cache=300))
+        _llm_session_loop = loop
+    return _llm_session
+
+
+async def close_http_clients():
+    """Close the shared clients; called when a worker shuts down."""
+    global _http_client, _llm_session
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _llm_session is not None:
+        await _llm_session.close()
+        _llm_session = None
+    logger.info("Closed shared HTTP clients.")
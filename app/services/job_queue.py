@@ -0,0 +1,269 @@
+import json
+import time
+
+import redis
+
+from app.config import (
+    JOB_VISIBILITY_TIMEOUT,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF,
+    JOB_RESULT_TTL,
+    async_redis_client,
+)
+from app.status_manager import update_status, update_unfinished_archive_statuses
+from app.utils import logger
+
+
+QUEUE_KEY_PREFIX = "migration:queue"
+PENDING_KEY = f"{QUEUE_KEY_PREFIX}:pending"
+PROCESSING_KEY = f"{QUEUE_KEY_PREFIX}:processing"
+DELAYED_KEY = f"{QUEUE_KEY_PREFIX}:delayed"
+DEAD_KEY = f"{QUEUE_KEY_PREFIX}:dead"
+JOB_KEY_PREFIX = f"{QUEUE_KEY_PREFIX}:job:"
+
+# Atomically move the oldest pending job into the processing set with a
+# visibility deadline and count the attempt.
+CLAIM_SCRIPT = """
+local job_id = redis.call('RPOP', KEYS[1])
+if not job_id then
+    return nil
+end
+redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+redis.call('HINCRBY', ARGV[2] .. job_id, 'attempts', 1)
+redis.call('HSET', ARGV[2] .. job_id, 'state', 'processing')
+return job_id
+"""
+
+# Take jobs out of the pending list and the delayed set so that they can be
+# submitted again, unless one of them is being processed; returns the id of
+# that job.
+RESERVE_SCRIPT = """
+for _, job_id in ipairs(ARGV) do
+    if redis.call('ZSCORE', KEYS[1], job_id) then
+        return job_id
+    end
+end
+for _, job_id in ipairs(ARGV) do
+    redis.call('LREM', KEYS[2], 0, job_id)
+    redis.call('ZREM', KEYS[3], job_id)
+end
+return false
+"""
+
+# Replace a job's payload and queue it, unless it is being processed.
+ENQUEUE_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+redis.call('DEL', KEYS[4])
+redis.call('HSET', KEYS[4], 'payload', ARGV[2], 'attempts', 0,
+           'state', 'pending', 'enqueued_at', ARGV[3])
+redis.call('LREM', KEYS[2], 0, ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+if ARGV[4] == '1' then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+else
+    redis.call('LPUSH', KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+# Requeue jobs whose visibility deadline passed (the worker died or hung)
+# and release delayed retries whose backoff elapsed.
+REAP_SCRIPT = """
+local now = tonumber(ARGV[1])
+local requeued = 0
+local dead = {}
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now)
+for _, job_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], job_id)
+    local attempts = tonumber(redis.call('HGET', ARGV[2] .. job_id, 'attempts') or '0')
+    if attempts >= tonumber(ARGV[3]) then
+        redis.call('HSET', ARGV[2] .. job_id, 'state', 'dead', 'error', 'visibility timeout expired')
+        redis.call('LPUSH', KEYS[4], job_id)
+        table.insert(dead, job_id)
+    else
+        redis.call('HSET', ARGV[2] .. job_id, 'state', 'pending')
+        redis.call('LPUSH', KEYS[2], job_id)
+        requeued = requeued + 1
+    end
+end
+local ready = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now)
+for _, job_id in ipairs(ready) do
+    redis.call('ZREM', KEYS[3], job_id)
+    redis.call('HSET', ARGV[2] .. job_id, 'state', 'pending')
+    redis.call('LPUSH', KEYS[2], job_id)
+    requeued = requeued + 1
+end
+return {requeued, dead}
+"""
+
+
+class PermanentJobError(Exception):
+    """Raised by a job for failures that retrying cannot fix."""
+
+
+class JobInProgressError(Exception):
+    """Raised when a job is submitted again while a worker is running it."""
+
+    def __init__(self, job_id):
+        super().__init__(f"Job {job_id} is being processed")
+        self.job_id = job_id
+
+
+class Job:
+    def __init__(self, job_id, payload, attempts):
+        self.job_id = job_id
+        self.payload = payload
+        self.attempts = attempts
+
+
+class JobQueue:
+    """
+    Durable job queue on Redis with visibility timeouts and retries.
+
+    Pending job ids live in a list, claimed jobs in a sorted set scored by
+    their visibility deadline. A job that is neither acknowledged nor
+    extended before its deadline is handed to another worker. Failed jobs
+    are retried with exponential backoff up to max_attempts, then moved to
+    the dead-letter list.
+    """
+
+    def __init__(self, visibility_timeout=JOB_VISIBILITY_TIMEOUT,
+                 max_attempts=JOB_MAX_ATTEMPTS, retry_backoff=JOB_RETRY_BACKOFF,
+                 result_ttl=JOB_RESULT_TTL):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.result_ttl = result_ttl
+        self._claim = async_redis_client.register_script(CLAIM_SCRIPT)
+        self._reserve = async_redis_client.register_script(RESERVE_SCRIPT)
+        self._enqueue = async_redis_client.register_script(ENQUEUE_SCRIPT)
+        self._reap = async_redis_client.register_script(REAP_SCRIPT)
+
+    def _job_key(self, job_id):
+        return f"{JOB_KEY_PREFIX}{job_id}"
+
+    async def reserve(self, *job_ids):
+        """
+        Prepare jobs for re-submission: take them out of the pending and
+        delayed queues, so that no worker claims them while their checkpoints
+        are reset. Enqueue them afterwards.
+
+        :raises JobInProgressError: If a worker is running one of the jobs;
+            none of them is touched then
+        """
+        running = await self._reserve(
+            keys=[PROCESSING_KEY, PENDING_KEY, DELAYED_KEY], args=list(job_ids))
+        if running is not None:
+            raise JobInProgressError(running)
+
+    async def enqueue(self, job_id, payload):
+        """
+        Queue a job. The job id doubles as the status key, so a request
+        re-submitted with the same file_uuid replaces the previous payload.
+        Jobs with a positive priority are claimed before the other pending
+        jobs.
+
+        :raises JobInProgressError: If a worker is running the job
+        """
+        queued = await self._enqueue(
+            keys=[PROCESSING_KEY, PENDING_KEY, DELAYED_KEY, self._job_key(job_id)],
+            args=[job_id, json.dumps(payload), time.time(),
+                  "1" if (payload.get("priority") or 0) > 0 else "0"])
+        if not queued:
+            raise JobInProgressError(job_id)
+
+        await update_status(job_id, "Queued", "0%")
+        logger.info(f"Queued job {job_id}.")
+
+    async def _update_statuses(self, job_id, status, percentage):
+        """
+        Set the status of a job and, for a batch, of its unfinished archives,
+        whose own failures are left to the queue.
+        """
+        await update_status(job_id, status, percentage)
+        await update_unfinished_archive_statuses(job_id, status, percentage)
+
+    async def claim(self):
+        """
+        Claim the next pending job, or return None when the queue is empty.
+        """
+        deadline = time.time() + self.visibility_timeout
+        job_id = await self._claim(keys=[PENDING_KEY, PROCESSING_KEY],
+                                   args=[deadline, JOB_KEY_PREFIX])
+        if job_id is None:
+            return None
+
+        data = await async_redis_client.hgetall(self._job_key(job_id))
+        if not data.get("payload"):
+            logger.error(f"Job {job_id} has no payload, dropping it.")
+            await async_redis_client.zrem(PROCESSING_KEY, job_id)
+            return None
+
+        return Job(job_id, json.loads(data["payload"]), int(data.get("attempts", 1)))
+
+    async def extend(self, job):
+        """
+        Push the visibility deadline of a running job forward.
+        """
+        deadline = time.time() + self.visibility_timeout
+        return bool(await async_redis_client.zadd(
+            PROCESSING_KEY, {job.job_id: deadline}, xx=True, ch=True))
+
+    async def ack(self, job):
+        pipe = async_redis_client.pipeline()
+        pipe.zrem(PROCESSING_KEY, job.job_id)
+        pipe.hset(self._job_key(job.job_id), mapping={
+            "state": "done", "finished_at": time.time()})
+        pipe.expire(self._job_key(job.job_id), self.result_ttl)
+        await pipe.execute()
+        logger.info(f"Job {job.job_id} completed.")
+
+    async def fail(self, job, error, retryable=True):
+        """
+        Record a failed attempt and schedule a retry or dead-letter the job.
+        """
+        pipe = async_redis_client.pipeline()
+        pipe.zrem(PROCESSING_KEY, job.job_id)
+
+        if retryable and job.attempts < self.max_attempts:
+            delay = self.retry_backoff * (2 ** (job.attempts - 1))
+            pipe.hset(self._job_key(job.job_id), mapping={
+                "state": "delayed", "error": str(error)})
+            pipe.zadd(DELAYED_KEY, {job.job_id: time.time() + delay})
+            await pipe.execute()
+            await self._update_statuses(job.job_id, "Retrying", "0%")
+            logger.warning(f"Job {job.job_id} failed (attempt {job.attempts}/{
+                           self.max_attempts}), retrying in {delay}s: {error}")
+        else:
+            pipe.hset(self._job_key(job.job_id), mapping={
+                "state": "dead", "error": str(error), "finished_at": time.time()})
+            pipe.expire(self._job_key(job.job_id), self.result_ttl)
+            pipe.lpush(DEAD_KEY, job.job_id)
+            await pipe.execute()
+            await self._update_statuses(job.job_id, "Failed", "")
+            logger.error(f"Job {job.job_id} failed permanently after {
+                         job.attempts} attempt(s): {error}")
+
+    async def reap(self):
+        """
+        Requeue expired and delayed jobs. Safe to call from every worker.
+        """
+        try:
+            requeued, dead = await self._reap(
+                keys=[PROCESSING_KEY, PENDING_KEY, DELAYED_KEY, DEAD_KEY],
+                args=[time.time(), JOB_KEY_PREFIX, self.max_attempts])
+        except redis.RedisError as e:
+            logger.error(f"Failed to reap job queue: {e}")
+            return 0
+
+        for job_id in dead:
+            await self._update_statuses(job_id, "Failed", "")
+            logger.error(f"Job {job_id} timed out on its last attempt.")
+        if requeued:
+            logger.info(f"Requeued {requeued} job(s).")
+        return requeued
+
+
+job_queue = JobQueue()
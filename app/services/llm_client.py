@@ -0,0 +1,478 @@
+import asyncio
+import contextvars
+import json
+import random
+import re
+import time
+
+import openai
+from openai import error as openai_error
+
+from app.config import (
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_STREAMING_ENABLED,
+    LLM_STREAM_PREAMBLE_LIMIT,
+    LLM_MALFORMED_RETRIES,
+)
+from app.services.http_clients import get_llm_session
+from app.utils import estimate_tokens, logger
+from app.utils.metrics import observe_stage, record_llm_request, stage
+from app.utils.tokens import CHARS_PER_TOKEN
+
+
+RETRYABLE_ERRORS = (
+    openai_error.RateLimitError,
+    openai_error.APIError,
+    openai_error.Timeout,
+    openai_error.TryAgain,
+    openai_error.APIConnectionError,
+    openai_error.ServiceUnavailableError,
+)
+
+SQL_FIELD = re.compile(r'"sql"\s*:\s*')
+STRING_SPECIAL = re.compile(r'["\\]')
+SHORT_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f",
+                 "n": "\n", "r": "\r", "t": "\t"}
+
+# Called with the estimated completed fraction of a streamed completion, set
+# by the caller that wants to report progress.
+completion_progress = contextvars.ContextVar("completion_progress", default=None)
+
+
+class MalformedCompletionError(Exception):
+    """Raised when a completion does not contain a JSON object with an
+    "sql" string."""
+
+
+class TruncatedCompletionError(MalformedCompletionError):
+    """Raised when a completion was cut off at max_tokens."""
+
+
+class SqlFieldParser:
+    """
+    Incremental extractor for the "sql" string of the JSON object in a
+    completion. Text is fed as it arrives; malformed output is reported as
+    soon as it is detected rather than at the end of the completion.
+    """
+
+    def __init__(self, preamble_limit=LLM_STREAM_PREAMBLE_LIMIT):
+        self.preamble_limit = preamble_limit
+        self.done = False
+        self._buffer = ""
+        self._position = 0
+        self._object_start = None
+        self._in_string = False
+        self._parts = []
+
+    @property
+    def sql(self):
+        return "".join(self._parts)
+
+    def feed(self, text):
+        if self.done:
+            return
+        self._buffer += text
+
+        if self._object_start is None:
+            start = self._buffer.find("{")
+            if start == -1:
+                if len(self._buffer) > self.preamble_limit:
+                    raise MalformedCompletionError("No JSON object in the completion")
+                return
+            self._object_start = self._position = start + 1
+
+        if not self._in_string:
+            match = SQL_FIELD.search(self._buffer, self._position)
+            if match is None or match.end() == len(self._buffer):
+                if len(self._buffer) - self._object_start > self.preamble_limit:
+                    raise MalformedCompletionError("No \"sql\" field in the completion")
+                return
+            if self._buffer[match.end()] != '"':
+                raise MalformedCompletionError("The \"sql\" field is not a string")
+            self._in_string = True
+            self._position = match.end() + 1
+
+        self._read_string()
+
+    def _read_string(self):
+        buffer = self._buffer
+        while True:
+            match = STRING_SPECIAL.search(buffer, self._position)
+            if match is None:
+                self._parts.append(buffer[self._position:])
+                self._position = len(buffer)
+                return
+
+            self._parts.append(buffer[self._position:match.start()])
+            self._position = match.start()
+            if match.group() == '"':
+                self.done = True
+                return
+
+            escape = buffer[self._position + 1:self._position + 2]
+            if not escape:
+                return
+            if escape == "u":
+                sequence = buffer[self._position:self._position + 6]
+                if len(sequence) < 6:
+                    return
+                try:
+                    self._parts.append(json.loads(f'"{sequence}"'))
+                except json.JSONDecodeError:
+                    raise MalformedCompletionError(f"Invalid escape {sequence}")
+                self._position += 6
+            elif escape in SHORT_ESCAPES:
+                self._parts.append(SHORT_ESCAPES[escape])
+                self._position += 2
+            else:
+                raise MalformedCompletionError(f"Invalid escape \\{escape}")
+
+
+def extract_sql(text):
+    """
+    Return the "sql" string of the JSON object in a complete response.
+
+    :raises MalformedCompletionError: If there is no such string
+    """
+    parser = SqlFieldParser(preamble_limit=len(text))
+    parser.feed(text)
+    if not parser.done:
+        raise MalformedCompletionError("The completion ended inside the JSON object")
+    return parser.sql
+
+
+def extract_json_object(text):
+    """
+    Return the first JSON object in a complete response, parsed.
+
+    :raises MalformedCompletionError: If there is no such object
+    """
+    start = text.find("{")
+    if start == -1:
+        raise MalformedCompletionError("No JSON object in the completion")
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, start)
+    except json.JSONDecodeError as e:
+        raise MalformedCompletionError(f"Invalid JSON object in the completion: {e}")
+    return value
+
+
+class TokenBucket:
+    """
+    Bucket holding up to one minute's worth of capacity, refilled
+    continuously at rate_per_minute.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount):
+        """Seconds until amount can be taken from the bucket."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        """Take amount from the bucket; a negative amount gives it back."""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class AdaptiveRateLimiter:
+    """
+    Admission control for LLM calls, shared by all converters of a process.
+
+    A call is admitted when both the requests-per-minute and the
+    tokens-per-minute buckets have room for it and fewer than `limit` calls
+    are in flight. The limit grows by one call per `limit` successful calls
+    up to max_concurrency, halves on every rate-limit response, and a
+    Retry-After from the API pauses all admissions.
+    """
+
+    def __init__(self, requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                 max_concurrency=LLM_MAX_CONCURRENCY):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, tokens):
+        async with self._condition:
+            while True:
+                wait = max(self._paused_until - time.monotonic(),
+                           self.requests.delay(1), self.tokens.delay(tokens))
+                if self.in_flight < int(self.limit) and wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    self.in_flight += 1
+                    return
+
+                try:
+                    await asyncio.wait_for(self._condition.wait(),
+                                           wait if wait > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, estimated_tokens, used_tokens=None, rate_limited=False):
+        async with self._condition:
+            self.in_flight -= 1
+            if used_tokens is not None:
+                self.tokens.take(used_tokens - estimated_tokens)
+
+            previous = int(self.limit)
+            if rate_limited:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            if int(self.limit) < previous:
+                logger.info(f"Rate limited, LLM concurrency limit {previous} -> {
+                            int(self.limit)}.")
+            elif int(self.limit) > previous:
+                logger.debug(f"LLM concurrency limit raised to {int(self.limit)}.")
+            self._condition.notify_all()
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def _retry_delay(error, attempt):
+    """
+    Full-jitter exponential backoff, or the server's Retry-After plus a
+    little jitter when it sends one.
+    """
+    headers = getattr(error, "headers", None) or {}
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after) + random.uniform(0, LLM_RETRY_BASE_DELAY)
+        except ValueError:
+            pass
+
+    ceiling = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+def _used_tokens(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return usage.get("total_tokens")
+
+
+async def _call_with_retries(kwargs, call):
+    """
+    Run call(estimated_tokens) through the shared rate limiter, retrying
+    rate-limit, timeout and server errors with backoff. call returns its
+    result and the tokens actually used (or None when unknown).
+
+    :return: call's result, or None if the call still failed after
+        LLM_MAX_RETRIES retries or failed with a non-retryable error
+    :raises MalformedCompletionError: If call raises it
+    """
+    model = kwargs.get("model")
+    prompt = " ".join(message["content"] for message in kwargs.get("messages", []))
+    estimated = estimate_tokens(prompt, model) + kwargs.get("max_tokens", 0)
+
+    # openai reads its session from a context variable, which would stay set
+    # in the caller's context; it is reset once the call is done.
+    session = openai.aiosession.set(get_llm_session())
+    try:
+        attempt = 0
+        while True:
+            attempt += 1
+            with stage("llm_queue"):
+                await llm_rate_limiter.acquire(estimated)
+            started = time.perf_counter()
+            try:
+                with stage("llm_call", model=model, attempt=attempt):
+                    result, used_tokens = await call(estimated)
+            except RETRYABLE_ERRORS as e:
+                rate_limited = isinstance(e, openai_error.RateLimitError)
+                record_llm_request(model, "rate_limited" if rate_limited else "error",
+                                   time.perf_counter() - started)
+                await llm_rate_limiter.release(estimated, rate_limited=rate_limited)
+                if attempt > LLM_MAX_RETRIES:
+                    logger.error(f"LLM call failed after {attempt} attempts: {e}")
+                    return None
+
+                delay = _retry_delay(e, attempt)
+                if rate_limited:
+                    llm_rate_limiter.pause(delay)
+                logger.warning(f"LLM call failed (attempt {attempt}), retrying in {
+                               delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException as e:
+                outcome = "malformed" if isinstance(e, MalformedCompletionError) else "error"
+                record_llm_request(model, outcome, time.perf_counter() - started)
+                await llm_rate_limiter.release(estimated)
+                # Malformed completions are retried by the caller; cancellation
+                # must reach it as well.
+                if isinstance(e, MalformedCompletionError) or not isinstance(e, Exception):
+                    raise
+                logger.error(f"LLM call failed with a non-retryable error: {e!r}")
+                return None
+
+            # Successful requests are recorded by call, which knows their usage.
+            await llm_rate_limiter.release(estimated, used_tokens)
+            return result
+    finally:
+        openai.aiosession.reset(session)
+
+
+async def chat_completion(**kwargs):
+    """
+    Call openai.ChatCompletion.acreate through the shared rate limiter,
+    retrying rate-limit, timeout and server errors with backoff.
+
+    :return: The response, or None if the call still failed after
+        LLM_MAX_RETRIES retries or failed with a non-retryable error
+    """
+    async def call(_estimated):
+        started = time.perf_counter()
+        response = await openai.ChatCompletion.acreate(**kwargs)
+        usage = getattr(response, "usage", None) or {}
+        record_llm_request(kwargs.get("model"), "ok", time.perf_counter() - started,
+                           usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        return response, _used_tokens(response)
+
+    return await _call_with_retries(kwargs, call)
+
+
+async def _stream_sql(kwargs, estimated):
+    parser = SqlFieldParser()
+    progress = completion_progress.get()
+    max_tokens = kwargs.get("max_tokens") or 0
+    received = 0
+    finish_reason = None
+    parse_seconds = 0.0
+    started = time.perf_counter()
+
+    stream = await openai.ChatCompletion.acreate(stream=True, **kwargs)
+    try:
+        async for chunk in stream:
+            finish_reason = chunk["choices"][0].get("finish_reason") or finish_reason
+            text = chunk["choices"][0]["delta"].get("content") or ""
+            received += len(text)
+            parse_started = time.perf_counter()
+            try:
+                parser.feed(text)
+            finally:
+                parse_seconds += time.perf_counter() - parse_started
+            if parser.done:
+                break
+            if progress is not None and max_tokens:
+                progress(min(0.99, received / CHARS_PER_TOKEN / max_tokens))
+    finally:
+        close = getattr(stream, "aclose", None)
+        if close is not None:
+            await close()
+        observe_stage("response_parse", parse_seconds)
+
+    if not parser.done:
+        if finish_reason == "length":
+            raise TruncatedCompletionError("The completion ended inside the sql string")
+        raise MalformedCompletionError("The completion ended inside the sql string")
+    # Streams carry no usage, so the prompt tokens are the estimate.
+    prompt_tokens = estimated - max_tokens
+    record_llm_request(kwargs.get("model"), "ok", time.perf_counter() - started,
+                       prompt_tokens, received // CHARS_PER_TOKEN)
+    return parser.sql, prompt_tokens + received // CHARS_PER_TOKEN
+
+
+async def complete_sql(**kwargs):
+    """
+    Request a completion containing {"sql": "..."} and return the SQL.
+
+    With LLM_STREAMING_ENABLED the completion is streamed and parsed while
+    it arrives: the stream is closed as soon as the sql string is complete,
+    and malformed output aborts the request early. Malformed completions are
+    retried LLM_MALFORMED_RETRIES times, unless they were cut off at
+    max_tokens.
+
+    :return: The SQL, or None if no attempt produced a valid completion
+    """
+    # Payloads are truncated unless LOG_PAYLOADS is set.
+    logger.debug(f"LLM prompt for {kwargs.get('model')}",
+                 extra={"payload": kwargs["messages"][-1]["content"]})
+    for attempt in range(1, LLM_MALFORMED_RETRIES + 2):
+        try:
+            if LLM_STREAMING_ENABLED:
+                sql = await _call_with_retries(
+                    kwargs, lambda estimated: _stream_sql(kwargs, estimated))
+            else:
+                response = await chat_completion(**kwargs)
+                if response is None:
+                    return None
+                with stage("response_parse"):
+                    choice = response.choices[0]
+                    try:
+                        sql = extract_sql(choice.message['content'])
+                    except MalformedCompletionError as e:
+                        if choice.get("finish_reason") == "length":
+                            raise TruncatedCompletionError(str(e))
+                        raise
+            logger.debug("LLM completion", extra={"payload": sql})
+            return sql
+        except TruncatedCompletionError as e:
+            # The same request would be cut off again.
+            logger.warning(f"Completion truncated at {kwargs.get('max_tokens')} tokens: {e}")
+            return None
+        except MalformedCompletionError as e:
+            logger.warning(f"Malformed completion (attempt {attempt}): {e}")
+
+    logger.error(f"No valid completion after {LLM_MALFORMED_RETRIES + 1} attempts.")
+    return None
+
+
+async def complete_json(**kwargs):
+    """
+    Request a completion containing one JSON object and return it parsed.
+    The completion is not streamed, since the object is only usable once
+    complete; malformed completions are retried like in complete_sql.
+
+    :return: The object, or None if no attempt produced a valid completion
+    """
+    logger.debug(f"LLM prompt for {kwargs.get('model')}",
+                 extra={"payload": kwargs["messages"][-1]["content"]})
+    for attempt in range(1, LLM_MALFORMED_RETRIES + 2):
+        response = await chat_completion(**kwargs)
+        if response is None:
+            return None
+        choice = response.choices[0]
+        try:
+            with stage("response_parse"):
+                value = extract_json_object(choice.message['content'])
+            logger.debug("LLM completion", extra={"payload": value})
+            return value
+        except MalformedCompletionError as e:
+            if choice.get("finish_reason") == "length":
+                logger.warning(
+                    f"Completion truncated at {kwargs.get('max_tokens')} tokens: {e}")
+                return None
+            logger.warning(f"Malformed completion (attempt {attempt}): {e}")
+
+    logger.error(f"No valid completion after {LLM_MALFORMED_RETRIES + 1} attempts.")
+    return None
+
+
+llm_rate_limiter = AdaptiveRateLimiter()
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import time
+import zipfile
+
+from botocore.exceptions import ClientError
+
+from app.config import S3_BUCKET_NAME, S3_BUCKET_PATH
+from app.services.checkpoint_service import MEMBER_DONE
+from app.services.s3_reader import S3RangeReader, read_raw_member
+from app.utils import logger
+
+
+MANIFEST_FORMAT_VERSION = 1
+
+
+def output_key(file_uuid):
+    return f"{S3_BUCKET_PATH}{file_uuid}.zip"
+
+
+def manifest_key(file_uuid):
+    return f"{S3_BUCKET_PATH}{file_uuid}.manifest.json"
+
+
+def content_hash(content):
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class ArchiveManifest:
+    """
+    Member paths and content hashes of a converted archive, stored next to
+    the output zip so a later job can use it as a baseline.
+    """
+
+    def __init__(self, file_uuid, converter_version, baseline_file_uuid=None):
+        self.file_uuid = file_uuid
+        self.converter_version = converter_version
+        self.baseline_file_uuid = baseline_file_uuid
+        self.members = {}
+
+    def record(self, path, sha256, status, output=None):
+        entry = {"sha256": sha256, "status": status}
+        if output is not None:
+            entry["output"] = output
+        self.members[path] = entry
+
+    def to_json(self):
+        return json.dumps({
+            "format_version": MANIFEST_FORMAT_VERSION,
+            "file_uuid": self.file_uuid,
+            "converter_version": self.converter_version,
+            "baseline_file_uuid": self.baseline_file_uuid,
+            "created_at": time.time(),
+            "members": dict(sorted(self.members.items())),
+        }, indent=2)
+
+    def upload(self, s3_client):
+        key = manifest_key(self.file_uuid)
+        s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=key,
+                             Body=self.to_json().encode("utf-8"),
+                             ContentType="application/json")
+        logger.info(f"Uploaded manifest with {len(self.members)} members to s3://{
+                    S3_BUCKET_NAME}/{key}.")
+
+
+class BaselineArchive:
+    """
+    The manifest and output zip of a previous job. Members whose path and
+    content hash match the manifest are copied from the output zip as they
+    are, still compressed.
+    """
+
+    def __init__(self, file_uuid, members, reader, zip_file):
+        self.file_uuid = file_uuid
+        self.members = members
+        self.reader = reader
+        self.zip_file = zip_file
+
+    @classmethod
+    def open(cls, s3_client, file_uuid, converter_version):
+        """
+        Open the baseline, or return None when it cannot be used, in which
+        case every member is converted.
+        """
+        try:
+            response = s3_client.get_object(
+                Bucket=S3_BUCKET_NAME, Key=manifest_key(file_uuid))
+            manifest = json.loads(response["Body"].read())
+        except ClientError as e:
+            logger.warning(f"Baseline manifest for {file_uuid} not available: {e}")
+            return None
+
+        if manifest.get("converter_version") != converter_version:
+            logger.warning(f"Baseline {file_uuid} was converted with {
+                           manifest.get('converter_version')}, converting all members.")
+            return None
+
+        try:
+            reader = S3RangeReader(s3_client, S3_BUCKET_NAME, output_key(file_uuid))
+            zip_file = zipfile.ZipFile(reader, "r")
+        except (ClientError, zipfile.BadZipFile) as e:
+            logger.warning(f"Baseline output for {file_uuid} not available: {e}")
+            return None
+        logger.info(f"Using baseline {file_uuid} with {
+                    len(manifest['members'])} members.")
+        return cls(file_uuid, manifest["members"], reader, zip_file)
+
+    def unchanged(self, path, sha256):
+        """
+        Return the output member name for an unchanged, converted member,
+        otherwise None.
+        """
+        entry = self.members.get(path)
+        if entry is None or entry.get("sha256") != sha256:
+            return None
+        if entry.get("status") != MEMBER_DONE:
+            return None
+        if entry.get("output") not in self.zip_file.NameToInfo:
+            return None
+        return entry["output"]
+
+    def read_raw(self, output):
+        """
+        Return the ZipInfo and compressed bytes of an output member.
+        """
+        zip_info = self.zip_file.getinfo(output)
+        return zip_info, read_raw_member(self.reader, zip_info)
+
+    def close(self):
+        self.zip_file.close()
@@ -0,0 +1,445 @@
+import asyncio
+import time
+import zipfile
+
+from app.config import (
+    WEBAPP_URL,
+    S3_BUCKET_NAME,
+    S3_BUCKET_PATH,
+    MIGRATION_CONCURRENCY,
+    s3_client,
+)
+from app.schemas import ConvertBatchRequest, ConvertFileRequest
+from app.services.checkpoint_service import (
+    JobCheckpoint,
+    MEMBER_DONE,
+    MEMBER_FAILED,
+    MEMBER_SKIPPED,
+)
+from app.services.hedging import HedgeBudget, hedge_budget
+from app.services.job_queue import PermanentJobError
+from app.services.llm_client import completion_progress
+from app.services.manifest_service import (
+    ArchiveManifest,
+    BaselineArchive,
+    content_hash,
+    output_key,
+)
+from app.services.migration_service import (
+    CONVERTER_VERSION,
+    convert_function_to_snowflake,
+    convert_schema_to_snowflake,
+    convert_view_into_snowflake,
+)
+from app.services.s3_reader import S3RangeReader, parse_s3_link
+from app.services.scheduler import conversion_scheduler, scheduled_job
+from app.services.s3_writer import S3MultipartWriter, StreamingZipWriter
+from app.services.webapp_client import webapp_client
+from app.status_manager import (
+    reset_member_statuses,
+    status_writer,
+    update_status,
+)
+from app.utils import logger
+from app.utils.metrics import MEMBERS_TOTAL, job_trace, stage
+
+
+SKIPPED = object()
+
+# Minimum seconds between progress updates; member status changes are
+# batched into these updates.
+PROGRESS_UPDATE_INTERVAL = 1.0
+
+# Member statuses published in addition to the checkpoint statuses.
+MEMBER_PENDING = "pending"
+MEMBER_CONVERTING = "converting"
+MEMBER_REUSED = "reused"
+
+
+async def convert_member(file_name, file_content):
+    """
+    Convert a single archive member based on its file extension.
+    Returns SKIPPED for members with an unsupported extension.
+    """
+    file_extension = file_name.rsplit('.', 1)[-1].lower()
+
+    if file_extension == "calculationview" or file_extension == "xml":
+        return await convert_view_into_snowflake(file_content)
+    elif file_extension == "hdbdd":
+        return await convert_schema_to_snowflake(file_content)
+    elif file_extension == "hdbscalarfunction":
+        return await convert_function_to_snowflake(file_content)
+
+    logger.warning(f"Unknown file extension '{
+                   file_extension}', skipping.")
+    return SKIPPED
+
+
+class SharedConversions:
+    """
+    Member conversions of one job or batch: at most `concurrency` run at
+    once, within the slots conversion_scheduler assigns to the job, and
+    members with the same extension and content are converted once, however
+    many archives contain them.
+    """
+
+    def __init__(self, name, concurrency, priority=None):
+        self.concurrency = concurrency
+        self.slots = asyncio.Semaphore(concurrency)
+        self.scheduled = conversion_scheduler.job(name, priority)
+        self.deduplicated = 0
+        self._conversions = {}
+
+    async def _convert(self, file_name, file_content):
+        async with self.slots, conversion_scheduler.slot(self.scheduled):
+            scheduled_job.set(self.scheduled)
+            logger.info(f"Processing file: {file_name}")
+            return await convert_member(file_name, file_content)
+
+    async def convert(self, file_name, digest, file_content):
+        """Convert a member, or wait for the conversion of an identical one."""
+        key = (file_name.rsplit('.', 1)[-1].lower(), digest)
+        conversion = self._conversions.get(key)
+        if conversion is None:
+            conversion = asyncio.ensure_future(self._convert(file_name, file_content))
+            self._conversions[key] = conversion
+        else:
+            self.deduplicated += 1
+            logger.info(f"File {file_name} has the content of an earlier member, "
+                        f"reusing its conversion.")
+        # One archive failing must not cancel the conversion the others
+        # share.
+        return await asyncio.shield(conversion)
+
+    def cancel(self):
+        """Cancel the conversions that are still running."""
+        for conversion in self._conversions.values():
+            conversion.cancel()
+
+
+async def convert_archive(request, checkpoint, members, shared=None):
+    """
+    Convert the archive members that are not already in the checkpoint,
+    stream the output zip and its manifest to S3 and return the zip's S3 URI.
+
+    When the request names a baseline, members whose content is unchanged
+    since the baseline are copied from the baseline's output zip instead of
+    being converted.
+
+    :param shared: SharedConversions of the batch the archive belongs to
+    """
+    try:
+        bucket_name, s3_key = parse_s3_link(request.s3_link)
+    except ValueError as e:
+        raise PermanentJobError(str(e))
+    logger.info(f"Extracted bucket: {bucket_name}, key: {s3_key}")
+
+    try:
+        with stage("s3_download"):
+            reader = await asyncio.to_thread(
+                S3RangeReader, s3_client, bucket_name, s3_key)
+            zip_ref = await asyncio.to_thread(zipfile.ZipFile, reader, "r")
+    except Exception as e:
+        logger.error(f"Failed to open ZIP file from S3: {e}")
+        raise
+
+    await asyncio.to_thread(s3_client.put_object, Bucket=S3_BUCKET_NAME, Key=S3_BUCKET_PATH)
+    logger.info(f"Folder '{S3_BUCKET_PATH}' created in bucket '{
+                S3_BUCKET_NAME}'.")
+
+    baseline = None
+    if request.baseline_file_uuid:
+        with stage("s3_download"):
+            baseline = await asyncio.to_thread(
+                BaselineArchive.open, s3_client, request.baseline_file_uuid,
+                CONVERTER_VERSION)
+
+    converted_zip_key = output_key(request.file_uuid)
+    upload = S3MultipartWriter(s3_client, S3_BUCKET_NAME, converted_zip_key)
+    output = StreamingZipWriter(upload)
+    manifest = ArchiveManifest(request.file_uuid, CONVERTER_VERSION,
+                               request.baseline_file_uuid)
+
+    try:
+        with zip_ref:
+            file_list = [f for f in zip_ref.infolist() if not f.is_dir()]
+            total_files = len(file_list)
+            own_conversions = shared is None
+            if own_conversions:
+                shared = SharedConversions(
+                    request.file_uuid, max(1, request.concurrency or MIGRATION_CONCURRENCY),
+                    request.priority)
+            concurrency = shared.concurrency
+            # Members are fetched ahead of the conversions, bounded so that
+            # only a limited number of fetched members wait in memory.
+            fetch_slots = asyncio.Semaphore(2 * concurrency)
+            completed = 0
+            restored = 0
+            reused = 0
+            # Estimated completed fraction of members still being converted.
+            partial = {}
+            last_update = 0.0
+            member_updates = {}
+            await reset_member_statuses(request.file_uuid, {
+                zip_info.filename: MEMBER_PENDING for zip_info in file_list})
+            logger.info(f"Converting {total_files} files with concurrency {
+                        concurrency}.")
+
+            async def read_member(zip_info):
+                with stage("s3_download"):
+                    await asyncio.to_thread(reader.prefetch_member, zip_info)
+                with stage("unzip"):
+                    return await asyncio.to_thread(zip_ref.read, zip_info)
+
+            def publish_progress(force=False):
+                nonlocal last_update, member_updates
+                now = time.monotonic()
+                if not force and now - last_update < PROGRESS_UPDATE_INTERVAL:
+                    return
+                last_update = now
+                done = completed + sum(partial.values())
+                changed, member_updates = member_updates, {}
+                status_writer.update(request.file_uuid, 'In Progress',
+                                     f"{int((done / total_files) * 100)}%", changed)
+
+            def member_progress(index):
+                def report(fraction):
+                    partial[index] = max(fraction, partial.get(index, 0.0))
+                    publish_progress()
+                return report
+
+            async def convert_with_limit(index, zip_info):
+                nonlocal completed, restored, reused
+                filename = zip_info.filename.rsplit('.', 1)[0] + ".sql"
+                entry = checkpoint.restorable(zip_info, members)
+                if entry is not None and entry.get("reused") and baseline is None:
+                    entry = None
+                baseline_output = None
+
+                if entry is not None:
+                    restored += 1
+                    digest = entry.get("sha256")
+                    if entry.get("reused"):
+                        baseline_output = entry["output"]
+                    converted_content = entry.get("sql", SKIPPED)
+                else:
+                    async with fetch_slots:
+                        file_content = await read_member(zip_info)
+                        digest = content_hash(file_content)
+                        if baseline is not None:
+                            baseline_output = baseline.unchanged(
+                                zip_info.filename, digest)
+
+                        if baseline_output is None:
+                            member_updates[zip_info.filename] = MEMBER_CONVERTING
+                            completion_progress.set(member_progress(index))
+                            try:
+                                converted_content = await shared.convert(
+                                    zip_info.filename, digest, file_content)
+                            except Exception as e:
+                                # One member must not fail the archive; it
+                                # is recorded as failed and retried on resume.
+                                logger.error(f"Failed to convert {zip_info.filename}: {e!r}")
+                                converted_content = None
+
+                    if baseline_output is not None:
+                        await checkpoint.record_member(
+                            zip_info, MEMBER_DONE, baseline_output,
+                            sha256=digest, reused=True)
+                    elif converted_content is SKIPPED:
+                        await checkpoint.record_member(
+                            zip_info, MEMBER_SKIPPED, sha256=digest)
+                    elif converted_content is None:
+                        await checkpoint.record_member(
+                            zip_info, MEMBER_FAILED, sha256=digest)
+                    else:
+                        await checkpoint.record_member(
+                            zip_info, MEMBER_DONE, filename, converted_content,
+                            sha256=digest)
+
+                if baseline_output is not None:
+                    reused += 1
+                    with stage("s3_download"):
+                        source_info, compressed = await asyncio.to_thread(
+                            baseline.read_raw, baseline_output)
+                    with stage("zip_assembly"):
+                        await output.add_raw(index, baseline_output, source_info,
+                                             compressed)
+                    manifest.record(zip_info.filename, digest, MEMBER_DONE,
+                                    baseline_output)
+                    member_status = MEMBER_REUSED
+                elif converted_content is None:
+                    logger.error(f"Content for {filename} is None, skipping file.")
+                    manifest.record(zip_info.filename, digest, MEMBER_FAILED)
+                    member_status = MEMBER_FAILED
+                elif converted_content is SKIPPED:
+                    manifest.record(zip_info.filename, digest, MEMBER_SKIPPED)
+                    member_status = MEMBER_SKIPPED
+                else:
+                    with stage("zip_assembly"):
+                        await output.add(index, filename, converted_content)
+                    manifest.record(zip_info.filename, digest, MEMBER_DONE,
+                                    filename)
+                    member_status = MEMBER_DONE
+                member_updates[zip_info.filename] = member_status
+                MEMBERS_TOTAL.labels(zip_info.filename.rsplit('.', 1)[-1].lower(),
+                                     member_status).inc()
+
+                partial.pop(index, None)
+                completed += 1
+                publish_progress()
+
+            hedge_budget.set(HedgeBudget())
+            conversions = [
+                asyncio.ensure_future(convert_with_limit(index, zip_info))
+                for index, zip_info in enumerate(file_list)]
+            try:
+                await asyncio.gather(*conversions)
+            except BaseException:
+                # Stop the other members before the upload is aborted, so
+                # none of them writes to it or to the checkpoint afterwards.
+                for conversion in conversions:
+                    conversion.cancel()
+                if own_conversions:
+                    shared.cancel()
+                await asyncio.gather(*conversions, return_exceptions=True)
+                raise
+            publish_progress(force=True)
+            await status_writer.flush()
+
+        logger.info(f"Fetched {reader.bytes_fetched} of {reader.size} bytes in {
+                    reader.requests} ranged requests.")
+        if restored:
+            logger.info(f"Restored {restored} of {total_files} files from the checkpoint.")
+        if reused:
+            logger.info(f"Copied {reused} of {total_files} unchanged files from baseline {
+                        request.baseline_file_uuid}.")
+
+        if not output.members_written:
+            logger.error("No valid files to convert.")
+            raise PermanentJobError("No valid files to convert.")
+
+        logger.info("All files processed and converted.")
+
+        with stage("zip_assembly"):
+            await output.close()
+        await asyncio.to_thread(upload.close)
+    except BaseException:
+        await asyncio.to_thread(upload.abort)
+        raise
+    finally:
+        if baseline is not None:
+            baseline.close()
+
+    with stage("s3_upload"):
+        await asyncio.to_thread(manifest.upload, s3_client)
+
+    logger.info("Successfully uploaded the converted ZIP file to S3.")
+
+    s3_uri = f"s3://{S3_BUCKET_NAME}/{converted_zip_key}"
+
+    logger.info(f"Generated S3 URI: {s3_uri}")
+    return s3_uri
+
+
+async def notify_webapp(request, s3_uri):
+    """
+    Post the result webhook, authenticating against the web app if there is
+    no valid token yet.
+    """
+    payload = {
+        "file_uuid": request.file_uuid,
+        "s3_link": s3_uri
+    }
+
+    with stage("webhook"):
+        webhook_response = await webapp_client.post(WEBAPP_URL, payload)
+
+    logger.info("Webhook response: %s, %s",
+                webhook_response.status_code, webhook_response.text)
+
+
+async def process_sap_hana_file(request: ConvertFileRequest, shared=None):
+    """
+    Convert an archive and deliver the result. Runs in a worker process,
+    see app/worker.py.
+
+    Progress is checkpointed per member, so a retried or resumed job only
+    converts the members that are missing or failed and skips the upload
+    and webhook steps that already completed.
+
+    :param shared: SharedConversions of the batch the archive belongs to
+    """
+    checkpoint = JobCheckpoint(request.file_uuid)
+    try:
+        with job_trace(request.file_uuid):
+            logger.info("Starting file conversion process.")
+            await update_status(request.file_uuid, "Started", '0%')
+
+            meta, members = await checkpoint.load()
+            await checkpoint.start(request.dict())
+
+            s3_uri = meta.get("s3_uri")
+            if s3_uri:
+                logger.info(f"Converted archive already uploaded to {s3_uri}.")
+            else:
+                s3_uri = await convert_archive(request, checkpoint, members, shared)
+                await checkpoint.mark_stage("s3_uri", s3_uri)
+
+            if meta.get("webhook_sent"):
+                logger.info("Webhook already delivered.")
+            else:
+                await notify_webapp(request, s3_uri)
+                await checkpoint.mark_stage("webhook_sent")
+
+            await update_status(request.file_uuid, "Completed", "100%")
+    except Exception as e:
+        # The queue records the failure as "Retrying" or "Failed".
+        logger.error(f"An error occurred: {e}")
+        raise
+
+
+async def process_batch(request: ConvertBatchRequest):
+    """
+    Convert the archives of a batch as one job. They share one concurrency
+    limit, and a member whose content appears in several archives is
+    converted once. Each archive still gets its own checkpoint, output zip,
+    status and webhook, so a retried batch only redoes the archives that
+    did not complete.
+    """
+    archive_ids = [archive.file_uuid for archive in request.archives]
+    shared = SharedConversions(
+        request.batch_uuid, max(1, request.concurrency or MIGRATION_CONCURRENCY),
+        request.priority)
+    status_writer.track_batch(request.batch_uuid, archive_ids)
+    try:
+        logger.info(f"Starting batch {request.batch_uuid} with {len(archive_ids)} archives.")
+        await update_status(request.batch_uuid, "In Progress", "0%")
+
+        async def run_archive(archive):
+            try:
+                await process_sap_hana_file(archive, shared)
+            except PermanentJobError:
+                # Retryable failures are recorded by the queue, which knows
+                # whether the batch will be retried.
+                await update_status(archive.file_uuid, "Failed", "")
+                raise
+
+        results = await asyncio.gather(
+            *(run_archive(archive) for archive in request.archives),
+            return_exceptions=True)
+    finally:
+        status_writer.untrack_batch(archive_ids)
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    logger.info(f"Batch {request.batch_uuid}: {len(results) - len(errors)} of {
+                len(results)} archives completed, {shared.deduplicated} members "
+                f"reused the conversion of an identical member.")
+    if errors:
+        retryable = [e for e in errors if not isinstance(e, PermanentJobError)]
+        if retryable:
+            raise retryable[0]
+        raise PermanentJobError(
+            f"{len(errors)} of {len(results)} archives failed: {errors[0]}")
+
+    await update_status(request.batch_uuid, "Completed", "100%")
@@ -1,16 +1,363 @@
+import asyncio
+import contextlib
+import hashlib
 import json
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
 
 import openai
 
 
-from app.config import get_env_variable
-from app.utils import logger, convert_timestamp_to_timestamp_tz
+from app.config import (
+    get_env_variable,
+    LOCAL_VIEW_TRANSLATOR_ENABLED,
+    LOCAL_SCHEMA_TRANSLATOR_ENABLED,
+    VIEW_CHUNKING_ENABLED,
+    VIEW_CHUNK_MIN_NODES,
+    VIEW_CHUNK_CONCURRENCY,
+    LLM_MODEL_TIERS,
+)
+from app.services.cds_translator import (
+    UnsupportedSchemaError,
+    translate_cds_schema,
+    type_mapping_reference,
+)
+from app.services.cache_service import build_cache_key, conversion_cache
+from app.services.hedging import request_hedger
+from app.services.llm_client import complete_json, complete_sql
+from app.services.request_packer import RequestPacker
+from app.services.scheduler import conversion_scheduler
+from app.services.sql_rewriter import check_sql, rewrite_rules, rewrite_sql
+from app.services.view_pruner import compact_element, prune_calculation_view
+from app.services.view_translator import (
+    UnsupportedViewError,
+    check_view_supported,
+    parse_calculation_view,
+    render_node_query,
+    render_node_statement,
+    render_procedure,
+    render_result_query,
+    translate_calculation_view,
+)
+from app.utils import logger
+from app.utils.metrics import LLM_ESCALATIONS_TOTAL, stage, track_conversion
 
 
 openai.api_key = get_env_variable("API_KEY")
 
+# Bump a prompt version whenever its template changes so that cached
+# conversions produced by the old prompt are no longer served.
+VIEW_PROMPT_VERSION = "3"
+VIEW_TEMPERATURE = 0.5
+
+SCHEMA_PROMPT_VERSION = "3"
+SCHEMA_TEMPERATURE = 0.0
+
+NODE_PROMPT_VERSION = "2"
+NODE_TEMPERATURE = 0.0
+
+FUNCTION_PROMPT_VERSION = "1"
+FUNCTION_TEMPERATURE = 0.0
+
+# Prompts converting several functions or schemas in one request.
+PACK_PROMPT_VERSION = "1"
+
+# Model tiers for LLM conversions, smallest first. A member goes to the first
+# tier whose max_score is at least its complexity score; when the output fails
+# validation it is converted again on the next tier. Tiers without max_score
+# take every score, so the ones after the first of them are only reached by
+# escalation. LLM_MODEL_TIERS replaces them with a JSON list of the same
+# objects.
+MODEL_TIERS = [
+    {"name": "small", "model": "gpt-4o-mini", "max_tokens": 1024, "timeout": 30,
+     "max_score": 4},
+    {"name": "medium", "model": "gpt-4o-mini", "max_tokens": 4096, "timeout": 90,
+     "max_score": 24},
+    {"name": "large", "model": "gpt-4o-mini", "max_tokens": 16384, "timeout": 300},
+    {"name": "fallback", "model": "gpt-4o", "max_tokens": 16384, "timeout": 300},
+]
+
+NODE_PATTERN = re.compile(r"<calculationView\b")
+COLUMN_PATTERN = re.compile(
+    r"<(?:viewAttribute|calculatedViewAttribute|measure|attribute)\b"
+    r"|^[ \t]*(?:key[ \t]+)?\"?\w+\"?[ \t]*:(?!:)", re.MULTILINE)
+
+
+def complexity_score(source):
+    """
+    Score a member for routing: its size in KB, plus 2 per calculation view
+    node and 1/4 per column (view attributes, measures or CDS elements).
+    """
+    if isinstance(source, bytes):
+        source = source.decode("utf-8", errors="replace")
+    return (len(source) / 1024 + 2 * len(NODE_PATTERN.findall(source))
+            + len(COLUMN_PATTERN.findall(source)) / 4)
+
+
+@dataclass
+class ModelTier:
+    name: str
+    model: str
+    max_tokens: int
+    timeout: float
+    max_score: Optional[float] = None
+
+
+class ModelRouter:
+    """
+    Chooses the model, max_tokens and timeout of an LLM conversion from the
+    member's complexity score, escalating to the next tier when the output
+    is missing, truncated or incomplete SQL.
+    """
+
+    def __init__(self, tiers):
+        self.tiers = [ModelTier(**tier) for tier in tiers]
+        self.version = hashlib.sha256(
+            json.dumps(tiers, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+    def tier_for(self, score):
+        """Index of the tier a member with this score starts on."""
+        for index, tier in enumerate(self.tiers):
+            if tier.max_score is None or score <= tier.max_score:
+                return index
+        return len(self.tiers) - 1
+
+    async def complete(self, file_type, source, messages, temperature):
+        """
+        Convert with complete_sql on the member's tier and, while the output
+        fails validation, on the following ones.
+
+        :param source: Member content the prompt was built from, for scoring
+        :return: The SQL of the first valid output, else the last output
+        """
+        score = complexity_score(source)
+        first = self.tier_for(score)
+        sql = None
+        for index in range(first, len(self.tiers)):
+            tier = self.tiers[index]
+            if index > first:
+                LLM_ESCALATIONS_TOTAL.labels(file_type, tier.name).inc()
+            sql = await request_hedger.run(file_type, tier.name, lambda: complete_sql(
+                model=tier.model,
+                messages=messages,
+                max_tokens=tier.max_tokens,
+                request_timeout=tier.timeout,
+                temperature=temperature
+            ))
+            problem = "no valid completion" if sql is None else check_sql(sql)
+            if problem is None:
+                return sql
+            logger.warning(f"{file_type} conversion on tier '{tier.name}' (score {
+                           score:.1f}) failed validation: {problem}")
+        return sql
+
+
+model_router = ModelRouter(json.loads(LLM_MODEL_TIERS) if LLM_MODEL_TIERS else MODEL_TIERS)
+
+# Recorded in archive manifests; outputs produced under another version are
+# not reused by incremental re-migrations. The cache holds conversions before
+# the rewrite rules are applied, so only the manifests depend on the rules.
+CONVERTER_VERSION = (f"view-{VIEW_PROMPT_VERSION}.{VIEW_TEMPERATURE}|"
+                     f"node-{NODE_PROMPT_VERSION}.{NODE_TEMPERATURE}|"
+                     f"schema-{SCHEMA_PROMPT_VERSION}.{SCHEMA_TEMPERATURE}|"
+                     f"function-{FUNCTION_PROMPT_VERSION}.{FUNCTION_TEMPERATURE}|"
+                     f"pack-{PACK_PROMPT_VERSION}|"
+                     f"tiers-{model_router.version}|"
+                     f"rewrite-{rewrite_rules.version}")
+
 
 async def convert_view_into_snowflake(xml):
+    with track_conversion("calculationview") as conversion:
+        if LOCAL_VIEW_TRANSLATOR_ENABLED:
+            try:
+                return conversion.result(
+                    rewrite_sql(translate_calculation_view(xml)), "local")
+            except UnsupportedViewError as e:
+                logger.info(f"Calculation view needs the LLM: {e}")
+
+        if VIEW_CHUNKING_ENABLED:
+            view = _chunkable_view(xml)
+            if view is not None:
+                sql = await _convert_view_by_nodes(view)
+                if sql is not None:
+                    return conversion.result(rewrite_sql(sql), "nodes")
+                logger.warning(f"Converting calculation view '{view.name}' as a whole instead.")
+
+        with stage("prompt_build"):
+            pruned_xml = prune_calculation_view(xml)
+            cache_key = build_cache_key(
+                pruned_xml, VIEW_PROMPT_VERSION, model_router.version, VIEW_TEMPERATURE)
+        return conversion.result(rewrite_sql(await conversion_cache.get_or_convert(
+            cache_key, lambda: _convert_view(pruned_xml))))
+
+
+def _prompt_version(packer, content, version):
+    """
+    Prompt version to cache a member's conversion under; members the packer
+    packs also depend on the pack prompt.
+    """
+    if packer.packs(content):
+        return f"{version}+pack-{PACK_PROMPT_VERSION}"
+    return version
+
+
+async def convert_schema_to_snowflake(hana_schema):
+    with track_conversion("hdbdd") as conversion:
+        if LOCAL_SCHEMA_TRANSLATOR_ENABLED:
+            try:
+                return conversion.result(
+                    rewrite_sql(translate_cds_schema(hana_schema)), "local")
+            except UnsupportedSchemaError as e:
+                logger.info(f"CDS schema needs the LLM: {e}")
+
+        cache_key = build_cache_key(
+            hana_schema, _prompt_version(schema_packer, hana_schema, SCHEMA_PROMPT_VERSION),
+            model_router.version, SCHEMA_TEMPERATURE)
+        return conversion.result(rewrite_sql(await conversion_cache.get_or_convert(
+            cache_key, lambda: schema_packer.convert(hana_schema))))
+
+
+async def convert_function_to_snowflake(hana_function):
+    with track_conversion("hdbscalarfunction") as conversion:
+        cache_key = build_cache_key(
+            hana_function,
+            _prompt_version(function_packer, hana_function, FUNCTION_PROMPT_VERSION),
+            model_router.version, FUNCTION_TEMPERATURE)
+        return conversion.result(rewrite_sql(await conversion_cache.get_or_convert(
+            cache_key, lambda: function_packer.convert(hana_function))))
+
+
+def _chunkable_view(xml):
+    """
+    Return the parsed view when it is large enough to be converted node by
+    node and everything outside the nodes can be rendered locally.
+    """
+    try:
+        view = parse_calculation_view(xml)
+        if len(view.nodes) < VIEW_CHUNK_MIN_NODES:
+            return None
+        check_view_supported(view)
+        view.execution_order()
+        for node in view.nodes.values():
+            for dependency in node.dependencies:
+                view.reference(dependency)
+        render_result_query(view)
+    except UnsupportedViewError as e:
+        logger.info(f"Calculation view cannot be converted node by node: {e}")
+        return None
+    return view
+
+
+async def _convert_view_by_nodes(view):
+    """
+    Convert every node separately, the local renderer first and the LLM for
+    the rest, and assemble the procedure in execution order. Nodes only
+    reference their inputs by view name, so up to VIEW_CHUNK_CONCURRENCY of
+    them are converted by the LLM at once: one in the scheduler slot the
+    member already holds, the others each in a further slot of the job.
+
+    :return: The procedure, or None if any node failed
+    """
+    order = view.execution_order()
+    logger.info(f"Converting calculation view '{view.name}' in {len(order)} nodes.")
+    queries = {}
+    pending = deque()
+    for node_id in order:
+        node = view.nodes[node_id]
+        try:
+            query = render_node_query(view, node)
+        except UnsupportedViewError as e:
+            logger.info(f"Node '{node.id}' of '{view.name}' needs the LLM: {e}")
+            pending.append(node)
+            continue
+        with track_conversion("calculationview_node") as conversion:
+            queries[node_id] = conversion.result(query, "local")
+
+    async def convert_node(node):
+        with track_conversion("calculationview_node") as conversion:
+            with stage("prompt_build"):
+                node_xml = compact_element(node.element)
+                inputs = {dependency: view.reference(dependency)
+                          for dependency in node.dependencies}
+                cache_key = build_cache_key(
+                    f"{node_xml}|{json.dumps(inputs, sort_keys=True)}",
+                    NODE_PROMPT_VERSION, model_router.version, NODE_TEMPERATURE)
+            return conversion.result(await conversion_cache.get_or_convert(
+                cache_key, lambda: _convert_view_node(node, node_xml, inputs)))
+
+    busy = set()
+
+    async def convert_nodes(slot):
+        while pending:
+            async with slot():
+                if not pending:
+                    return
+                node = pending.popleft()
+                busy.add(asyncio.current_task())
+                try:
+                    queries[node.id] = await convert_node(node)
+                except Exception as e:
+                    logger.error(f"Failed to convert node '{node.id}' of '{
+                                 view.name}': {e!r}")
+                    queries[node.id] = None
+                finally:
+                    busy.discard(asyncio.current_task())
+
+    helpers = [asyncio.ensure_future(convert_nodes(conversion_scheduler.job_slot))
+               for _ in range(min(VIEW_CHUNK_CONCURRENCY, len(pending)) - 1)]
+    try:
+        await convert_nodes(contextlib.nullcontext)
+    finally:
+        # Helpers still waiting for a slot are not needed any more.
+        for helper in helpers:
+            if helper not in busy:
+                helper.cancel()
+        await asyncio.gather(*helpers, return_exceptions=True)
+
+    failed = [node_id for node_id in order if not queries[node_id]]
+    if failed:
+        logger.error(f"Failed to convert nodes {failed} of '{view.name}'.")
+        return None
+
+    statements = [render_node_statement(view, view.nodes[node_id], queries[node_id])
+                  for node_id in order]
+    return render_procedure(view, statements)
+
+
+async def _convert_view_node(node, node_xml, inputs):
+    input_lines = "\n".join(f"                   #{node_id} -> {relation}"
+                            for node_id, relation in inputs.items())
+    NODE_PROMPT = f"""
+           Convert one node of an SAP HANA calculation view into a single Snowflake SELECT statement.
+               1. The node is a {node.node_type}. Select exactly its view attributes and calculated attributes, in the order they are declared.
+               2. Read the inputs from these Snowflake relations:
+{input_lines}
+               3. For each <mapping>, write source AS target when the names differ. Quote identifiers with double quotes.
+               4. Apply the node's filter, join, aggregation or rank definitions as Snowflake SQL (e.g. RANK() OVER (...) for RankView).
+               5. Return only the query, without CREATE statements and without a trailing semicolon.
+           The XML is reduced to the parts relevant for the SQL: namespaces are omitted, xsi:type is given as type, and mappings without a type are attribute mappings.
+           Node XML: {node_xml}
+           **Output Format**:
+               Your response should be in strict JSON format, as shown below:
+                   ```json {{"sql": "<Snowflake SELECT statement here>" }}```
+    """
+    sql = await model_router.complete(
+        "calculationview_node", node_xml,
+        messages=[
+            {"role": "system", "content": "You are a highly experienced "
+                                          "SAP HANA and Snowflake expert."},
+            {"role": "user", "content": NODE_PROMPT}
+        ],
+        temperature=NODE_TEMPERATURE
+    )
+
+    query = (sql or "").strip().rstrip(";").strip()
+    return query or None
+
+
+async def _convert_view(xml):
     VIEW_PROMPT = (
         f"""
            Objective:
@@ -37,15 +384,6 @@ async def convert_view_into_snowflake(xml):
                        5.1 Follow the exact order defined in the XML to ensure consistency and logic flow.
                    6.AvoidDefault Client And Language:
                        6.1 In the Calculation:scenario, avoid including the defaultClient='$$client$$' and defaultLanguage='$$language$$' attributes in the converted SQL. These attributes should not be included in the Snowflake SQL code.
-                   7.Function Usage Guidelines:
-                       7.1.Verify that all custom or unsupported functions in SAP HANA are replaced by Snowflake equivalents.
-                            Example mappings:
-                                NOT ISNULL(expression) → expression IS NOT NULL
-                                ISNULL(expression, replacement) → IFNULL(expression, replacement)
-                                COALESCE(expression, ...) → COALESCE(expression, ...)
-                                NVL(expression, replacement) → IFNULL(expression, replacement)
-                                NOT ISNULL() -> IS NOT NULL
-                                TO_DATE() → TO_TIMESTAMP() or CAST()
 
                --Example Stored Procedure Creation:
                CREATE OR REPLACE PROCEDURE YourProcedureName(
@@ -134,41 +472,25 @@ async def convert_view_into_snowflake(xml):
 
                END;
                $$;
+               The XML below is reduced to the parts relevant for the SQL: namespaces are omitted, xsi:type is given as type, and mappings without a type are attribute mappings.
                Input SAP HANA XML: {xml}
                **Output Format**:
                    Your response should be in strict JSON format, as shown below:
                        ```json {{"sql": "<converted Snowflake SQL code here>" }}```
         """
     )
-    response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",  # Use the most appropriate engine
+    return await model_router.complete(
+        "calculationview", xml,
         messages=[
             {"role": "system", "content": "You are a highly experienced "
                                           "SAP HANA and Snowflake expert."},
             {"role": "user", "content": VIEW_PROMPT}
         ],
-        max_tokens=4128,  # Adjust as needed
-        temperature=0.5
+        temperature=VIEW_TEMPERATURE
     )
 
-    response_text = response.choices[0].message['content'].strip()
-    json_start_index = response_text.find('{')
-    json_end_index = response_text.rfind('}') + 1
 
-    if json_start_index != -1 and json_end_index != -1:
-        json_text = response_text[json_start_index:json_end_index]
-    else:
-        logger.error("Failed to find JSON part in the response.")
-    try:
-        json_response = json.loads(json_text)
-        view = json_response.get("sql")
-        return f"{view}"
-    except json.JSONDecodeError:
-        logger.error("Failed to decode JSON response")
-        return None
-
-
-async def convert_schema_to_snowflake(hana_schema):
+async def _convert_schema(hana_schema):
     SCHEMA_PROMPT = f"""
         Convert the following SAP HANA table schema into a Snowflake table schema.
 
@@ -179,6 +501,8 @@ async def convert_schema_to_snowflake(hana_schema):
         - Analyze the provided SAP HANA table schema.
         - Convert it to an equivalent Snowflake table schema while maintaining the functionality and structure.
         - Ensure proper syntax for Snowflake SQL.
+        - Map the column types using this table (HANA -> Snowflake):
+{type_mapping_reference(skip=rewrite_rules.types)}
         - Strictly adhere to the specified JSON output format.
 
         ### Required Output Format:
@@ -189,9 +513,8 @@ async def convert_schema_to_snowflake(hana_schema):
         }}
     """
 
-    # OpenAI API call to convert schema using GPT-4
-    response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
+    return await model_router.complete(
+        "hdbdd", hana_schema,
         messages=[
             {"role": "system", "content": "You are a highly experienced "
                                           "SQL conversion expert."},
@@ -200,31 +523,11 @@ async def convert_schema_to_snowflake(hana_schema):
                     SCHEMA_PROMPT}"
             )}
         ],
-        max_tokens=1024,  # Adjust token count if necessary
-        temperature=0.0  # Set to 0.0 for more deterministic results
+        temperature=SCHEMA_TEMPERATURE  # Set to 0.0 for more deterministic results
     )
 
-    logger.info("Response fetched successfully", response)
 
-    response_text = response.choices[0].message['content'].strip()
-    json_start_index = response_text.find('{')
-    json_end_index = response_text.rfind('}') + 1
-
-    if json_start_index != -1 and json_end_index != -1:
-        json_text = response_text[json_start_index:json_end_index]
-    else:
-        logger.error("Failed to find JSON part in the response.")
-    try:
-        json_response = json.loads(json_text)
-        converted_table = convert_timestamp_to_timestamp_tz(
-            json_response.get("sql"))
-        return f"{converted_table}"
-    except json.JSONDecodeError:
-        logger.error("Failed to decode JSON response")
-        return None
-
-
-def convert_function_to_snowflake(hana_function):
+async def _convert_function(hana_function):
     FUNCTION_PROMPT = f"""
             Convert a SAP HANA function or procedure into a Snowflake function or procedure using SQL. Follow these steps:
 
@@ -248,9 +551,8 @@ def convert_function_to_snowflake(hana_function):
                     Your response should be in strict JSON format, as shown below:
                         ```json {{"sql": "<converted Snowflake SQL code here>" }}```
         """
-    # OpenAI API call to convert schema using GPT-4
-    response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",  # Specify GPT-4 model
+    return await model_router.complete(
+        "hdbscalarfunction", hana_function,
         messages=[
             {"role": "system", "content": "You are a highly experienced "
                                           "SQL conversion expert."},
@@ -259,39 +561,121 @@ def convert_function_to_snowflake(hana_function):
                     FUNCTION_PROMPT}"
             )}
         ],
-        max_tokens=1024,  # Adjust token count if necessary
-        temperature=0.0  # Set to 0.0 for more deterministic results
+        temperature=FUNCTION_TEMPERATURE  # Set to 0.0 for more deterministic results
     )
 
-    logger.info("Response fetched successfully", response)
 
-    # Extract and clean up the response text
-    response_text = response.choices[0].message['content'].strip()
-    logger.info("Response Text", response_text)
+def _packed_inputs(label, members):
+    """Prompt section listing packed members, each under its key."""
+    sections = []
+    for key, content in members.items():
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", errors="replace")
+        sections.append(f"{label} {key}:\n{content}\n")
+    return "\n".join(sections)
 
-    # Remove any non-JSON parts of the response
-    # Example of cleaning up the response:
-    # Remove the introductory text and isolate the JSON
-    json_start_index = response_text.find('@@')
-    json_end_index = response_text.rfind('##')
 
-    if json_start_index != -1 and json_end_index != -1:
-        json_text = response_text[json_start_index + 2:json_end_index]
-    else:
-        logger.error("Failed to find JSON part in the response.")
-        return None
-    json_text = "{" + json_text
-    json_text = json_text + "}"
-    # json_fin_string = sanitize_json_str   ing(json_text)
-    try:
-        json_response = json.loads(json_text)
-        function = json_response.get("sql")
-
-        if str.lower(
-                json_response.get("is_func")) == "yes":
-            return f"{function}"
-        else:
-            return f"{function}"
-    except json.JSONDecodeError:
-        logger.error("Failed to decode JSON response")
-        return None
+PACK_OUTPUT_FORMAT = """
+        ### Required Output Format:
+        Convert every input separately. Your response should strictly follow the
+        JSON format as shown below, with one entry per input keyed by its label:
+        ```json
+        {
+            "m1": "<converted Snowflake SQL code of m1 here>",
+            "m2": "<converted Snowflake SQL code of m2 here>"
+        }
+"""
+
+
+async def _complete_pack(file_type, members, messages, temperature):
+    """
+    Convert packed members in one request on the tier of their combined
+    complexity score.
+
+    :return: Map of member key to SQL, empty if the completion was invalid
+    """
+    tier = model_router.tiers[model_router.tier_for(
+        sum(complexity_score(content) for content in members.values()))]
+    results = await complete_json(
+        model=tier.model,
+        messages=messages,
+        max_tokens=tier.max_tokens,
+        request_timeout=tier.timeout,
+        temperature=temperature
+    )
+    if not isinstance(results, dict):
+        return {}
+    return {key: sql for key, sql in results.items() if isinstance(sql, str)}
+
+
+async def _convert_schemas_packed(members):
+    SCHEMA_PACK_PROMPT = f"""
+        Convert each of the following SAP HANA table schemas into a Snowflake table schema.
+
+        ### Input:
+{_packed_inputs("SAP HANA Table Schema", members)}
+        ### Instructions:
+        - Analyze each provided SAP HANA table schema.
+        - Convert it to an equivalent Snowflake table schema while maintaining the functionality and structure.
+        - Ensure proper syntax for Snowflake SQL.
+        - Map the column types using this table (HANA -> Snowflake):
+{type_mapping_reference(skip=rewrite_rules.types)}
+        - Strictly adhere to the specified JSON output format.
+{PACK_OUTPUT_FORMAT}
+    """
+
+    return await _complete_pack(
+        "hdbdd", members,
+        messages=[
+            {"role": "system", "content": "You are a highly experienced "
+                                          "SQL conversion expert."},
+            {"role": "user", "content": (
+                f"You are an expert in both SAP HANA and Snowflake. {
+                    SCHEMA_PACK_PROMPT}"
+            )}
+        ],
+        temperature=SCHEMA_TEMPERATURE
+    )
+
+
+async def _convert_functions_packed(members):
+    FUNCTION_PACK_PROMPT = f"""
+            Convert each of the SAP HANA functions or procedures below into a Snowflake function or procedure using SQL. Follow these steps for each of them:
+
+            1. Identify whether the given input is a SAP HANA function or procedure.
+            2. If it is a function, strictly follow the Snowflake function syntax and replicate the exact functionality defined in the SAP HANA function.
+            3. Do not include unnecessary semicolons in the SQL code.
+
+            **Example Template for Snowflake Function Conversion:**
+            -- Create the Snowflake function
+            CREATE OR REPLACE FUNCTION <SNOWFLAKE_FUNCTION_NAME>(<input_parameters>)
+            RETURNS <return_type>
+            LANGUAGE SQL
+            AS
+            $$
+                -- Converted logic in Snowflake SQL
+                <translated_expression>
+            $$;
+
+{_packed_inputs("Input SAP HANA XML", members)}
+{PACK_OUTPUT_FORMAT}
+        """
+    return await _complete_pack(
+        "hdbscalarfunction", members,
+        messages=[
+            {"role": "system", "content": "You are a highly experienced "
+                                          "SQL conversion expert."},
+            {"role": "user", "content": (
+                f"You are an expert in both SAP HANA and Snowflake. {
+                    FUNCTION_PACK_PROMPT}"
+            )}
+        ],
+        temperature=FUNCTION_TEMPERATURE
+    )
+
+
+# Small functions and schemas that reach the LLM are converted several per
+# request when PACKING_ENABLED is set.
+schema_packer = RequestPacker("hdbdd", _convert_schemas_packed, _convert_schema)
+function_packer = RequestPacker(
+    "hdbscalarfunction", _convert_functions_packed, _convert_function)
@@ -0,0 +1,127 @@
+import asyncio
+import contextvars
+
+from app.config import (
+    PACKING_ENABLED,
+    PACKING_MAX_MEMBER_BYTES,
+    PACKING_TOKEN_BUDGET,
+    PACKING_MAX_WAIT,
+)
+from app.services.sql_rewriter import check_sql
+from app.utils import estimate_tokens, logger
+from app.utils.metrics import LLM_PACKED_MEMBERS_TOTAL
+
+
+class RequestPacker:
+    """
+    Packs small members of one file type into a single LLM request.
+
+    Members of at most max_member_bytes wait up to max_wait seconds for
+    others to join them; a pack is sent once its members reach token_budget
+    prompt tokens. convert_pack receives the members as a key -> content map
+    and returns a key -> SQL map. Members missing from that map, or whose SQL
+    fails check_sql, are converted on their own with convert_single, as are
+    members that are too large to be packed.
+
+    A pack spans jobs, so it runs in an empty context; each member's
+    fallback runs in the context the member was submitted from, with that
+    job's hedge budget, progress and trace.
+    """
+
+    def __init__(self, file_type, convert_pack, convert_single,
+                 enabled=PACKING_ENABLED, max_member_bytes=PACKING_MAX_MEMBER_BYTES,
+                 token_budget=PACKING_TOKEN_BUDGET, max_wait=PACKING_MAX_WAIT):
+        self.file_type = file_type
+        self.convert_pack = convert_pack
+        self.convert_single = convert_single
+        self.enabled = enabled
+        self.max_member_bytes = max_member_bytes
+        self.token_budget = token_budget
+        self.max_wait = max_wait
+        self._pending = []
+        self._pending_tokens = 0
+        self._timer = None
+        self._sending = set()
+
+    def packs(self, content):
+        """Whether convert() packs this member with others."""
+        return self.enabled and len(content) <= self.max_member_bytes
+
+    async def convert(self, content):
+        """
+        Convert one member, packed with others when it is small enough.
+
+        :return: The SQL, or None if the conversion failed
+        """
+        if not self.packs(content):
+            return await self.convert_single(content)
+
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+        tokens = estimate_tokens(content)
+        if self._pending and self._pending_tokens + tokens > self.token_budget:
+            self._send_pending()
+        self._pending.append((content, result, contextvars.copy_context()))
+        self._pending_tokens += tokens
+        if self._pending_tokens >= self.token_budget:
+            self._send_pending()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._send_pending)
+        return await asyncio.shield(result)
+
+    def _send_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pack, self._pending, self._pending_tokens = self._pending, [], 0
+        if pack:
+            task = asyncio.get_running_loop().create_task(
+                self._send(pack), context=contextvars.Context())
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, pack):
+        try:
+            await self._resolve(pack)
+        finally:
+            # Only reached with unresolved members when the pack itself was
+            # cancelled; their callers must not wait forever.
+            for _, result, _ in pack:
+                if not result.done():
+                    result.set_exception(RuntimeError(
+                        f"Packed {self.file_type} conversion was cancelled"))
+
+    async def _resolve(self, pack):
+        members = {f"m{index}": content for index, (content, _, _) in enumerate(pack, 1)}
+        results = {}
+        if len(pack) > 1:
+            try:
+                results = await self.convert_pack(members)
+            except (Exception, asyncio.CancelledError) as e:
+                if asyncio.current_task().cancelling():
+                    raise
+                logger.warning(f"Packed conversion of {len(pack)} {self.file_type} "
+                               f"members failed, converting them one by one: {e!r}")
+
+        loop = asyncio.get_running_loop()
+        fallbacks = []
+        for (key, content), (_, result, context) in zip(members.items(), pack):
+            sql = results.get(key)
+            if isinstance(sql, str) and check_sql(sql) is None:
+                LLM_PACKED_MEMBERS_TOTAL.labels(self.file_type, "packed").inc()
+                result.set_result(sql)
+            else:
+                if len(pack) > 1:
+                    LLM_PACKED_MEMBERS_TOTAL.labels(self.file_type, "fallback").inc()
+                fallbacks.append(loop.create_task(
+                    self._convert_alone(content, result), context=context))
+        if len(pack) > 1:
+            logger.info(f"Converted {len(pack) - len(fallbacks)} of {len(pack)} "
+                        f"{self.file_type} members in one request.")
+        await asyncio.gather(*fallbacks)
+
+    async def _convert_alone(self, content, result):
+        try:
+            result.set_result(await self.convert_single(content))
+        except Exception as e:
+            result.set_exception(e)
@@ -0,0 +1,186 @@
+import io
+import struct
+import threading
+import zipfile
+from collections import OrderedDict
+
+from app.config import S3_READ_BLOCK_SIZE, S3_READ_CACHE_BYTES
+from app.utils import logger
+
+
+# Size of a local file header without its variable-length fields.
+LOCAL_HEADER_SIZE = 30
+# Extra bytes fetched with a member in case its local extra field is larger
+# than the one recorded in the central directory.
+LOCAL_EXTRA_SLACK = 1024
+
+
+class S3RangeReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over an S3 object, backed by ranged GETs.
+
+    Data is fetched in blocks of block_size bytes and kept in an LRU cache of
+    at most cache_bytes, so zipfile can read the central directory first and
+    then individual members on demand without downloading the whole archive.
+    """
+
+    def __init__(self, s3_client, bucket, key, block_size=S3_READ_BLOCK_SIZE,
+                 cache_bytes=S3_READ_CACHE_BYTES):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.block_size = block_size
+        self.max_blocks = max(2, cache_bytes // block_size)
+        self.size = s3_client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._position = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        logger.info(f"Opened s3://{bucket}/{key} for ranged reads ({self.size} bytes).")
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if position < 0:
+            raise OSError("Negative seek position")
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast("B")
+        end = min(self._position + len(view), self.size)
+        if end <= self._position:
+            return 0
+
+        data = self._read_range(self._position, end)
+        view[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def read_at(self, offset, size):
+        """
+        Read size bytes at offset without moving the file position. Safe to
+        call from several threads at once.
+        """
+        end = min(offset + size, self.size)
+        if end <= offset:
+            return b""
+        return self._read_range(offset, end)
+
+    def prefetch(self, start, end):
+        """
+        Fetch the byte range [start, end) into the block cache with a single
+        request, so later reads of that range are served from memory.
+        """
+        start = max(0, start)
+        end = min(end, self.size)
+        if start < end:
+            self._load_blocks(start // self.block_size,
+                              (end - 1) // self.block_size)
+
+    def prefetch_member(self, zip_info):
+        """Prefetch the local header and compressed data of a zip member."""
+        start = zip_info.header_offset
+        end = (start + LOCAL_HEADER_SIZE + len(zip_info.orig_filename.encode("utf-8"))
+               + len(zip_info.extra) + LOCAL_EXTRA_SLACK + zip_info.compress_size)
+        self.prefetch(start, end)
+
+    def _read_range(self, start, end):
+        first = start // self.block_size
+        last = (end - 1) // self.block_size
+        blocks = self._load_blocks(first, last)
+
+        data = b"".join(blocks)
+        offset = start - first * self.block_size
+        return data[offset:offset + (end - start)]
+
+    def _load_blocks(self, first, last):
+        with self._lock:
+            cached = {index: self._blocks.get(index)
+                      for index in range(first, last + 1)}
+            for index, block in cached.items():
+                if block is not None:
+                    self._blocks.move_to_end(index)
+
+        missing = [index for index, block in cached.items() if block is None]
+        if missing:
+            fetched = self._fetch_blocks(missing[0], missing[-1])
+            cached.update(fetched)
+
+        return [cached[index] for index in range(first, last + 1)]
+
+    def _fetch_blocks(self, first, last):
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, self.size) - 1
+        response = self.s3_client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end}")
+        data = response["Body"].read()
+
+        blocks = {}
+        with self._lock:
+            self.requests += 1
+            self.bytes_fetched += len(data)
+            for index in range(first, last + 1):
+                offset = (index - first) * self.block_size
+                block = data[offset:offset + self.block_size]
+                blocks[index] = block
+                self._blocks[index] = block
+                self._blocks.move_to_end(index)
+
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return blocks
+
+
+def read_raw_member(reader, zip_info):
+    """
+    Return the still-compressed data of a zip member, so it can be copied
+    into another archive without decompressing and recompressing it.
+    """
+    if zip_info.flag_bits & 0x1:
+        raise ValueError(f"Encrypted member {zip_info.filename} cannot be copied")
+
+    reader.prefetch_member(zip_info)
+    header = reader.read_at(zip_info.header_offset, LOCAL_HEADER_SIZE)
+    if len(header) != LOCAL_HEADER_SIZE or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local header for {zip_info.filename}")
+
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    data_offset = zip_info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length
+    data = reader.read_at(data_offset, zip_info.compress_size)
+    if len(data) != zip_info.compress_size:
+        raise zipfile.BadZipFile(f"Truncated data for {zip_info.filename}")
+    return data
+
+
+def parse_s3_link(s3_link):
+    """
+    Split an s3://<bucket>/<key> link into bucket and key.
+    """
+    if not s3_link.startswith("s3://"):
+        raise ValueError(
+            "Invalid S3 URL format, expected 's3://<bucket>/<key>'")
+
+    s3_parts = s3_link[5:].split("/", 1)
+    if len(s3_parts) != 2 or not s3_parts[0] or not s3_parts[1]:
+        raise ValueError(
+            "Invalid S3 URL format, expected 's3://<bucket>/<key>'")
+    return s3_parts[0], s3_parts[1]
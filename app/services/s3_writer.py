@@ -0,0 +1,226 @@
+import asyncio
+import io
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import S3_UPLOAD_PART_SIZE, S3_UPLOAD_CONCURRENCY
+from app.utils import logger
+from app.utils.metrics import current_job, stage
+
+
+# S3 rejects multipart parts smaller than 5 MiB (except the last one).
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only, non-seekable file object that uploads to S3 as it is written.
+
+    Bytes are buffered in a spooled temporary file until a part is full, then
+    the part is uploaded on a thread pool while writing continues. At most
+    max_concurrency parts are buffered or in flight at any time, so memory
+    stays bounded regardless of the object size. Objects smaller than one
+    part are uploaded with a single put_object on close.
+    """
+
+    def __init__(self, s3_client, bucket, key, part_size=S3_UPLOAD_PART_SIZE,
+                 max_concurrency=S3_UPLOAD_CONCURRENCY):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.upload_id = None
+        self._position = 0
+        self._buffer = self._new_buffer()
+        self._parts = []
+        self._futures = []
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="s3-upload")
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._completed = False
+        # Parts are uploaded on the executor, outside the job's context.
+        self._job = current_job.get()
+
+    def _new_buffer(self):
+        return tempfile.SpooledTemporaryFile(max_size=self.part_size)
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        size = len(data)
+        self._buffer.write(data)
+        self._position += size
+
+        if self._buffer.tell() >= self.part_size:
+            self._submit_part()
+        return size
+
+    def _submit_part(self):
+        if self.upload_id is None:
+            with stage("s3_upload", job=self._job):
+                response = self.s3_client.create_multipart_upload(
+                    Bucket=self.bucket, Key=self.key)
+            self.upload_id = response["UploadId"]
+            logger.info(f"Started multipart upload to s3://{self.bucket}/{self.key}.")
+
+        self._check_failed_parts()
+        buffer, self._buffer = self._buffer, self._new_buffer()
+        part_number = len(self._futures) + 1
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._upload_part, part_number, buffer)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._futures.append(future)
+
+    def _upload_part(self, part_number, buffer):
+        try:
+            buffer.seek(0)
+            with stage("s3_upload", job=self._job):
+                response = self.s3_client.upload_part(
+                    Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                    PartNumber=part_number, Body=buffer.read())
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
+        finally:
+            buffer.close()
+            self._slots.release()
+
+    def _check_failed_parts(self):
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+    def close(self):
+        """
+        Upload the remaining bytes and complete the upload.
+        """
+        if self.closed:
+            return
+
+        try:
+            if self.upload_id is None:
+                self._buffer.seek(0)
+                with stage("s3_upload", job=self._job):
+                    self.s3_client.put_object(
+                        Bucket=self.bucket, Key=self.key, Body=self._buffer.read())
+            else:
+                if self._buffer.tell():
+                    self._submit_part()
+                parts = [future.result() for future in self._futures]
+                with stage("s3_upload", job=self._job):
+                    self.s3_client.complete_multipart_upload(
+                        Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                        MultipartUpload={"Parts": parts})
+            self._completed = True
+            logger.info(f"Uploaded {self._position} bytes to s3://{self.bucket}/{
+                        self.key} in {max(1, len(self._futures))} part(s).")
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._buffer.close()
+            self._executor.shutdown(wait=True)
+            super().close()
+
+    def abort(self):
+        """
+        Abort the multipart upload, discarding any uploaded parts.
+        """
+        if self._completed or self.upload_id is None:
+            return
+
+        for future in self._futures:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            logger.info(f"Aborted multipart upload to s3://{self.bucket}/{self.key}.")
+        except Exception as e:
+            logger.error(f"Failed to abort multipart upload {self.upload_id}: {e}")
+        self.upload_id = None
+
+
+class StreamingZipWriter:
+    """
+    Write converted members into a zip archive as soon as they are ready.
+
+    Members are written in completion order so nothing has to be held back
+    for a slow predecessor, but the central directory is sorted by the
+    members' archive index before closing, so the listing order of the
+    output is deterministic.
+    """
+
+    def __init__(self, fileobj, compression=zipfile.ZIP_DEFLATED):
+        self.zip_file = zipfile.ZipFile(fileobj, "w", compression=compression)
+        self.members_written = 0
+        self._order = {}
+        self._lock = asyncio.Lock()
+
+    async def add(self, index, arcname, content):
+        """
+        Write a member. Blocking zip and upload work runs in a worker thread,
+        one member at a time.
+        """
+        async with self._lock:
+            self._order[arcname] = index
+            await asyncio.to_thread(self.zip_file.writestr, arcname, content)
+            self.members_written += 1
+
+    async def add_raw(self, index, arcname, source_info, compressed):
+        """
+        Copy an already-compressed member from another archive, keeping its
+        compression method, CRC and sizes.
+        """
+        async with self._lock:
+            self._order[arcname] = index
+            await asyncio.to_thread(
+                self._write_raw, arcname, source_info, compressed)
+            self.members_written += 1
+
+    def _write_raw(self, arcname, source_info, compressed):
+        # zipfile has no public API for raw copies, so this mirrors what
+        # ZipFile._open_to_write and _ZipWriteFile.close do, writing the
+        # known CRC and sizes into the local header up front.
+        zip_file = self.zip_file
+        zinfo = zipfile.ZipInfo(arcname, date_time=source_info.date_time)
+        zinfo.compress_type = source_info.compress_type
+        zinfo.flag_bits = source_info.flag_bits & 0x06
+        zinfo.CRC = source_info.CRC
+        zinfo.compress_size = source_info.compress_size
+        zinfo.file_size = source_info.file_size
+        zinfo.external_attr = source_info.external_attr or 0o600 << 16
+        zip64 = max(zinfo.file_size, zinfo.compress_size) > zipfile.ZIP64_LIMIT
+
+        with zip_file._lock:
+            if zip_file._writing:
+                raise ValueError("Another member is being written")
+            zinfo.header_offset = zip_file.fp.tell()
+            zip_file._writecheck(zinfo)
+            zip_file._didModify = True
+            zip_file.fp.write(zinfo.FileHeader(zip64))
+            zip_file.fp.write(compressed)
+            zip_file.start_dir = zip_file.fp.tell()
+            zip_file.filelist.append(zinfo)
+            zip_file.NameToInfo[zinfo.filename] = zinfo
+
+    async def close(self):
+        async with self._lock:
+            self.zip_file.filelist.sort(
+                key=lambda info: self._order.get(info.filename, len(self._order)))
+            await asyncio.to_thread(self.zip_file.close)
@@ -0,0 +1,123 @@
+import asyncio
+import contextlib
+import contextvars
+from collections import deque
+
+from app.config import SCHEDULER_MAX_CONCURRENCY
+from app.utils.metrics import stage
+
+
+# Priorities are clamped to this range; each level doubles a job's share.
+MIN_PRIORITY = -3
+MAX_PRIORITY = 3
+
+
+def priority_weight(priority):
+    """Share of a job with this priority relative to a priority 0 job."""
+    return 2.0 ** max(MIN_PRIORITY, min(MAX_PRIORITY, priority or 0))
+
+
+# ScheduledJob whose slot the conversion in the current task holds.
+scheduled_job = contextvars.ContextVar("scheduled_job", default=None)
+
+
+class ScheduledJob:
+    """A job's place in the FairScheduler, see FairScheduler.job."""
+
+    def __init__(self, name, weight):
+        self.name = name
+        self.weight = weight
+        self.virtual_time = 0.0
+        self.waiters = deque()
+        self.running = 0
+
+
+class FairScheduler:
+    """
+    Process-wide limit on concurrent member conversions, shared fairly
+    between jobs.
+
+    At most max_concurrency conversions run at once. When a slot frees up it
+    goes to the waiting job with the lowest virtual time, which grows by
+    1/weight for every conversion a job starts (start-time fair queuing). A
+    job that was idle re-enters at the current virtual time, so it gets its
+    share from then on but cannot claim the capacity it left unused: a small
+    job submitted behind a large one starts converting right away, while the
+    large one keeps the rest of the capacity busy.
+    """
+
+    def __init__(self, max_concurrency=SCHEDULER_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self.virtual_time = 0.0
+        self._backlogged = set()
+
+    def job(self, name, priority=None):
+        """Return the handle through which a job's conversions are scheduled."""
+        return ScheduledJob(name, priority_weight(priority))
+
+    @contextlib.asynccontextmanager
+    async def slot(self, job):
+        """Hold one conversion slot for job."""
+        with stage("schedule_queue"):
+            await self._acquire(job)
+        try:
+            yield
+        finally:
+            self._release(job)
+
+    def job_slot(self):
+        """
+        Hold one more slot for the job whose conversion runs in the current
+        task, for conversions that fan out into several LLM calls. Outside a
+        job no slot is taken.
+        """
+        job = scheduled_job.get()
+        return self.slot(job) if job is not None else contextlib.nullcontext()
+
+    def _start(self, job):
+        self.virtual_time = job.virtual_time
+        job.virtual_time += 1 / job.weight
+        job.running += 1
+        self.running += 1
+
+    async def _acquire(self, job):
+        if not job.waiters and not job.running:
+            job.virtual_time = max(job.virtual_time, self.virtual_time)
+        if self.running < self.max_concurrency and not self._backlogged:
+            self._start(job)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        job.waiters.append(waiter)
+        self._backlogged.add(job)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the cancellation; pass the slot on.
+                self._release(job)
+            elif waiter in job.waiters:
+                job.waiters.remove(waiter)
+                if not job.waiters:
+                    self._backlogged.discard(job)
+            raise
+
+    def _release(self, job):
+        job.running -= 1
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrency and self._backlogged:
+            job = min(self._backlogged, key=lambda waiting: waiting.virtual_time)
+            waiter = job.waiters.popleft()
+            if not job.waiters:
+                self._backlogged.discard(job)
+            if waiter.cancelled():
+                continue
+            self._start(job)
+            waiter.set_result(None)
+
+
+conversion_scheduler = FairScheduler()
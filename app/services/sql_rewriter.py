@@ -0,0 +1,395 @@
+import hashlib
+import json
+import re
+
+from app.config import SQL_REWRITE_ENABLED, SQL_REWRITE_RULES
+from app.utils import logger
+from app.utils.metrics import stage
+
+
+# HANA -> Snowflake rewrite rules applied to every converted SQL string.
+#
+# functions: a HANA function called with parentheses. The value is either the
+#     Snowflake function name, or a template in which {0}, {1}, ... stand for
+#     the call's arguments, or a list of templates for different numbers of
+#     arguments; a template is only applied to calls with exactly as many
+#     arguments as it uses.
+# syntax: a keyword followed by a call, written "KEYWORD FUNCTION", replaced
+#     as a whole by a template.
+# types: a HANA type name, replaced where a type is expected (after CAST ...
+#     AS, after ::, after RETURNS, in column, parameter and variable
+#     declarations); a length or precision following it is kept. The same
+#     word elsewhere, such as a column named timestamp, is left unchanged.
+DEFAULT_RULES = {
+    "functions": {
+        "NVL": "IFNULL",
+        # ISNULL(a) is a predicate in HANA, ISNULL(a, b) the same as IFNULL.
+        "ISNULL": ["IFNULL({0}, {1})", "{0} IS NULL"],
+        "TO_DATE": "TO_TIMESTAMP",
+        "TO_SECONDDATE": "TO_TIMESTAMP",
+        "TO_NVARCHAR": "TO_VARCHAR",
+        "TO_ALPHANUM": "TO_VARCHAR",
+        "TO_INT": "TO_NUMBER",
+        "TO_INTEGER": "TO_NUMBER",
+        "TO_BIGINT": "TO_NUMBER",
+        "UCASE": "UPPER",
+        "LCASE": "LOWER",
+        "NOW": "CURRENT_TIMESTAMP()",
+        "LOCATE": "POSITION({1}, {0})",
+        "ADD_DAYS": "DATEADD(DAY, {1}, {0})",
+        "ADD_YEARS": "DATEADD(YEAR, {1}, {0})",
+        "ADD_SECONDS": "DATEADD(SECOND, {1}, {0})",
+        "DAYS_BETWEEN": "DATEDIFF(DAY, {0}, {1})",
+        "SECONDS_BETWEEN": "DATEDIFF(SECOND, {0}, {1})",
+    },
+    "syntax": {
+        "NOT ISNULL": "{0} IS NOT NULL",
+    },
+    "types": {
+        "TIMESTAMP": "TIMESTAMP_TZ",
+        "TIMESTAMP_NTZ": "TIMESTAMP_TZ",
+        "TIMESTAMP_LTZ": "TIMESTAMP_TZ",
+        "SECONDDATE": "TIMESTAMP_TZ",
+        "NVARCHAR": "VARCHAR",
+        "ALPHANUM": "VARCHAR",
+        "SHORTTEXT": "VARCHAR",
+        "NCHAR": "CHAR",
+        "CLOB": "VARCHAR",
+        "NCLOB": "VARCHAR",
+        "BLOB": "BINARY",
+        "SMALLDECIMAL": "FLOAT",
+        "ST_POINT": "GEOGRAPHY",
+        "ST_GEOMETRY": "GEOGRAPHY",
+    },
+}
+
+# Strings, quoted identifiers and comments are copied unchanged. $$ is a
+# symbol rather than a string delimiter so that procedure bodies are
+# rewritten too.
+TOKEN_PATTERN = re.compile(
+    r"""(?P<skip>\s+|--[^\n]*|/\*.*?\*/)"""
+    r"""|(?P<string>'(?:[^']|'')*'?)"""
+    r"""|(?P<quoted>"(?:[^"]|"")*"?)"""
+    r"""|(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)"""
+    r"""|(?P<name>[A-Za-z_][\w$#]*)"""
+    r"""|(?P<symbol>\$\$|::|.)""",
+    re.DOTALL,
+)
+
+PLACEHOLDER_PATTERN = re.compile(r"\{(\d+)\}")
+
+# Keywords before the name of an object whose parenthesised list declares
+# columns or parameters: CREATE TABLE t (...), CREATE FUNCTION f(...).
+DEFINITION_KEYWORDS = {"TABLE", "FUNCTION", "PROCEDURE", "EXISTS"}
+CAST_FUNCTIONS = {"CAST", "TRY_CAST"}
+
+
+class RewriteRules:
+    """
+    Rule table of the rewriter, keyed by upper-case HANA names.
+
+    :param rules: Mapping with the sections of DEFAULT_RULES
+    """
+
+    def __init__(self, rules):
+        self.functions = {name.upper(): value
+                          for name, value in rules.get("functions", {}).items()}
+        self.syntax = {tuple(key.upper().split()): template
+                       for key, template in rules.get("syntax", {}).items()}
+        self.types = {name.upper(): value
+                      for name, value in rules.get("types", {}).items()}
+        self.keywords = {keyword for keyword, _ in self.syntax}
+        self.version = hashlib.sha256(
+            json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Build the rules from DEFAULT_RULES, overridden section by section with
+        the JSON file at path. A rule set to null in the file is removed.
+        """
+        rules = {section: dict(table) for section, table in DEFAULT_RULES.items()}
+        if path:
+            with open(path, encoding="utf-8") as rules_file:
+                overrides = json.load(rules_file)
+            for section, table in overrides.items():
+                if section not in rules:
+                    raise ValueError(f"Unknown rewrite rule section '{section}' in {path}")
+                for name, value in table.items():
+                    if value is None:
+                        rules[section].pop(name, None)
+                    else:
+                        rules[section][name] = value
+            logger.info(f"Loaded SQL rewrite rules from {path}.")
+        return cls(rules)
+
+
+def tokenize(sql):
+    """Split sql into (kind, text) tokens which concatenate back to sql."""
+    return [(match.lastgroup, match.group())
+            for match in TOKEN_PATTERN.finditer(sql)]
+
+
+def _matching_parentheses(tokens):
+    """
+    Map the index of every "(" to the index of its ")", and list for every
+    token the index of the innermost "(" around it (None at the top level).
+    """
+    closing = {}
+    enclosing = []
+    opened = []
+    for index, (kind, text) in enumerate(tokens):
+        if kind == "symbol" and text == ")" and opened:
+            closing[opened.pop()] = index
+        enclosing.append(opened[-1] if opened else None)
+        if kind == "symbol" and text == "(":
+            opened.append(index)
+    return closing, enclosing
+
+
+def _declarations(tokens):
+    """
+    Indices of the DECLARE keywords, and of the ";" inside DECLARE sections,
+    that are followed by a variable declaration.
+    """
+    starts = set()
+    in_section = False
+    for index, (kind, text) in enumerate(tokens):
+        if kind == "name" and text.upper() == "DECLARE":
+            starts.add(index)
+            in_section = True
+        elif kind == "name" and text.upper() == "BEGIN":
+            in_section = False
+        elif in_section and kind == "symbol" and text == ";":
+            starts.add(index)
+    return starts
+
+
+class _Rewriter:
+    """One rewrite of a token list; every token is visited once."""
+
+    def __init__(self, rules, tokens):
+        self.rules = rules
+        self.tokens = tokens
+        self.closing, self.enclosing = _matching_parentheses(tokens)
+        self.declarations = _declarations(tokens) if rules.types else set()
+        self.count = 0
+
+    def next_significant(self, index, end):
+        while index < end and self.tokens[index][0] == "skip":
+            index += 1
+        return index
+
+    def previous_significant(self, index):
+        index -= 1
+        while index >= 0 and self.tokens[index][0] == "skip":
+            index -= 1
+        return index if index >= 0 else None
+
+    def is_word(self, index, words):
+        return (index is not None and self.tokens[index][0] == "name"
+                and self.tokens[index][1].upper() in words)
+
+    def is_definition_list(self, opening):
+        """Whether the "(" at opening starts a column or parameter list."""
+        index = self.previous_significant(opening)
+        if self.is_word(index, {"TABLE"}):
+            return True
+        # Skip the object name, which may be qualified and quoted.
+        named = False
+        while index is not None and self.tokens[index][0] in ("name", "quoted"):
+            named = True
+            index = self.previous_significant(index)
+            if index is None or self.tokens[index] != ("symbol", "."):
+                break
+            index = self.previous_significant(index)
+        return named and self.is_word(index, DEFINITION_KEYWORDS)
+
+    def is_type_position(self, index):
+        """Whether a type name is expected at tokens[index]."""
+        previous = self.previous_significant(index)
+        if previous is None:
+            return False
+        kind, text = self.tokens[previous]
+        if kind == "symbol":
+            return text == "::"
+        if self.is_word(previous, {"RETURNS"}):
+            return True
+        opening = self.enclosing[index]
+        if self.is_word(previous, {"AS"}):
+            return opening is not None and self.is_word(
+                self.previous_significant(opening), CAST_FUNCTIONS)
+        if kind not in ("name", "quoted"):
+            return False
+        # The name of a declared column, parameter or variable.
+        before = self.previous_significant(previous)
+        if before is not None and (before in self.declarations
+                                   or self.is_word(before, {"ADD", "COLUMN"})):
+            return True
+        if opening is None or before is None:
+            return False
+        if before != opening and not (self.tokens[before] == ("symbol", ",")
+                                      and self.enclosing[before] == opening):
+            return False
+        return self.is_definition_list(opening)
+
+    def call_at(self, index, end):
+        """
+        If tokens[index] is followed by a parenthesised argument list, return
+        the index of its "(" and ")".
+        """
+        opening = self.next_significant(index + 1, end)
+        if opening < end and self.tokens[opening] == ("symbol", "("):
+            close = self.closing.get(opening)
+            if close is not None and close < end:
+                return opening, close
+        return None
+
+    def arguments(self, opening, close):
+        """Split the tokens between opening and close at top-level commas."""
+        arguments = []
+        start = index = opening + 1
+        while index < close:
+            kind, text = self.tokens[index]
+            if kind == "symbol" and text == "(" and index in self.closing:
+                index = self.closing[index]
+            elif kind == "symbol" and text == ",":
+                arguments.append((start, index))
+                start = index + 1
+            index += 1
+        if start < close or arguments:
+            arguments.append((start, close))
+        return arguments
+
+    def render_argument(self, start, end):
+        text = self.rewrite(start, end).strip()
+        significant = [index for index in range(start, end)
+                       if self.tokens[index][0] != "skip"]
+        # Parenthesise compound expressions, which would otherwise bind
+        # differently once placed in a template; single tokens and calls
+        # are kept as they are.
+        atomic = len(significant) <= 1 or (
+            self.tokens[significant[0]][0] == "name"
+            and self.tokens[significant[1]] == ("symbol", "(")
+            and self.closing.get(significant[1]) == significant[-1])
+        return text if atomic else f"({text})"
+
+    def apply_template(self, template, opening, close):
+        arguments = self.arguments(opening, close)
+        used = {int(number) for number in PLACEHOLDER_PATTERN.findall(template)}
+        if len(arguments) != (max(used) + 1 if used else 0):
+            return None
+        rendered = [self.render_argument(start, end) for start, end in arguments]
+        return PLACEHOLDER_PATTERN.sub(lambda match: rendered[int(match.group(1))], template)
+
+    def apply_function(self, rule, index, call):
+        """
+        Rewrite the call of a function rule at tokens[index].
+
+        :return: The replacement, or None, and the index to continue at
+        """
+        for template in ([rule] if isinstance(rule, str) else rule):
+            if "{" not in template and not template.endswith(")"):
+                return template, index + 1
+            replaced = self.apply_template(template, *call)
+            if replaced is not None:
+                return replaced, call[1] + 1
+        return None, index
+
+    def rewrite(self, start, end):
+        output = []
+        previous = None
+        index = start
+        while index < end:
+            kind, text = self.tokens[index]
+            if kind != "name" or previous in (".", ":"):
+                output.append(text)
+                if kind != "skip":
+                    previous = text
+                index += 1
+                continue
+
+            name = text.upper()
+            replaced = None
+            if name in self.rules.keywords:
+                following = self.next_significant(index + 1, end)
+                if following < end and self.tokens[following][0] == "name":
+                    template = self.rules.syntax.get(
+                        (name, self.tokens[following][1].upper()))
+                    call = self.call_at(following, end) if template else None
+                    if call is not None:
+                        replaced = self.apply_template(template, *call)
+                        if replaced is not None:
+                            index = call[1] + 1
+            if replaced is None and name in self.rules.functions:
+                call = self.call_at(index, end)
+                if call is not None:
+                    replaced, index = self.apply_function(
+                        self.rules.functions[name], index, call)
+            if (replaced is None and name in self.rules.types
+                    and self.is_type_position(index)):
+                replaced = self.rules.types[name]
+                index += 1
+
+            if replaced is None:
+                output.append(text)
+                index += 1
+            else:
+                output.append(replaced)
+                self.count += 1
+            previous = self.tokens[index - 1][1]
+        return "".join(output)
+
+
+rewrite_rules = RewriteRules.load(SQL_REWRITE_RULES)
+
+
+def rewrite_sql(sql, rules=None):
+    """
+    Apply the HANA -> Snowflake rewrite rules to converted SQL in one pass
+    over its tokens. Rewritten SQL is left unchanged by a second rewrite.
+
+    :param sql: Converted SQL, or None for a failed conversion
+    :param rules: RewriteRules, by default those of SQL_REWRITE_RULES
+    :return: The rewritten SQL
+    """
+    if not sql or not SQL_REWRITE_ENABLED:
+        return sql
+    with stage("sql_rewrite"):
+        tokens = tokenize(sql)
+        rewriter = _Rewriter(rules or rewrite_rules, tokens)
+        rewritten = rewriter.rewrite(0, len(tokens))
+    if rewriter.count:
+        logger.debug(f"Applied {rewriter.count} SQL rewrite rules.")
+    return rewritten
+
+
+def check_sql(sql):
+    """
+    Check that converted SQL is complete: strings, quoted identifiers,
+    parentheses and $$ bodies are all closed.
+
+    :return: What is wrong with sql, or None when it passes
+    """
+    if not sql or not sql.strip():
+        return "empty SQL"
+    depth = 0
+    dollar_quotes = 0
+    for kind, text in tokenize(sql):
+        if kind in ("string", "quoted") and (len(text) < 2 or text[-1] != text[0]):
+            return "unterminated string or identifier"
+        if kind != "symbol":
+            continue
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+            if depth < 0:
+                return "unbalanced parentheses"
+        elif text == "$$":
+            dollar_quotes += 1
+    if depth:
+        return "unbalanced parentheses"
+    if dollar_quotes % 2:
+        return "unterminated $$ body"
+    return None
@@ -0,0 +1,118 @@
+import copy
+import xml.etree.ElementTree as ET
+
+from app.utils import estimate_tokens, logger
+
+
+XSI_TYPE = "{http://www.w3.org/2001/XMLSchema-instance}type"
+
+# Elements that only carry editor state or documentation.
+DROPPED_ELEMENTS = {
+    "layout",
+    "shapes",
+    "shape",
+    "origin",
+    "metadata",
+    "descriptions",
+    "comment",
+}
+
+# Attributes that do not change the generated SQL.
+DROPPED_ATTRIBUTES = {
+    "schemaVersion",
+    "applyPrivilegeType",
+    "checkAnalyticPrivileges",
+    "defaultClient",
+    "defaultLanguage",
+    "hierarchiesSQLEnabled",
+    "translationRelevant",
+    "visibility",
+    "calculationScenarioType",
+    "enforceSqlExecution",
+    "executionSemantic",
+    "cacheInvalidationPeriod",
+    "propagateInstantiation",
+    "pruningTable",
+    "attributeHierarchyActive",
+    "attributeHierarchyDefaultMember",
+    "displayAttribute",
+    "displayFolder",
+    "descriptionColumnName",
+    "infoObject",
+    "modelObjectType",
+    "modelObjectNameSpace",
+    "changedAt",
+    "createdAt",
+}
+
+# xsi:type values that are the default for their element.
+DEFAULT_TYPES = {"AttributeMapping"}
+
+
+def _local_name(name):
+    return name.rsplit("}", 1)[-1]
+
+
+def _prune(element, keep_descriptions):
+    for child in list(element):
+        name = _local_name(child.tag)
+        if name in DROPPED_ELEMENTS and not (
+                name == "descriptions" and keep_descriptions):
+            element.remove(child)
+            continue
+
+        _prune(child, keep_descriptions=False)
+        if not len(child) and not child.attrib and not (child.text or "").strip():
+            element.remove(child)
+
+    element.tag = _local_name(element.tag)
+    attributes = {}
+    for name, value in element.attrib.items():
+        if name == XSI_TYPE:
+            value = value.rsplit(":", 1)[-1]
+            if value not in DEFAULT_TYPES:
+                attributes["type"] = value
+        elif _local_name(name) not in DROPPED_ATTRIBUTES:
+            attributes[_local_name(name)] = value
+    element.attrib.clear()
+    element.attrib.update(attributes)
+
+    element.text = element.text.strip() or None if element.text else None
+    element.tail = None
+
+
+def compact_element(element):
+    """
+    Return a pruned, compact copy of a single element, e.g. one calculation
+    node, as an XML string.
+    """
+    element = copy.deepcopy(element)
+    _prune(element, keep_descriptions=False)
+    return ET.tostring(element, encoding="unicode", short_empty_elements=True)
+
+
+def prune_calculation_view(xml):
+    """
+    Reduce a calculation view to the parts that determine its SQL: layout,
+    documentation, editor settings, namespaces, comments and whitespace are
+    removed. Only the view's own description is kept, since it names the
+    generated procedure.
+
+    :param xml: Calculation view XML (bytes or str)
+    :return: Compact XML string, or the input unchanged if it cannot be parsed
+    """
+    source = xml.decode("utf-8", errors="replace") if isinstance(xml, bytes) else xml
+    try:
+        root = ET.fromstring(xml)
+    except ET.ParseError as e:
+        logger.warning(f"Could not parse calculation view for pruning: {e}")
+        return source
+
+    _prune(root, keep_descriptions=True)
+    pruned = ET.tostring(root, encoding="unicode", short_empty_elements=True)
+
+    before = estimate_tokens(source)
+    after = estimate_tokens(pruned)
+    logger.info(f"Pruned calculation view {root.get('id')}: {before} -> {after} "
+                f"tokens ({before - after} saved).")
+    return pruned
@@ -0,0 +1,599 @@
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.utils import logger
+
+
+XSI_TYPE = "{http://www.w3.org/2001/XMLSchema-instance}type"
+
+JOIN_TYPES = {
+    "inner": "INNER JOIN",
+    "referential": "INNER JOIN",
+    "leftouter": "LEFT OUTER JOIN",
+    "rightouter": "RIGHT OUTER JOIN",
+    "fullouter": "FULL OUTER JOIN",
+}
+
+AGGREGATION_FUNCTIONS = {
+    "sum": "SUM",
+    "count": "COUNT",
+    "min": "MIN",
+    "max": "MAX",
+    "avg": "AVG",
+}
+
+# Formulas and filters are only passed through when they consist of quoted
+# column names, literals, arithmetic and boolean operators.
+SIMPLE_EXPRESSION_TOKEN = re.compile(
+    r"""\s+|"[^"]+"|'(?:[^']|'')*'|\d+(?:\.\d+)?|<>|!=|<=|>=|\|\||[-+*/()=<>,]"""
+    r"""|\b(?:AND|OR|NOT|IN|IS|NULL|LIKE|BETWEEN)\b""",
+    re.IGNORECASE,
+)
+
+
+class UnsupportedViewError(Exception):
+    """Raised when a calculation view contains constructs the local translator
+    cannot render deterministically."""
+
+
+@dataclass
+class Mapping:
+    target: str
+    source: Optional[str] = None
+    constant: Optional[str] = None
+
+
+@dataclass
+class NodeInput:
+    node: str
+    mappings: List[Mapping] = field(default_factory=list)
+
+    def source_for(self, target):
+        for mapping in self.mappings:
+            if mapping.target == target:
+                return mapping
+        return None
+
+
+@dataclass
+class Attribute:
+    id: str
+    aggregation: Optional[str] = None
+    formula: Optional[str] = None
+
+
+@dataclass
+class ViewNode:
+    id: str
+    node_type: str
+    element: ET.Element
+    inputs: List[NodeInput] = field(default_factory=list)
+    attributes: List[Attribute] = field(default_factory=list)
+    calculated_attributes: List[Attribute] = field(default_factory=list)
+    filter: Optional[str] = None
+    join_type: Optional[str] = None
+    join_attributes: List[str] = field(default_factory=list)
+
+    @property
+    def dependencies(self):
+        return [node_input.node for node_input in self.inputs]
+
+
+@dataclass
+class OutputColumn:
+    id: str
+    source: str
+    aggregation: Optional[str] = None
+
+
+@dataclass
+class CalculationView:
+    id: str
+    name: str
+    output_node: str
+    output_view_type: Optional[str]
+    data_sources: Dict[str, str]
+    nodes: Dict[str, ViewNode]
+    output_columns: List[OutputColumn]
+    has_parameters: bool = False
+    has_calculated_output: bool = False
+
+    def view_name(self, node_id):
+        return f"{self.name}_{node_id}"
+
+    def reference(self, node_id):
+        """Return the SQL relation for a data source or node id."""
+        if node_id in self.data_sources:
+            return self.data_sources[node_id]
+        if node_id in self.nodes:
+            return quote_identifier(self.view_name(node_id))
+        raise UnsupportedViewError(f"Unknown input node '{node_id}'")
+
+    def execution_order(self):
+        """
+        Order the nodes so that every node follows its inputs, keeping the
+        document order of the XML wherever the dependencies allow it.
+        """
+        remaining = list(self.nodes)
+        ordered = []
+        emitted = set()
+
+        while remaining:
+            for node_id in remaining:
+                node = self.nodes[node_id]
+                if all(dep in emitted or dep not in self.nodes
+                       for dep in node.dependencies):
+                    break
+            else:
+                raise UnsupportedViewError(
+                    "Cyclic dependency between calculation nodes")
+
+            remaining.remove(node_id)
+            emitted.add(node_id)
+            ordered.append(node_id)
+
+        return ordered
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _xsi_type(element):
+    return element.get(XSI_TYPE, "").rsplit(":", 1)[-1]
+
+
+def _children(element, name):
+    return [child for child in element if _local_name(child.tag) == name]
+
+
+def _child(element, name):
+    children = _children(element, name)
+    return children[0] if children else None
+
+
+def _descendants(element, name):
+    return [child for child in element.iter() if _local_name(child.tag) == name]
+
+
+def _node_ref(value):
+    return (value or "").lstrip("#")
+
+
+def _text(element):
+    if element is None:
+        return None
+    text = "".join(element.itertext()).strip()
+    return text or None
+
+
+def _check_simple_expression(expression, context):
+    position = 0
+    while position < len(expression):
+        match = SIMPLE_EXPRESSION_TOKEN.match(expression, position)
+        if match is None:
+            raise UnsupportedViewError(
+                f"Unsupported expression in {context}: {expression}")
+        position = match.end()
+    return expression
+
+
+def _procedure_name(root):
+    descriptions = _child(root, "descriptions")
+    name = descriptions.get("defaultDescription") if descriptions is not None else None
+    name = name or root.get("id") or "CalculationView"
+    name = re.sub(r"\W+", "_", name).strip("_")
+    return name or "CalculationView"
+
+
+def _parse_data_sources(root):
+    data_sources = {}
+    for data_source in _descendants(root, "DataSource"):
+        source_type = data_source.get("type", "DATA_BASE_TABLE")
+        if source_type not in ("DATA_BASE_TABLE", "TABLE"):
+            raise UnsupportedViewError(
+                f"Unsupported data source type '{source_type}'")
+
+        column_object = _child(data_source, "columnObject")
+        if column_object is not None:
+            schema = column_object.get("schemaName")
+            table = column_object.get("columnObjectName")
+            relation = quote_identifier(table)
+            if schema:
+                relation = f"{quote_identifier(schema)}.{relation}"
+        else:
+            resource = _text(_child(data_source, "resourceUri"))
+            if not resource:
+                raise UnsupportedViewError(
+                    f"Data source '{data_source.get('id')}' has no table")
+            relation = quote_identifier(resource.rsplit("/", 1)[-1])
+
+        data_sources[data_source.get("id")] = relation
+    return data_sources
+
+
+def _parse_attributes(element, container, item):
+    attributes = []
+    parent = _child(element, container)
+    if parent is None:
+        return attributes
+
+    for attribute in _children(parent, item):
+        formula = _text(_child(attribute, "formula"))
+        attributes.append(Attribute(
+            id=attribute.get("id"),
+            aggregation=attribute.get("aggregationType"),
+            formula=formula,
+        ))
+    return attributes
+
+
+def _parse_node(element):
+    node_type = _xsi_type(element)
+    node = ViewNode(id=element.get("id"), node_type=node_type, element=element)
+
+    for input_element in _children(element, "input"):
+        node_input = NodeInput(node=_node_ref(input_element.get("node")))
+        for mapping in _children(input_element, "mapping"):
+            mapping_type = _xsi_type(mapping)
+            if mapping_type == "ConstantAttributeMapping":
+                constant = None if mapping.get("null") == "true" else mapping.get("value")
+                node_input.mappings.append(
+                    Mapping(target=mapping.get("target"), constant=constant))
+            else:
+                node_input.mappings.append(
+                    Mapping(target=mapping.get("target"), source=mapping.get("source")))
+        node.inputs.append(node_input)
+
+    node.attributes = _parse_attributes(element, "viewAttributes", "viewAttribute")
+    node.calculated_attributes = _parse_attributes(
+        element, "calculatedViewAttributes", "calculatedViewAttribute")
+    node.filter = _text(_child(element, "filter"))
+
+    node.join_type = element.get("joinType")
+    node.join_attributes = [join_attribute.get("name")
+                            for join_attribute in _children(element, "joinAttribute")]
+    return node
+
+
+def _parse_output_columns(logical_model, nodes, output_node):
+    columns = []
+    if logical_model is not None:
+        for attribute in _descendants(logical_model, "attribute"):
+            key_mapping = _child(attribute, "keyMapping")
+            source = key_mapping.get("columnName") if key_mapping is not None else attribute.get("id")
+            columns.append(OutputColumn(id=attribute.get("id"), source=source))
+
+        for measure in _descendants(logical_model, "measure"):
+            measure_mapping = _child(measure, "measureMapping")
+            source = measure_mapping.get("columnName") if measure_mapping is not None else measure.get("id")
+            columns.append(OutputColumn(
+                id=measure.get("id"), source=source,
+                aggregation=measure.get("aggregationType")))
+
+    if not columns and output_node in nodes:
+        node = nodes[output_node]
+        for attribute in node.attributes + node.calculated_attributes:
+            columns.append(OutputColumn(id=attribute.id, source=attribute.id))
+
+    return columns
+
+
+def parse_calculation_view(xml):
+    """
+    Parse a calculation view into its node dependency graph.
+
+    :param xml: Calculation view XML (bytes or str)
+    :return: CalculationView
+    """
+    try:
+        root = ET.fromstring(xml)
+    except ET.ParseError as e:
+        raise UnsupportedViewError(f"Invalid calculation view XML: {e}")
+
+    if _local_name(root.tag) != "scenario":
+        raise UnsupportedViewError(f"Unexpected root element '{root.tag}'")
+
+    nodes = {}
+    calculation_views = _child(root, "calculationViews")
+    if calculation_views is not None:
+        for element in _children(calculation_views, "calculationView"):
+            node = _parse_node(element)
+            nodes[node.id] = node
+
+    logical_model = _child(root, "logicalModel")
+    output_node = _node_ref(logical_model.get("id")) if logical_model is not None else None
+    if not output_node and nodes:
+        output_node = list(nodes)[-1]
+
+    has_calculated_output = logical_model is not None and any(
+        _descendants(logical_model, name)
+        for name in ("calculatedAttribute", "calculatedMeasure",
+                     "restrictedMeasure"))
+
+    has_parameters = bool(_descendants(root, "variable"))
+
+    return CalculationView(
+        id=root.get("id"),
+        name=_procedure_name(root),
+        output_node=output_node,
+        output_view_type=root.get("outputViewType"),
+        data_sources=_parse_data_sources(root),
+        nodes=nodes,
+        output_columns=_parse_output_columns(logical_model, nodes, output_node),
+        has_parameters=has_parameters,
+        has_calculated_output=has_calculated_output,
+    )
+
+
+def _select_item(expression, target):
+    if expression == quote_identifier(target):
+        return expression
+    return f"{expression} AS {quote_identifier(target)}"
+
+
+def _mapped_column(node_input, alias, target):
+    mapping = node_input.source_for(target)
+    if mapping is None:
+        return None
+    if mapping.source is None:
+        value = "NULL" if mapping.constant is None else "'" + mapping.constant.replace("'", "''") + "'"
+        return _select_item(value, target)
+
+    column = quote_identifier(mapping.source)
+    if alias:
+        column = f"{alias}.{column}"
+    return _select_item(column, target)
+
+
+def _render_single_input(view, node):
+    if len(node.inputs) != 1:
+        raise UnsupportedViewError(
+            f"{node.node_type} '{node.id}' must have exactly one input")
+
+    node_input = node.inputs[0]
+    columns = []
+    for attribute in node.attributes:
+        column = _mapped_column(node_input, None, attribute.id)
+        columns.append(column or quote_identifier(attribute.id))
+
+    return columns, view.reference(node_input.node)
+
+
+def _render_projection(view, node):
+    columns, relation = _render_single_input(view, node)
+    return f"SELECT {', '.join(columns)} FROM {relation}"
+
+
+def _render_aggregation(view, node):
+    if node.filter:
+        raise UnsupportedViewError(
+            f"Filter on aggregation node '{node.id}' is not supported")
+
+    node_input = node.inputs[0] if len(node.inputs) == 1 else None
+    columns, relation = _render_single_input(view, node)
+    group_by = []
+    select = []
+
+    for attribute, column in zip(node.attributes, columns):
+        if attribute.aggregation:
+            function = AGGREGATION_FUNCTIONS.get(attribute.aggregation.lower())
+            if function is None:
+                raise UnsupportedViewError(
+                    f"Unsupported aggregation '{attribute.aggregation}' in '{node.id}'")
+            mapping = node_input.source_for(attribute.id)
+            source = quote_identifier(mapping.source if mapping and mapping.source else attribute.id)
+            select.append(f"{function}({source}) AS {quote_identifier(attribute.id)}")
+        else:
+            select.append(column)
+            mapping = node_input.source_for(attribute.id)
+            group_by.append(quote_identifier(
+                mapping.source if mapping and mapping.source else attribute.id))
+
+    sql = f"SELECT {', '.join(select)} FROM {relation}"
+    if group_by:
+        sql += f" GROUP BY {', '.join(group_by)}"
+    return sql
+
+
+def _render_join(view, node):
+    if len(node.inputs) != 2:
+        raise UnsupportedViewError(
+            f"JoinView '{node.id}' must have exactly two inputs")
+
+    join = JOIN_TYPES.get((node.join_type or "inner").lower())
+    if join is None:
+        raise UnsupportedViewError(
+            f"Unsupported join type '{node.join_type}' in '{node.id}'")
+    if not node.join_attributes:
+        raise UnsupportedViewError(f"JoinView '{node.id}' has no join attributes")
+
+    left, right = node.inputs
+    columns = []
+    for attribute in node.attributes:
+        column = (_mapped_column(left, "l", attribute.id)
+                  or _mapped_column(right, "r", attribute.id))
+        if column is None:
+            raise UnsupportedViewError(
+                f"Attribute '{attribute.id}' of '{node.id}' has no mapping")
+        columns.append(column)
+
+    conditions = []
+    for name in node.join_attributes:
+        left_mapping = left.source_for(name)
+        right_mapping = right.source_for(name)
+        if not (left_mapping and left_mapping.source and right_mapping and right_mapping.source):
+            raise UnsupportedViewError(
+                f"Join attribute '{name}' of '{node.id}' is not mapped on both inputs")
+        conditions.append(
+            f"l.{quote_identifier(left_mapping.source)} = r.{quote_identifier(right_mapping.source)}")
+
+    return (f"SELECT {', '.join(columns)} FROM {view.reference(left.node)} l "
+            f"{join} {view.reference(right.node)} r ON {' AND '.join(conditions)}")
+
+
+def _render_union(view, node):
+    if not node.inputs:
+        raise UnsupportedViewError(f"UnionView '{node.id}' has no inputs")
+
+    selects = []
+    for node_input in node.inputs:
+        columns = []
+        for attribute in node.attributes:
+            column = _mapped_column(node_input, None, attribute.id)
+            columns.append(column or f"NULL AS {quote_identifier(attribute.id)}")
+        selects.append(
+            f"SELECT {', '.join(columns)} FROM {view.reference(node_input.node)}")
+    return " UNION ALL ".join(selects)
+
+
+# Node types rendered locally; everything else goes to the LLM.
+NODE_RENDERERS = {
+    "ProjectionView": _render_projection,
+    "JoinView": _render_join,
+    "AggregationView": _render_aggregation,
+    "UnionView": _render_union,
+}
+
+
+def render_node_query(view, node):
+    """
+    Render the SELECT statement for a single calculation node.
+
+    :raises UnsupportedViewError: If the node uses unsupported constructs
+    """
+    renderer = NODE_RENDERERS.get(node.node_type)
+    if renderer is None:
+        raise UnsupportedViewError(
+            f"Unsupported node type '{node.node_type}' ('{node.id}')")
+
+    sql = renderer(view, node)
+
+    if node.calculated_attributes:
+        calculated = []
+        for attribute in node.calculated_attributes:
+            if not attribute.formula:
+                raise UnsupportedViewError(
+                    f"Calculated attribute '{attribute.id}' of '{node.id}' has no formula")
+            formula = _check_simple_expression(
+                attribute.formula, f"calculated attribute '{attribute.id}'")
+            calculated.append(f"{formula} AS {quote_identifier(attribute.id)}")
+        sql = f"SELECT t.*, {', '.join(calculated)} FROM ({sql}) t"
+
+    if node.filter and node.node_type != "AggregationView":
+        condition = _check_simple_expression(node.filter, f"filter of '{node.id}'")
+        sql = f"SELECT * FROM ({sql}) t WHERE {condition}"
+
+    return sql
+
+
+def render_node_statement(view, node, query):
+    """
+    Wrap a node query into the statement created inside the procedure:
+    ProjectionViews become views, the other node types become CTEs that are
+    published as views so later nodes can reference them.
+    """
+    name = quote_identifier(view.view_name(node.id))
+    if node.node_type == "ProjectionView":
+        return f"CREATE OR REPLACE VIEW {name} AS\n    {query};"
+
+    cte = quote_identifier(f"{node.id}_cte")
+    return (f"CREATE OR REPLACE VIEW {name} AS\n"
+            f"    WITH {cte} AS (\n        {query}\n    )\n"
+            f"    SELECT * FROM {cte};")
+
+
+def render_result_query(view):
+    relation = view.reference(view.output_node)
+    output = view.nodes.get(view.output_node)
+    # An aggregation node has already aggregated its measures; aggregating
+    # them again would, e.g., turn a count into 1 per group.
+    aggregate = (
+        (view.output_view_type or "").lower() == "aggregation"
+        and not (output is not None and output.node_type == "AggregationView")
+        and any(column.aggregation for column in view.output_columns))
+
+    select = []
+    group_by = []
+    for column in view.output_columns:
+        source = quote_identifier(column.source)
+        if aggregate and column.aggregation:
+            function = AGGREGATION_FUNCTIONS.get(column.aggregation.lower())
+            if function is None:
+                raise UnsupportedViewError(
+                    f"Unsupported aggregation '{column.aggregation}' for '{column.id}'")
+            select.append(f"{function}({source}) AS {quote_identifier(column.id)}")
+        else:
+            select.append(_select_item(source, column.id))
+            group_by.append(source)
+
+    if not select:
+        select = ["*"]
+
+    sql = f"SELECT {', '.join(select)} FROM {relation}"
+    if aggregate and group_by:
+        sql += f" GROUP BY {', '.join(group_by)}"
+    return sql
+
+
+def render_procedure(view, statements):
+    """
+    Assemble the stored procedure from the per-node statements, which must be
+    given in execution order.
+    """
+    body = "\n\n".join(f"    {statement}" for statement in statements)
+    return (
+        f"CREATE OR REPLACE PROCEDURE {quote_identifier(view.name)}()\n"
+        f"RETURNS TABLE ()\n"
+        f"LANGUAGE SQL\n"
+        f"AS\n"
+        f"$$\n"
+        f"DECLARE\n"
+        f"    res RESULTSET;\n"
+        f"BEGIN\n"
+        f"{body}\n\n"
+        f"    res := ({render_result_query(view)});\n\n"
+        f"    RETURN TABLE(res);\n"
+        f"END;\n"
+        f"$$;"
+    )
+
+
+def check_view_supported(view):
+    if view.has_parameters:
+        raise UnsupportedViewError("Input parameters and variables are not supported")
+    if view.has_calculated_output:
+        raise UnsupportedViewError(
+            "Calculated or restricted columns in the logical model are not supported")
+    if not view.output_node:
+        raise UnsupportedViewError("Calculation view has no output node")
+
+
+def translate_calculation_view(xml):
+    """
+    Translate a calculation view into a Snowflake stored procedure without
+    calling the LLM.
+
+    :param xml: Calculation view XML (bytes or str)
+    :return: Snowflake stored procedure SQL
+    :raises UnsupportedViewError: If the view uses constructs the translator
+        does not support
+    """
+    view = parse_calculation_view(xml)
+    check_view_supported(view)
+
+    statements = []
+    for node_id in view.execution_order():
+        node = view.nodes[node_id]
+        statements.append(render_node_statement(
+            view, node, render_node_query(view, node)))
+
+    logger.info(f"Translated calculation view '{view.name}' locally "
+                f"({len(statements)} nodes).")
+    return render_procedure(view, statements)
@@ -0,0 +1,107 @@
+import asyncio
+import base64
+import json
+import time
+
+from app.config import (
+    WEBAPP_USERNAME,
+    WEBAPP_PASSWORD,
+    WEBAPP_REMEMBERME,
+    WEBAPP_AUTH_URL,
+    WEBAPP_TOKEN_TTL,
+)
+from app.services.http_clients import get_http_client
+from app.utils import logger
+from app.utils.metrics import stage
+
+
+# Tokens are renewed this many seconds before they expire.
+TOKEN_EXPIRY_MARGIN = 60
+
+
+def token_expiry(token, default_ttl=WEBAPP_TOKEN_TTL):
+    """
+    Return the expiry (epoch seconds) of a JWT from its exp claim, or
+    default_ttl from now when the token is not a JWT with an exp claim. The
+    signature is not verified; the web app does that.
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + default_ttl
+
+
+class WebAppClient:
+    """
+    Client for the web app's authenticated endpoints. The id_token is shared
+    by all jobs of the process until shortly before it expires; a 401 renews
+    it once, however many requests were rejected with the same token.
+    """
+
+    def __init__(self):
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = None
+
+    async def _login(self):
+        auth_payload = {
+            "username": WEBAPP_USERNAME,
+            "password": WEBAPP_PASSWORD,
+            "rememberMe": WEBAPP_REMEMBERME
+        }
+        with stage("webapp_auth"):
+            auth_response = await get_http_client().post(
+                WEBAPP_AUTH_URL, json=auth_payload)
+            auth_response.raise_for_status()
+            access_token = auth_response.json().get("id_token")
+
+        if not access_token:
+            logger.error("Authentication failed: No access token received")
+            raise ValueError(
+                "Authentication failed: No access token received")
+
+        logger.info("Authentication successful, access token obtained.")
+        self._token = access_token
+        self._expires_at = token_expiry(access_token) - TOKEN_EXPIRY_MARGIN
+
+    async def token(self, rejected=None):
+        """
+        Return a valid id_token, logging in when there is none, it expired or
+        it is the token that was just rejected.
+
+        :param rejected: Token that received a 401
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if (self._token is None or self._token == rejected
+                    or time.time() >= self._expires_at):
+                await self._login()
+            return self._token
+
+    async def post(self, url, payload):
+        """
+        POST payload as JSON with the bearer token, renewing the token once
+        if it is rejected.
+
+        :return: The httpx response
+        :raises httpx.HTTPStatusError: If the response is an error
+        """
+        access_token = await self.token()
+        for attempt in (1, 2):
+            headers = {
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            }
+            response = await get_http_client().post(url, json=payload, headers=headers)
+            if response.status_code == 401 and attempt == 1:
+                logger.info("Web app token rejected, renewing it.")
+                access_token = await self.token(rejected=access_token)
+                continue
+            response.raise_for_status()
+            return response
+
+
+webapp_client = WebAppClient()
@@ -1,27 +1,133 @@
+import asyncio
 import json
+from collections import defaultdict
+
 import redis
 
-from app.config import redis_client
+from app.config import JOB_RESULT_TTL, STATUS_FLUSH_INTERVAL, async_redis_client
 from app.utils import logger
 
 
-def update_status(unique_id, status, percentage):
+STATUS_CHANNEL_PREFIX = "status:"
+
+# Job statuses after which no further updates are published.
+TERMINAL_STATUSES = {"Completed", "Failed"}
+
+
+def status_channel(unique_id):
+    return f"{STATUS_CHANNEL_PREFIX}{unique_id}"
+
+
+def members_key(unique_id):
+    return f"{STATUS_CHANNEL_PREFIX}{unique_id}:members"
+
+
+def batch_archives_key(batch_id):
+    return f"{STATUS_CHANNEL_PREFIX}{batch_id}:archives"
+
+
+class StatusWriter:
+    """
+    Coalesces status writes. Updates are merged per job, the latest status
+    winning and member changes accumulating, and every STATUS_FLUSH_INTERVAL
+    the pending updates of all jobs are written and published in one
+    pipeline, so concurrent conversions do not issue one round trip each.
+
+    The statuses of archives converted as part of a batch are also copied
+    into the batch's archive hash, see track_batch.
     """
-    Update the status data in Redis for a given unique ID.
+
+    def __init__(self, interval=STATUS_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending = {}
+        self._flush_task = None
+        self._lock = None
+        self._batch_of = {}
+
+    def track_batch(self, batch_id, archive_ids):
+        """Copy the status updates of these archives into the batch's hash."""
+        for archive_id in archive_ids:
+            self._batch_of[archive_id] = batch_id
+
+    def untrack_batch(self, archive_ids):
+        for archive_id in archive_ids:
+            self._batch_of.pop(archive_id, None)
+
+    def update(self, unique_id, status, percentage, members=None):
+        """
+        Queue an update for the next flush. Must be called on the event loop.
+        """
+        pending = self._pending.setdefault(unique_id, {"members": {}})
+        pending["status"] = status
+        pending["percentage"] = percentage
+        if members:
+            pending["members"].update(members)
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to write coalesced status updates: {e}")
+
+    async def flush(self):
+        """
+        Write and publish all pending updates.
+        """
+        # Flushes are serialized so that a job's updates reach Redis in order.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+
+            pipe = async_redis_client.pipeline(transaction=False)
+            for unique_id, update in pending.items():
+                status_data = {
+                    "status": update["status"],
+                    "percentage": update["percentage"]
+                }
+                members = update["members"]
+                pipe.set(unique_id, json.dumps(status_data))
+                batch_id = self._batch_of.get(unique_id)
+                if batch_id is not None:
+                    pipe.hset(batch_archives_key(batch_id), unique_id,
+                              json.dumps(status_data))
+                if members:
+                    pipe.hset(members_key(unique_id), mapping=members)
+                    pipe.expire(members_key(unique_id), JOB_RESULT_TTL)
+                pipe.publish(status_channel(unique_id), json.dumps(
+                    {**status_data, "members": members}))
+            await pipe.execute()
+        logger.debug(f"Wrote status updates of {len(pending)} job(s).")
+
+
+async def update_status(unique_id, status, percentage, members=None):
+    """
+    Update the status data in Redis for a given unique ID and publish the
+    transition to its status channel.
 
     Args:
         unique_id (str): The unique identifier for the status.
         status (str): The current status (e.g., 'In Progress', 'Completed').
         percentage (int): The completion percentage (e.g., 50 for 50%).
+        members (dict): Optional member name -> member status changes, stored
+            in the job's member hash in the same pipeline.
+
+    The update is written, together with any pending coalesced updates,
+    before returning. Frequent progress updates go through
+    status_writer.update instead.
     """
+    status_writer.update(unique_id, status, percentage, members)
     try:
-        status_data = {
-            "status": status,
-            "percentage": percentage
-        }
-
-        redis_client.set(unique_id, json.dumps(status_data))
-        logger.info(f"Updated status for unique_id {unique_id}: {status_data}")
+        await status_writer.flush()
+        logger.info(f"Updated status for unique_id {unique_id}: {status}, {percentage}")
     except redis.ConnectionError as e:
         logger.error(f"Failed to connect to Redis: {e}")
         raise
@@ -29,3 +135,171 @@ def update_status(unique_id, status, percentage):
         logger.error(f"An error occurred while updating status for unique_id {
                      unique_id}: {e}")
         raise
+
+
+async def fetch_status(unique_id):
+    """
+    Return the stored status of a job, or None when the job is unknown.
+
+    :raises json.JSONDecodeError: If the stored status is not valid JSON
+    """
+    status_data = await async_redis_client.get(unique_id)
+    if status_data is None:
+        return None
+    return json.loads(status_data)
+
+
+async def get_status_snapshot(unique_id):
+    """
+    Return the stored status and all member statuses of a job, or None when
+    the job is unknown.
+    """
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.get(unique_id)
+    pipe.hgetall(members_key(unique_id))
+    status_data, members = await pipe.execute()
+    if status_data is None:
+        return None
+    return {**json.loads(status_data), "members": members}
+
+
+async def reset_batch_statuses(batch_id, archive_ids):
+    """
+    Mark a batch and its archives as queued, replacing the batch's archive
+    hash.
+    """
+    status_data = json.dumps({"status": "Queued", "percentage": "0%"})
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.set(batch_id, status_data)
+    pipe.delete(batch_archives_key(batch_id))
+    for archive_id in archive_ids:
+        pipe.set(archive_id, status_data)
+    pipe.hset(batch_archives_key(batch_id),
+              mapping={archive_id: status_data for archive_id in archive_ids})
+    pipe.expire(batch_archives_key(batch_id), JOB_RESULT_TTL)
+    await pipe.execute()
+
+
+async def update_unfinished_archive_statuses(batch_id, status, percentage):
+    """
+    Set the status of the archives of a batch that are neither completed nor
+    failed, when the batch job is retried or given up.
+    """
+    # Pending progress updates of the archives must not land afterwards.
+    await status_writer.flush()
+    archives = await async_redis_client.hgetall(batch_archives_key(batch_id))
+    unfinished = [archive_id for archive_id, data in archives.items()
+                  if json.loads(data)["status"] not in TERMINAL_STATUSES]
+    if not unfinished:
+        return
+
+    status_data = {"status": status, "percentage": percentage}
+    pipe = async_redis_client.pipeline(transaction=False)
+    for archive_id in unfinished:
+        pipe.set(archive_id, json.dumps(status_data))
+        pipe.hset(batch_archives_key(batch_id), archive_id, json.dumps(status_data))
+        pipe.publish(status_channel(archive_id), json.dumps({**status_data, "members": {}}))
+    await pipe.execute()
+    logger.info(f"Updated status of {len(unfinished)} archive(s) of batch {
+                batch_id}: {status}")
+
+
+async def get_batch_status(batch_id):
+    """
+    Return the status of a batch with the status of each of its archives,
+    the number of archives per status and the mean progress, or None when
+    the batch is unknown.
+    """
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.get(batch_id)
+    pipe.hgetall(batch_archives_key(batch_id))
+    status_data, archives = await pipe.execute()
+    if status_data is None:
+        return None
+
+    archives = {archive_id: json.loads(data) for archive_id, data in archives.items()}
+    counts = defaultdict(int)
+    progress = 0
+    for archive in archives.values():
+        counts[archive["status"]] += 1
+        if archive["status"] == "Completed":
+            progress += 100
+        elif archive["percentage"].rstrip("%").isdigit():
+            progress += int(archive["percentage"].rstrip("%"))
+    status = json.loads(status_data)["status"]
+    percentage = f"{progress // len(archives)}%" if archives else "0%"
+    return {"status": status, "percentage": percentage,
+            "counts": dict(counts), "archives": archives}
+
+
+async def reset_member_statuses(unique_id, members):
+    """
+    Replace the member hash of a job with the given member statuses.
+    """
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.delete(members_key(unique_id))
+    if members:
+        pipe.hset(members_key(unique_id), mapping=members)
+        pipe.expire(members_key(unique_id), JOB_RESULT_TTL)
+    await pipe.execute()
+
+
+class StatusBroadcaster:
+    """
+    Fan-out of status events to the watchers in this process.
+
+    A single pattern subscription, read by one task on the event loop,
+    receives the events of all jobs and copies them into the queues of the
+    watchers of that job, so the number of watchers does not change the
+    number of Redis connections or reads.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._watchers = defaultdict(set)
+        self._task = None
+
+    def subscribe(self, unique_id):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._watchers[unique_id].add(queue)
+        return queue
+
+    def unsubscribe(self, unique_id, queue):
+        watchers = self._watchers.get(unique_id)
+        if watchers is not None:
+            watchers.discard(queue)
+            if not watchers:
+                del self._watchers[unique_id]
+
+    async def _listen(self):
+        while True:
+            pubsub = async_redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{STATUS_CHANNEL_PREFIX}*")
+                logger.info("Subscribed to job status events.")
+                async for message in pubsub.listen():
+                    unique_id = message["channel"][len(STATUS_CHANNEL_PREFIX):]
+                    self._dispatch(unique_id, message["data"])
+            except redis.RedisError as e:
+                logger.error(f"Status subscription failed, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _dispatch(self, unique_id, data):
+        for queue in self._watchers.get(unique_id, ()):
+            if queue.full():
+                # The watcher fell behind; None tells it to re-read the
+                # snapshot instead of replaying every event.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+            else:
+                queue.put_nowait(data)
+
+
+status_writer = StatusWriter()
+status_broadcaster = StatusBroadcaster()
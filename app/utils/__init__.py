@@ -1,2 +1,3 @@
 from app.utils.logger import logger
-from app.utils.util import sanitize_json_string, convert_timestamp_to_timestamp_tz
+from app.utils.util import sanitize_json_string
+from app.utils.tokens import estimate_tokens
@@ -1,19 +1,145 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import random
 
-from datetime import datetime
-from logging.handlers import TimedRotatingFileHandler
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+from app.config.env_loader import (
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_ASYNC,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_RATES,
+    LOG_MAX_MESSAGE_LENGTH,
+    LOG_PAYLOADS,
+    LOG_MAX_PAYLOAD_LENGTH,
+)
 
 # Ensure the logs directory exists
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
-# Define the logger
-logger = logging.getLogger(__name__)
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(filename)s - %(lineno)d - %(message)s"
 
-# Prevent duplicate handlers if the logger is already configured
-if not logger.hasHandlers():
-    logger.setLevel(logging.DEBUG)
+
+def _truncate(text, limit):
+    if limit <= 0 or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} chars truncated]"
+
+
+def parse_sample_rates(spec):
+    """
+    Parse "DEBUG=0.1,INFO=0.5" into {logging.DEBUG: 0.1, logging.INFO: 0.5}.
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        level, _, rate = item.partition("=")
+        rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep each record with the sample rate of its level; levels without a
+    rate are always kept.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        return rate is None or random.random() < rate
+
+
+class TruncatingFilter(logging.Filter):
+    """
+    Cut long messages, and the `payload` extra (prompts, completions) unless
+    full payloads were requested with LOG_PAYLOADS.
+    """
+
+    def __init__(self, max_message_length, max_payload_length):
+        super().__init__()
+        self.max_message_length = max_message_length
+        self.max_payload_length = max_payload_length
+
+    def filter(self, record):
+        message = record.getMessage()
+        if self.max_message_length and len(message) > self.max_message_length:
+            record.msg = _truncate(message, self.max_message_length)
+            record.args = None
+        payload = getattr(record, "payload", None)
+        if payload is not None and self.max_payload_length is not None:
+            record.payload = _truncate(str(payload), self.max_payload_length)
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        payload = getattr(record, "payload", None)
+        return text if payload is None else f"{text}\n{payload}"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            entry["payload"] = payload
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that drops records instead of blocking when max_size
+    records are waiting, counting them in `dropped`.
+    """
+
+    def __init__(self, max_size):
+        super().__init__(queue.SimpleQueue())
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, while the arguments are
+        # unchanged; the record is updated in place rather than copied.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+def _output_handlers():
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else TextFormatter(TEXT_FORMAT)
 
     # Timed rotating file handler (rotates logs daily)
     current_date = datetime.now().strftime("%d-%m-%Y")
@@ -21,19 +147,42 @@ if not logger.hasHandlers():
     file_handler = TimedRotatingFileHandler(
         log_file_path, when="D", interval=1, backupCount=7
     )
-    file_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(filename)s - %(lineno)d - %(message)s"
-    )
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    file_handler.setFormatter(formatter)
 
     # Console handler (prints logs to the console)
     console_handler = logging.StreamHandler()
-    # Adjust the level for console logging if needed
-    console_handler.setLevel(logging.DEBUG)
-    console_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(filename)s - %(lineno)d - %(message)s"
-    )
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
-    
+    console_handler.setFormatter(formatter)
+    return [file_handler, console_handler]
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+log_listener = None
+
+# Prevent duplicate handlers if the logger is already configured
+if not logger.hasHandlers():
+    logger.setLevel(LOG_LEVEL)
+    filters = [TruncatingFilter(LOG_MAX_MESSAGE_LENGTH,
+                                None if LOG_PAYLOADS else LOG_MAX_PAYLOAD_LENGTH)]
+    sample_rates = parse_sample_rates(LOG_SAMPLE_RATES)
+    if sample_rates:
+        filters.insert(0, SamplingFilter(sample_rates))
+
+    if LOG_ASYNC:
+        # Records are formatted into lines and written by a background
+        # thread, so logging from the event loop never waits for disk or
+        # console I/O.
+        queue_handler = NonBlockingQueueHandler(LOG_QUEUE_SIZE)
+        handlers = [queue_handler]
+        log_listener = QueueListener(queue_handler.queue, *_output_handlers())
+        log_listener.start()
+        atexit.register(log_listener.stop)
+    else:
+        handlers = _output_handlers()
+
+    # On the logger rather than the handlers, so that they run once per
+    # record, in the calling thread, before the record is queued.
+    for log_filter in filters:
+        logger.addFilter(log_filter)
+    for handler in handlers:
+        logger.addHandler(handler)
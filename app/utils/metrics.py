@@ -0,0 +1,230 @@
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+
+# app.config loads .env, which may set PROMETHEUS_MULTIPROC_DIR; it has to be
+# in the environment before prometheus_client is imported.
+from app.config import PROMETHEUS_MULTIPROC_DIR, TRACING_ENABLED
+from app.utils.logger import logger
+
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+                 60, 120, 300)
+JOB_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+STAGE_SECONDS = Histogram(
+    "migration_stage_seconds",
+    "Time spent in each stage of a conversion job.",
+    ["stage", "outcome"], buckets=STAGE_BUCKETS)
+CONVERSION_SECONDS = Histogram(
+    "migration_conversion_seconds",
+    "Time to convert one member, by file type, conversion path and outcome.",
+    ["file_type", "path", "outcome"], buckets=STAGE_BUCKETS)
+MEMBERS_TOTAL = Counter(
+    "migration_members_total",
+    "Archive members processed, by file type and outcome.",
+    ["file_type", "outcome"])
+JOB_SECONDS = Histogram(
+    "migration_job_seconds",
+    "Duration of process_sap_hana_file runs.",
+    ["outcome"], buckets=JOB_BUCKETS)
+LLM_REQUEST_SECONDS = Histogram(
+    "migration_llm_request_seconds",
+    "Duration of single LLM requests, retries counted separately.",
+    ["model", "outcome"], buckets=STAGE_BUCKETS)
+LLM_TOKENS_TOTAL = Counter(
+    "migration_llm_tokens_total",
+    "LLM tokens used, from the response usage or estimated for streams.",
+    ["model", "kind"])
+LLM_ESCALATIONS_TOTAL = Counter(
+    "migration_llm_escalations_total",
+    "Conversions retried on a larger model tier after failing validation.",
+    ["file_type", "tier"])
+LLM_HEDGES_TOTAL = Counter(
+    "migration_llm_hedges_total",
+    "Slow LLM conversions considered for a hedged request, by which request "
+    "won or why none was sent.",
+    ["file_type", "outcome"])
+LLM_PACKED_MEMBERS_TOTAL = Counter(
+    "migration_llm_packed_members_total",
+    "Members sent in packed LLM requests, by whether their SQL came from the "
+    "pack or from a single-member fallback.",
+    ["file_type", "outcome"])
+
+# JobTrace of the job running in the current task.
+current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class JobTrace:
+    """
+    Cumulative time per stage of one job. Members are processed
+    concurrently, so the stage totals can exceed the job's wall time.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self._seconds = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._seconds[stage] += seconds
+            self._counts[stage] += 1
+
+    def summary(self):
+        with self._lock:
+            stages = sorted(self._seconds.items(), key=lambda item: -item[1])
+            return ", ".join(f"{stage} {seconds:.2f}s/{self._counts[stage]}"
+                             for stage, seconds in stages)
+
+
+def _span(name, attributes):
+    if otel_trace is None or not TRACING_ENABLED:
+        return contextlib.nullcontext()
+    return otel_trace.get_tracer("app").start_as_current_span(
+        name, attributes=attributes)
+
+
+def observe_stage(name, seconds, outcome="ok", job=None):
+    """
+    Record time spent in a pipeline stage in migration_stage_seconds and the
+    job's trace.
+
+    :param job: JobTrace to add to, by default the current job's; pass it
+        explicitly from threads that do not inherit the job's context
+    """
+    STAGE_SECONDS.labels(name, outcome).observe(seconds)
+    job = job if job is not None else current_job.get()
+    if job is not None:
+        job.add(name, seconds)
+
+
+@contextlib.contextmanager
+def stage(name, job=None, **attributes):
+    """
+    Time a pipeline stage with observe_stage, inside a trace span when
+    tracing is enabled.
+    """
+    job = job if job is not None else current_job.get()
+    outcome = "ok"
+    started = time.perf_counter()
+    with _span(name, attributes):
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            observe_stage(name, time.perf_counter() - started, outcome, job)
+
+
+@contextlib.contextmanager
+def job_trace(job_id):
+    """
+    Trace one run of a job: its duration and outcome go to
+    migration_job_seconds and, with TRACING_ENABLED, the time per stage is
+    logged when it ends and its stages are exported as spans.
+    """
+    job = JobTrace(job_id)
+    token = current_job.set(job)
+    outcome = "completed"
+    try:
+        with _span("process_sap_hana_file", {"file_uuid": job_id}):
+            yield job
+    except BaseException:
+        outcome = "failed"
+        raise
+    finally:
+        current_job.reset(token)
+        seconds = time.perf_counter() - job.started
+        JOB_SECONDS.labels(outcome).observe(seconds)
+        if TRACING_ENABLED:
+            logger.info(f"Job {job_id} {outcome} in {seconds:.2f}s: {job.summary()}")
+
+
+class ConversionRecorder:
+    """Collects the path and outcome of one conversion, see track_conversion."""
+
+    def __init__(self):
+        self.path = "llm"
+        self.outcome = "failed"
+
+    def result(self, sql, path=None):
+        """Record the conversion result and return it."""
+        if path is not None:
+            self.path = path
+        self.outcome = "converted" if sql else "failed"
+        return sql
+
+
+@contextlib.contextmanager
+def track_conversion(file_type):
+    """
+    Time a converter into migration_conversion_seconds. The converter passes
+    its result through the yielded recorder's result(), naming the path
+    ("local", "nodes" or "llm") that produced it.
+    """
+    recorder = ConversionRecorder()
+    started = time.perf_counter()
+    try:
+        yield recorder
+    except BaseException:
+        recorder.outcome = "error"
+        raise
+    finally:
+        CONVERSION_SECONDS.labels(file_type, recorder.path, recorder.outcome).observe(
+            time.perf_counter() - started)
+
+
+def record_llm_request(model, outcome, seconds, prompt_tokens=None,
+                       completion_tokens=None):
+    LLM_REQUEST_SECONDS.labels(model, outcome).observe(seconds)
+    if prompt_tokens:
+        LLM_TOKENS_TOTAL.labels(model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS_TOTAL.labels(model, "completion").inc(completion_tokens)
+
+
+def render_metrics():
+    """
+    Render the metrics in the Prometheus text format. With
+    PROMETHEUS_MULTIPROC_DIR set, the metrics of all API and worker processes
+    sharing that directory are aggregated.
+
+    :return: Body and content type of the response
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Drop the live gauges of an exited process from the multiprocess directory."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
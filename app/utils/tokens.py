@@ -0,0 +1,32 @@
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# Rough characters-per-token ratio of the OpenAI tokenizers on code and XML,
+# used when tiktoken is not installed.
+CHARS_PER_TOKEN = 4
+
+_encodings = {}
+
+
+def estimate_tokens(text, model="gpt-4o-mini"):
+    """
+    Count the tokens of a prompt fragment with tiktoken when it is installed,
+    otherwise estimate them from its length.
+    """
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", errors="replace")
+
+    if tiktoken is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        _encodings[model] = encoding
+    return len(encoding.encode(text, disallowed_special=()))
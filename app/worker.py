@@ -0,0 +1,156 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+
+import redis
+
+from app.config import (
+    WORKER_PROCESSES,
+    WORKER_CONCURRENCY,
+    JOB_POLL_INTERVAL,
+)
+from app.schemas import ConvertBatchRequest, ConvertFileRequest
+from app.services import (
+    close_http_clients,
+    job_queue,
+    process_batch,
+    process_sap_hana_file,
+    PermanentJobError,
+)
+from app.utils import logger
+from app.utils.metrics import mark_process_dead
+
+
+async def run_job(job):
+    """
+    Run a claimed job, extending its visibility deadline while it runs.
+
+    If the deadline could not be extended in time, because the queue has
+    handed the job to another worker or Redis could not be reached before
+    it passed, the job is cancelled here and neither acknowledged nor
+    failed, leaving its outcome to the new owner.
+    """
+    if "archives" in job.payload:
+        work = asyncio.create_task(process_batch(ConvertBatchRequest(**job.payload)))
+    else:
+        work = asyncio.create_task(process_sap_hana_file(ConvertFileRequest(**job.payload)))
+    lease_lost = False
+
+    async def heartbeat():
+        nonlocal lease_lost
+        interval = job_queue.visibility_timeout / 3
+        expires = time.monotonic() + job_queue.visibility_timeout
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                extended = await job_queue.extend(job)
+            except redis.RedisError as e:
+                if time.monotonic() + interval < expires:
+                    logger.warning(f"Could not extend the lease of job {job.job_id}, "
+                                   f"retrying: {e}")
+                    continue
+                logger.warning(f"Could not extend the lease of job {job.job_id} "
+                               f"before it expires: {e}")
+                extended = False
+            if not extended:
+                lease_lost = True
+                logger.warning(f"Job {job.job_id} was reclaimed by the queue, cancelling it.")
+                work.cancel()
+                return
+            expires = time.monotonic() + job_queue.visibility_timeout
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        try:
+            await work
+        finally:
+            heartbeat_task.cancel()
+        if not lease_lost:
+            await job_queue.ack(job)
+    except asyncio.CancelledError:
+        if not lease_lost:
+            raise
+    except PermanentJobError as e:
+        if not lease_lost:
+            await job_queue.fail(job, e, retryable=False)
+    except Exception as e:
+        if not lease_lost:
+            await job_queue.fail(job, e)
+
+
+async def worker_loop(concurrency=WORKER_CONCURRENCY):
+    """
+    Claim jobs from the queue and run up to `concurrency` of them at once
+    until SIGINT/SIGTERM, then wait for the running jobs to finish.
+    """
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+    logger.info(f"Worker started with concurrency {concurrency}.")
+
+    while not stopping.is_set():
+        await slots.acquire()
+        await job_queue.reap()
+
+        job = await job_queue.claim()
+        if job is None:
+            slots.release()
+            try:
+                await asyncio.wait_for(stopping.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        logger.info(f"Claimed job {job.job_id} (attempt {job.attempts}).")
+        task = asyncio.create_task(run_job(job))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _: slots.release())
+
+    if running:
+        logger.info(f"Waiting for {len(running)} running job(s) to finish.")
+        await asyncio.gather(*running, return_exceptions=True)
+    await close_http_clients()
+    logger.info("Worker stopped.")
+
+
+def run_worker():
+    asyncio.run(worker_loop())
+
+
+def main():
+    """
+    Start WORKER_PROCESSES worker processes, each running WORKER_CONCURRENCY
+    jobs concurrently.
+    """
+    if WORKER_PROCESSES <= 1:
+        run_worker()
+        return
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, name=f"worker-{index}")
+                 for index in range(WORKER_PROCESSES)]
+    for process in processes:
+        process.start()
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+
+    for process in processes:
+        process.join()
+        mark_process_dead(process.pid)
+
+
+if __name__ == "__main__":
+    main()
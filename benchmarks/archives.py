@@ -0,0 +1,141 @@
+"""
+Synthetic SAP HANA repository exports for benchmarks.
+"""
+import io
+import random
+import zipfile
+
+
+# Per size: calculation nodes per view, entities per schema, statements per
+# function.
+SIZES = {
+    "small": {"nodes": 3, "entities": 2, "statements": 3},
+    "medium": {"nodes": 12, "entities": 10, "statements": 20},
+    "large": {"nodes": 40, "entities": 40, "statements": 80},
+}
+
+# Every RANK_EVERY-th node is a RankView, which the local translator does
+# not render, so views exercise the LLM path.
+RANK_EVERY = 5
+
+VIEW_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<Calculation:scenario xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:Calculation="http://www.sap.com/ndb/BiModelCalculation.ecore" schemaVersion="2.3" id="{id}" applyPrivilegeType="ANALYTIC_PRIVILEGE" checkAnalyticPrivileges="true" defaultClient="$$client$$" defaultLanguage="$$language$$" visibility="internal" calculationScenarioType="TREE_BASED" dataCategory="CUBE" outputViewType="Projection">
+  <descriptions defaultDescription="{id}"/>
+  <metadata changedAt="2024-01-01 10:00:00.000"/>
+  <dataSources>
+    <DataSource id="SRC" type="DATA_BASE_TABLE">
+      <viewAttributes allViewAttributes="true"/>
+      <columnObject schemaName="BENCH" columnObjectName="{id}_SRC"/>
+    </DataSource>
+  </dataSources>
+  <calculationViews>
+"""
+
+VIEW_NODE = """    <calculationView xsi:type="Calculation:{type}" id="{id}">
+      <descriptions defaultDescription="Node {id}"/>
+      <viewAttributes>
+{attributes}
+      </viewAttributes>
+      <calculatedViewAttributes/>
+      <input node="#{input}">
+{mappings}
+      </input>
+    </calculationView>
+"""
+
+VIEW_FOOTER = """  </calculationViews>
+  <logicalModel id="{output}">
+    <attributes>
+{attributes}
+    </attributes>
+  </logicalModel>
+  <layout>
+    <shapes>
+{shapes}
+    </shapes>
+  </layout>
+</Calculation:scenario>
+"""
+
+
+def _columns(rng, count=6):
+    return [f"COL_{rng.randrange(10 ** 6):06d}" for _ in range(count)]
+
+
+def calculation_view(name, nodes, rng):
+    columns = _columns(rng)
+    parts = [VIEW_HEADER.format(id=name)]
+    previous = "SRC"
+    for index in range(nodes):
+        node_id = f"Node_{index + 1}"
+        node_type = "RankView" if (index + 1) % RANK_EVERY == 0 else "ProjectionView"
+        parts.append(VIEW_NODE.format(
+            type=node_type, id=node_id, input=previous,
+            attributes="\n".join(f'        <viewAttribute id="{column}"/>'
+                                 for column in columns),
+            mappings="\n".join(
+                f'        <mapping xsi:type="Calculation:AttributeMapping" '
+                f'target="{column}" source="{column}"/>' for column in columns)))
+        previous = node_id
+
+    parts.append(VIEW_FOOTER.format(
+        output=previous,
+        attributes="\n".join(
+            f'      <attribute id="{column}" order="{order}"><keyMapping '
+            f'columnObjectName="{previous}" columnName="{column}"/></attribute>'
+            for order, column in enumerate(columns, 1)),
+        shapes="\n".join(
+            f'      <shape modelObjectName="Node_{index + 1}" expanded="true">'
+            f'<upperLeftCorner x="{index * 40}" y="{index * 80}"/></shape>'
+            for index in range(nodes))))
+    return "".join(parts)
+
+
+def cds_schema(name, entities, rng):
+    lines = [f"namespace bench.{name.lower()};", "", "@Schema: 'BENCH'",
+             f"context {name} {{"]
+    for index in range(entities):
+        lines.append("    @Catalog.tableType : #COLUMN")
+        lines.append(f"    entity E{index} {{")
+        lines.append("        key ID : Integer;")
+        for column in _columns(rng):
+            lines.append(f"        {column} : String({rng.choice((10, 40, 100))});")
+        lines.append("        AMOUNT : Decimal(15, 2);")
+        lines.append("        CHANGED_AT : UTCTimestamp;")
+        lines.append("    };")
+    lines.append("};")
+    return "\n".join(lines)
+
+
+def scalar_function(name, statements, rng):
+    body = "\n".join(f"    X := X + {rng.randrange(1000)} * IFNULL(:P{index % 3}, 0);"
+                     for index in range(statements))
+    return (f'FUNCTION "BENCH"."{name}"(P0 INTEGER, P1 INTEGER, P2 INTEGER)\n'
+            f"RETURNS X INTEGER\nLANGUAGE SQLSCRIPT AS\nBEGIN\n    X := 0;\n{body}\nEND;")
+
+
+def build_archive(files, size="medium", seed=0):
+    """
+    Build a zip export with `files` members, spread evenly across
+    calculation views, CDS schemas and scalar functions.
+
+    :param size: Key of SIZES
+    :return: Archive bytes
+    """
+    spec = SIZES[size]
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for index in range(files):
+            kind = index % 3
+            name = f"BENCH_{seed}_{index}"
+            if kind == 0:
+                archive.writestr(f"bench/views/{name}.calculationview",
+                                 calculation_view(name, spec["nodes"], rng))
+            elif kind == 1:
+                archive.writestr(f"bench/db/{name}.hdbdd",
+                                 cds_schema(name, spec["entities"], rng))
+            else:
+                archive.writestr(f"bench/functions/{name}.hdbscalarfunction",
+                                 scalar_function(name, spec["statements"], rng))
+    return buffer.getvalue()
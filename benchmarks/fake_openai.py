@@ -0,0 +1,148 @@
+"""
+OpenAI-compatible chat completion server plus stubs of the web app's auth
+and webhook endpoints, for running the migration pipeline offline.
+
+    python -m benchmarks.fake_openai --port 8089 --latency 0.5 \
+        --tokens-per-second 200 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+CHARS_PER_TOKEN = 4
+# Member labels of a packed conversion prompt, answered with one SQL per label.
+PACKED_MEMBER = re.compile(r" (m\d+):\n")
+
+
+def create_app(latency=0.5, tokens_per_second=200.0, error_rate=0.0,
+               output_ratio=0.5):
+    """
+    :param latency: Seconds before the first token
+    :param tokens_per_second: Generation speed of the completion
+    :param error_rate: Fraction of requests answered with a 429 or a 500
+    :param output_ratio: Completion length relative to the prompt length
+    """
+    app = FastAPI(title="Fake OpenAI")
+    app.state.requests = 0
+    app.state.errors = 0
+    app.state.webhooks = 0
+
+    def completion_text(prompt, max_tokens):
+        tokens = max(8, min(max_tokens, int(len(prompt) / CHARS_PER_TOKEN * output_ratio)))
+        keys = PACKED_MEMBER.findall(prompt) or ["sql"]
+        # JSON-escaped SQL, 29 characters per line.
+        lines = max(1, tokens * CHARS_PER_TOKEN // 29 // len(keys))
+        body = 'SELECT 1 AS \\"X\\" FROM \\"T\\";\\n' * lines
+        fields = ", ".join(f'"{key}": "{body}"' for key in keys)
+        return f'```json {{{fields}}}```'
+
+    def injected_error():
+        if random.random() >= error_rate:
+            return None
+        app.state.errors += 1
+        if random.random() < 0.5:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status_code=429, headers={"retry-after": "1"})
+        return JSONResponse(
+            {"error": {"message": "The server had an error", "type": "server_error"}},
+            status_code=500)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        app.state.requests += 1
+
+        error = injected_error()
+        if error is not None:
+            return error
+
+        prompt = "".join(message.get("content") or ""
+                         for message in payload.get("messages", []))
+        text = completion_text(prompt, payload.get("max_tokens") or 1024)
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        completion_tokens = len(text) // CHARS_PER_TOKEN
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = payload.get("model", "gpt-4o-mini")
+
+        await asyncio.sleep(latency)
+
+        if not payload.get("stream"):
+            await asyncio.sleep(completion_tokens / tokens_per_second)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": prompt_tokens,
+                          "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+
+        async def stream():
+            chunk_chars = 8 * CHARS_PER_TOKEN
+            for start in range(0, len(text), chunk_chars):
+                piece = text[start:start + chunk_chars]
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "finish_reason": None,
+                                 "delta": {"content": piece}}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(len(piece) / CHARS_PER_TOKEN / tokens_per_second)
+            done = {"id": completion_id, "object": "chat.completion.chunk",
+                    "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop", "delta": {}}]}
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/auth")
+    async def auth():
+        return {"id_token": "benchmark-token"}
+
+    @app.post("/hook")
+    async def hook():
+        app.state.webhooks += 1
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "errors": app.state.errors,
+                "webhooks": app.state.webhooks}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output-ratio", type=float, default=0.5)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.tokens_per_second, args.error_rate,
+                     args.output_ratio)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Offline end-to-end benchmark of process_sap_hana_file.
+
+OpenAI and the web app are replaced by benchmarks.fake_openai, S3 by a moto
+server and Redis by fakeredis (or a local Redis with --redis-host), so the
+whole pipeline runs without network access:
+
+    pip install -e ".[bench]"
+    python -m benchmarks.run --archives 4 --files 60 --size medium
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port, timeout=30):
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{' '.join(command)} did not start on port {port}")
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def configure_environment(args, s3_port, llm_port):
+    llm_url = f"http://127.0.0.1:{llm_port}"
+    os.environ.update({
+        "API_KEY": "benchmark",
+        "AWS_ACCESS_KEY_ID": "benchmark",
+        "AWS_SECRET_ACCESS_KEY": "benchmark",
+        "S3_REGION": "us-east-1",
+        "S3_ENDPOINT_URL": f"http://127.0.0.1:{s3_port}",
+        "S3_BUCKET_NAME": "bench-output",
+        "S3_BUCKET_PATH": "converted/",
+        "WEBAPP_AUTH_URL": f"{llm_url}/auth",
+        "WEBAPP_URL": f"{llm_url}/hook",
+        "WEBAPP_USERNAME": "benchmark",
+        "WEBAPP_PASSWORD": "benchmark",
+        "WEBAPP_REMEMBER": "false",
+        "MIGRATION_CONCURRENCY": str(args.concurrency),
+        "CONVERSION_CACHE_ENABLED": "false",
+        "LOCAL_VIEW_TRANSLATOR_ENABLED": str(not args.llm_only).lower(),
+        "LOCAL_SCHEMA_TRANSLATOR_ENABLED": str(not args.llm_only).lower(),
+        "PACKING_ENABLED": str(args.packing).lower(),
+    })
+    if args.redis_host:
+        os.environ["REDIS_HOST"] = args.redis_host
+        os.environ["REDIS_PORT"] = str(args.redis_port)
+    else:
+        # Must happen before app.config creates its client.
+        import fakeredis
+        import redis.asyncio
+        from fakeredis.aioredis import FakeConnection
+        redis.asyncio.BlockingConnectionPool = functools.partial(
+            redis.asyncio.BlockingConnectionPool, connection_class=FakeConnection,
+            server=fakeredis.FakeServer())
+    return llm_url
+
+
+async def monitor_loop_lag(stop, samples, interval=0.01):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - started - interval)
+
+
+async def run_jobs(args, archives):
+    from app.schemas import ConvertBatchRequest, ConvertFileRequest
+    from app.services import (
+        close_http_clients,
+        migration_job,
+        process_batch,
+        process_sap_hana_file,
+    )
+
+    latencies = []
+    convert_member = migration_job.convert_member
+
+    async def timed_convert_member(file_name, file_content):
+        started = time.perf_counter()
+        try:
+            return await convert_member(file_name, file_content)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    migration_job.convert_member = timed_convert_member
+
+    stop = asyncio.Event()
+    lag = []
+    monitor = asyncio.create_task(monitor_loop_lag(stop, lag))
+    jobs = asyncio.Semaphore(args.parallel_jobs)
+
+    async def run(index, key):
+        async with jobs:
+            await process_sap_hana_file(ConvertFileRequest(
+                file_uuid=f"bench-{index}", s3_link=f"s3://bench-input/{key}"))
+
+    started = time.perf_counter()
+    if args.batch:
+        results = await asyncio.gather(process_batch(ConvertBatchRequest(
+            batch_uuid="bench-batch",
+            archives=[ConvertFileRequest(file_uuid=f"bench-{index}",
+                                         s3_link=f"s3://bench-input/{key}")
+                      for index, key in enumerate(archives)])),
+            return_exceptions=True)
+    else:
+        results = await asyncio.gather(
+            *(run(index, key) for index, key in enumerate(archives)),
+            return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await monitor
+    await close_http_clients()
+    migration_job.convert_member = convert_member
+    failures = [result for result in results if isinstance(result, BaseException)]
+    return elapsed, latencies, lag, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmark of the conversion pipeline.")
+    parser.add_argument("--archives", type=int, default=2, help="number of jobs")
+    parser.add_argument("--files", type=int, default=30, help="members per archive")
+    parser.add_argument("--size", default="medium", choices=("small", "medium", "large"))
+    parser.add_argument("--parallel-jobs", type=int, default=2)
+    parser.add_argument("--batch", action="store_true",
+                        help="submit all archives as one batch job")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="MIGRATION_CONCURRENCY per job")
+    parser.add_argument("--latency", type=float, default=0.3,
+                        help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-only", action="store_true",
+                        help="disable the local translators")
+    parser.add_argument("--packing", action="store_true",
+                        help="convert small functions and schemas several per request")
+    parser.add_argument("--redis-host", help="use this Redis instead of fakeredis")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    s3_port, llm_port = free_port(), free_port()
+    servers = [
+        start_server([sys.executable, "-m", "moto.server", "-p", str(s3_port)], s3_port),
+        start_server([sys.executable, "-m", "benchmarks.fake_openai",
+                      "--port", str(llm_port), "--latency", str(args.latency),
+                      "--tokens-per-second", str(args.tokens_per_second),
+                      "--error-rate", str(args.error_rate)], llm_port),
+    ]
+    try:
+        llm_url = configure_environment(args, s3_port, llm_port)
+
+        import boto3
+        import openai
+
+        from app.utils import logger
+        from benchmarks.archives import build_archive
+
+        logger.setLevel(logging.WARNING)
+        openai.api_base = f"{llm_url}/v1"
+
+        s3_client = boto3.client("s3", endpoint_url=os.environ["S3_ENDPOINT_URL"],
+                                 region_name="us-east-1")
+        s3_client.create_bucket(Bucket="bench-input")
+        s3_client.create_bucket(Bucket="bench-output")
+        archives = []
+        for index in range(args.archives):
+            key = f"uploads/bench-{index}.zip"
+            s3_client.put_object(Bucket="bench-input", Key=key,
+                                 Body=build_archive(args.files, args.size, seed=index))
+            archives.append(key)
+
+        elapsed, latencies, lag, failures = asyncio.run(run_jobs(args, archives))
+        with urllib.request.urlopen(f"{llm_url}/stats") as response:
+            llm_stats = json.load(response)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    members = args.archives * args.files
+    results = {
+        "archives": args.archives,
+        "members": members,
+        "size": args.size,
+        "failed_jobs": len(failures),
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_second": round(members / elapsed, 2),
+        "member_latency_ms": {
+            name: round(percentile(latencies, fraction) * 1000, 1)
+            for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "loop_lag_ms": {
+            "p99": round(percentile(lag, 0.99) * 1000, 2),
+            "max": round(max(lag, default=0.0) * 1000, 2)},
+        "llm": llm_stats,
+    }
+
+    print(json.dumps(results, indent=2))
+    for failure in failures:
+        print(f"Job failed: {failure!r}", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
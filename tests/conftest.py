@@ -0,0 +1,35 @@
+import asyncio
+import functools
+import os
+
+import fakeredis
+import pytest
+import redis.asyncio
+from fakeredis.aioredis import FakeConnection
+
+# app.config reads these at import time.
+os.environ.setdefault("API_KEY", "test")
+os.environ.setdefault("LOG_ASYNC", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+# Redis is served from memory, as in the benchmarks; must happen before
+# app.config creates its client.
+redis.asyncio.BlockingConnectionPool = functools.partial(
+    redis.asyncio.BlockingConnectionPool, connection_class=FakeConnection,
+    server=fakeredis.FakeServer())
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a new event loop against an empty Redis."""
+    from app.config import async_redis_client
+
+    def run(coroutine):
+        async def main():
+            await async_redis_client.flushdb()
+            try:
+                return await coroutine
+            finally:
+                await async_redis_client.connection_pool.disconnect()
+        return asyncio.run(main())
+    return run
@@ -0,0 +1,58 @@
+from app.config import async_redis_client
+from app.services.job_queue import Job, JobQueue, PermanentJobError
+from app.status_manager import (
+    fetch_status,
+    get_batch_status,
+    reset_batch_statuses,
+    status_writer,
+    update_status,
+)
+
+
+def test_queued_batch_has_a_status(run):
+    async def main():
+        await reset_batch_statuses("b-1", ["f-1", "f-2"])
+        return await get_batch_status("b-1")
+
+    assert run(main()) == {
+        "status": "Queued", "percentage": "0%", "counts": {"Queued": 2},
+        "archives": {"f-1": {"status": "Queued", "percentage": "0%"},
+                     "f-2": {"status": "Queued", "percentage": "0%"}}}
+
+
+def test_failed_batch_attempt_updates_unfinished_archives(run):
+    queue = JobQueue(max_attempts=2, retry_backoff=0)
+    job = Job("b-1", {"batch_uuid": "b-1", "archives": []}, attempts=1)
+
+    async def main():
+        await reset_batch_statuses("b-1", ["f-1", "f-2", "f-3"])
+        status_writer.track_batch("b-1", ["f-1", "f-2", "f-3"])
+        await update_status("f-1", "Completed", "100%")
+        await update_status("f-2", "Failed", "")
+        await update_status("f-3", "In Progress", "40%")
+        status_writer.untrack_batch(["f-1", "f-2", "f-3"])
+
+        await queue.fail(job, RuntimeError("S3 unavailable"))
+        retrying = await get_batch_status("b-1")
+
+        job.attempts = 2
+        await queue.fail(job, PermanentJobError("bad archive"), retryable=False)
+        return retrying, await get_batch_status("b-1"), await fetch_status("f-3")
+
+    retrying, failed, archive = run(main())
+    assert retrying["status"] == "Retrying"
+    assert retrying["counts"] == {"Completed": 1, "Failed": 1, "Retrying": 1}
+    assert failed["status"] == "Failed"
+    assert failed["counts"] == {"Completed": 1, "Failed": 2}
+    assert archive == {"status": "Failed", "percentage": ""}
+
+
+def test_failing_single_job_leaves_other_keys_alone(run):
+    queue = JobQueue(max_attempts=1)
+    job = Job("f-9", {"file_uuid": "f-9"}, attempts=1)
+
+    async def main():
+        await queue.fail(job, RuntimeError("boom"))
+        return await fetch_status("f-9"), await async_redis_client.keys("*archives")
+
+    assert run(main()) == ({"status": "Failed", "percentage": ""}, [])
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import threading
+
+from app.config import async_redis_client
+from app.services.cache_service import ConversionCache, build_cache_key
+
+
+def cached(cache, content, calls):
+    async def convert():
+        calls.append(content)
+        return f"SELECT '{content}'"
+    return cache.get_or_convert(build_cache_key(content, "1", "model", 0.0), convert)
+
+
+def test_disk_tier_serves_entries_off_the_event_loop(run, tmp_path, monkeypatch):
+    cache = ConversionCache(cache_dir=str(tmp_path))
+    threads = []
+    for name in ("_read_disk", "_write_disk"):
+        method = getattr(cache, name)
+
+        def record(*args, method=method):
+            threads.append(threading.get_ident())
+            return method(*args)
+        monkeypatch.setattr(cache, name, record)
+    calls = []
+
+    async def main():
+        first = await cached(cache, "a", calls)
+        # Only the disk tier has the entry now.
+        await async_redis_client.flushdb()
+        return first, await cached(cache, "a", calls), threading.get_ident()
+
+    first, second, loop_thread = run(main())
+    assert first == second == "SELECT 'a'"
+    assert calls == ["a"]
+    assert threads and loop_thread not in threads
+
+
+def test_disk_tier_evicts_least_recently_used_entries(run, tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path), disk_max_bytes=200)
+    calls = []
+
+    async def main():
+        for content in ("a", "b", "c", "d", "e"):
+            await cached(cache, content, calls)
+
+    run(main())
+    files = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert 0 < len(files) < 5
+    assert sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(tmp_path) for name in names) <= 200
+
+
+def test_cancelled_caller_does_not_cancel_the_waiters(run):
+    cache = ConversionCache(cache_dir=None)
+    key = build_cache_key("a", "1", "model", 0.0)
+    calls = []
+
+    async def convert():
+        calls.append(asyncio.current_task())
+        await asyncio.sleep(0.05)
+        return "SELECT 'a'"
+
+    async def main():
+        owner = asyncio.ensure_future(cache.get_or_convert(key, convert))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(cache.get_or_convert(key, convert))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        return await waiter, owner.cancelled()
+
+    assert run(main()) == ("SELECT 'a'", True)
+    assert len(calls) == 2
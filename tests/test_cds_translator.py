@@ -0,0 +1,58 @@
+import pathlib
+import re
+
+import pytest
+
+from app.services.cds_translator import UnsupportedSchemaError, translate_cds_schema
+from app.services.view_translator import translate_calculation_view
+
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+ORDERS_VIEW = """<?xml version="1.0" encoding="UTF-8"?>
+<Calculation:scenario xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xmlns:Calculation="http://www.sap.com/ndb/BiModelCalculation.ecore" id="CV_ORDERS">
+  <dataSources>
+    <DataSource id="Orders" type="DATA_BASE_TABLE">
+      <columnObject schemaName="SALES" columnObjectName="my.pkg::Sales.Orders"/>
+    </DataSource>
+  </dataSources>
+  <calculationViews>
+    <calculationView xsi:type="Calculation:ProjectionView" id="Projection_1">
+      <viewAttributes><viewAttribute id="ID"/></viewAttributes>
+      <input node="#Orders"/>
+    </calculationView>
+  </calculationViews>
+  <logicalModel id="Projection_1"/>
+</Calculation:scenario>
+"""
+
+
+def test_translates_entities_under_their_runtime_names():
+    sql = translate_cds_schema((FIXTURES / "sales.hdbdd").read_bytes())
+
+    assert 'CREATE OR REPLACE TABLE "SALES"."my.pkg::Sales.Customers" (' in sql
+    assert 'CREATE OR REPLACE TABLE "SALES"."my.pkg::Sales.Orders" (' in sql
+    assert '"CUSTOMER.ID" INTEGER,' in sql
+    assert '"CREATED_AT" TIMESTAMP_TZ' in sql
+    assert 'PRIMARY KEY ("ID")' in sql
+
+
+def test_views_reference_the_translated_tables():
+    tables = set(re.findall(r"CREATE OR REPLACE TABLE (\S+) \(",
+                            translate_cds_schema((FIXTURES / "sales.hdbdd").read_text())))
+    procedure = translate_calculation_view(ORDERS_VIEW)
+
+    relations = set(re.findall(r'FROM ("[^"]+"\."[^"]+")', procedure))
+    assert relations == {'"SALES"."my.pkg::Sales.Orders"'}
+    assert relations <= tables
+
+
+def test_without_namespace_names_are_context_paths():
+    sql = translate_cds_schema("context C { entity E { key ID : Integer; }; };")
+    assert 'CREATE OR REPLACE TABLE "C.E" (' in sql
+
+
+def test_unsupported_definitions_are_rejected():
+    with pytest.raises(UnsupportedSchemaError):
+        translate_cds_schema("namespace a; view V as select from E { ID };")
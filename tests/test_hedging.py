@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+import app.services.hedging as hedging
+from app.services.hedging import HedgeBudget, RequestHedger, hedge_budget
+from app.services.scheduler import FairScheduler, scheduled_job
+
+
+@pytest.mark.parametrize("slots, hedged", [(1, False), (2, True)])
+def test_hedge_takes_a_slot_of_the_job(monkeypatch, slots, hedged):
+    scheduler = FairScheduler(max_concurrency=slots)
+    monkeypatch.setattr(hedging, "conversion_scheduler", scheduler)
+    hedger = RequestHedger(enabled=True, percentile=0.5)
+    for _ in range(100):
+        hedger.latencies.record(("hdbdd", "small"), 0.01)
+    calls = []
+
+    async def call():
+        calls.append(scheduler.running)
+        await asyncio.sleep(0.1 if len(calls) == 1 else 0)
+        return f"SELECT {len(calls)}"
+
+    async def main():
+        hedge_budget.set(HedgeBudget(minimum=1))
+        job = scheduler.job("f-1")
+        scheduled_job.set(job)
+        async with scheduler.slot(job):
+            return await hedger.run("hdbdd", "small", call)
+
+    sql = asyncio.run(main())
+    if hedged:
+        assert sql == "SELECT 2"
+        assert calls == [1, 2]
+    else:
+        # No slot was free for the duplicate before the primary finished.
+        assert sql == "SELECT 1"
+        assert calls == [1]
+    assert scheduler.running == 0
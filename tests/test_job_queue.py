@@ -0,0 +1,46 @@
+import pytest
+
+from app.config import async_redis_client
+from app.services.job_queue import (
+    PENDING_KEY,
+    JobInProgressError,
+    JobQueue,
+)
+
+
+def test_enqueue_replaces_a_pending_job(run):
+    queue = JobQueue()
+
+    async def main():
+        await queue.enqueue("f-1", {"file_uuid": "f-1", "attempt": 1})
+        await queue.reserve("f-1")
+        pending = await async_redis_client.lrange(PENDING_KEY, 0, -1)
+        await queue.enqueue("f-1", {"file_uuid": "f-1", "attempt": 2})
+        job = await queue.claim()
+        return pending, job.payload, await queue.claim()
+
+    pending, payload, next_job = run(main())
+    assert pending == []
+    assert payload == {"file_uuid": "f-1", "attempt": 2}
+    assert next_job is None
+
+
+def test_running_job_cannot_be_resubmitted(run):
+    queue = JobQueue()
+
+    async def main():
+        await queue.enqueue("f-1", {"file_uuid": "f-1"})
+        await queue.enqueue("f-2", {"file_uuid": "f-2"})
+        job = await queue.claim()
+        with pytest.raises(JobInProgressError):
+            await queue.reserve("f-2", job.job_id)
+        with pytest.raises(JobInProgressError):
+            await queue.enqueue(job.job_id, {"file_uuid": job.job_id, "attempt": 2})
+        # Neither job was touched.
+        return job.job_id, await async_redis_client.lrange(PENDING_KEY, 0, -1), \
+            (await queue.claim()).job_id
+
+    claimed, pending, remaining = run(main())
+    assert claimed == "f-1"
+    assert pending == ["f-2"]
+    assert remaining == "f-2"
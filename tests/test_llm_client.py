@@ -0,0 +1,52 @@
+import asyncio
+
+import openai
+import pytest
+from openai import error as openai_error
+
+import app.services.llm_client as llm_client
+
+MESSAGES = [{"role": "user", "content": "Convert this."}]
+
+
+@pytest.fixture
+def acreate(monkeypatch):
+    monkeypatch.setattr(llm_client, "get_llm_session", lambda: "session")
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 1)
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BASE_DELAY", 0)
+    calls = []
+
+    def install(error):
+        async def create(**kwargs):
+            calls.append(openai.aiosession.get(None))
+            raise error
+        monkeypatch.setattr(openai.ChatCompletion, "acreate", create)
+        return calls
+    return install
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_non_retryable_error_returns_none(acreate, monkeypatch, streaming):
+    monkeypatch.setattr(llm_client, "LLM_STREAMING_ENABLED", streaming)
+    calls = acreate(openai_error.InvalidRequestError("context too long", "messages"))
+
+    async def main():
+        sql = await llm_client.complete_sql(model="m", messages=MESSAGES)
+        return sql, openai.aiosession.get(None)
+
+    assert asyncio.run(main()) == (None, None)
+    assert calls == ["session"]
+
+
+def test_exhausted_retries_return_none(acreate):
+    calls = acreate(openai_error.APIError("server error"))
+
+    assert asyncio.run(llm_client.complete_json(model="m", messages=MESSAGES)) is None
+    assert len(calls) == 2
+
+
+def test_cancellation_reaches_the_caller(acreate):
+    acreate(asyncio.CancelledError())
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(llm_client.chat_completion(model="m", messages=MESSAGES))
@@ -0,0 +1,19 @@
+import io
+import json
+
+from botocore.exceptions import ClientError
+
+from app.services.manifest_service import BaselineArchive
+
+
+class FakeS3:
+    def get_object(self, Bucket, Key):
+        manifest = {"converter_version": "v1", "members": {}}
+        return {"Body": io.BytesIO(json.dumps(manifest).encode("utf-8"))}
+
+    def head_object(self, Bucket, Key):
+        raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+
+
+def test_missing_baseline_output_converts_every_member():
+    assert BaselineArchive.open(FakeS3(), "f-0", "v1") is None
@@ -0,0 +1,113 @@
+import asyncio
+import io
+import threading
+import zipfile
+
+import pytest
+
+import app.services.migration_job as migration_job
+from app.schemas import ConvertFileRequest
+from app.services.checkpoint_service import JobCheckpoint, MEMBER_DONE, MEMBER_FAILED
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        self.objects[Key] = Body
+
+
+class FakeReader(io.BytesIO):
+    bytes_fetched = size = requests = 0
+
+    def __init__(self, content, broken=(), fail_after=None):
+        super().__init__(content)
+        self.broken = broken
+        self.fail_after = fail_after
+
+    def prefetch_member(self, zip_info):
+        if zip_info.filename in self.broken:
+            if self.fail_after is not None:
+                self.fail_after.wait(5)
+            raise ConnectionError(f"Could not fetch {zip_info.filename}")
+
+
+class FakeUpload(io.BytesIO):
+    aborted = False
+
+    def close(self):
+        self.closed_content = self.getvalue()
+
+    def abort(self):
+        self.aborted = True
+
+
+def archive(*names):
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as zip_file:
+        for name in names:
+            zip_file.writestr(name, f"<{name}/>")
+    return content.getvalue()
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    def install(content, broken=(), fail_after=None):
+        upload = FakeUpload()
+        monkeypatch.setattr(migration_job, "s3_client", FakeS3())
+        monkeypatch.setattr(migration_job, "S3RangeReader",
+                            lambda client, bucket, key: FakeReader(content, broken, fail_after))
+        monkeypatch.setattr(migration_job, "S3MultipartWriter",
+                            lambda client, bucket, key: upload)
+        return upload
+    return install
+
+
+def convert(request):
+    checkpoint = JobCheckpoint(request.file_uuid)
+
+    async def main():
+        await migration_job.convert_archive(request, checkpoint, {})
+        return (await checkpoint.load())[1]
+    return main()
+
+
+def test_failing_member_is_recorded_and_the_archive_completes(run, storage, monkeypatch):
+    upload = storage(archive("a.calculationview", "b.calculationview"))
+
+    async def convert_member(file_name, file_content):
+        if file_name == "b.calculationview":
+            raise RuntimeError("model rejected the request")
+        return "SELECT 1;"
+
+    monkeypatch.setattr(migration_job, "convert_member", convert_member)
+    members = run(convert(ConvertFileRequest(file_uuid="f-1", s3_link="s3://in/a.zip")))
+
+    assert members["a.calculationview"]["status"] == MEMBER_DONE
+    assert members["b.calculationview"]["status"] == MEMBER_FAILED
+    assert zipfile.ZipFile(io.BytesIO(upload.closed_content)).namelist() == ["a.sql"]
+    assert not upload.aborted
+
+
+def test_fatal_error_stops_the_other_members_before_aborting(run, storage, monkeypatch):
+    converting = threading.Event()
+    upload = storage(archive("a.calculationview", "b.calculationview"),
+                     broken={"b.calculationview"}, fail_after=converting)
+    cancelled = []
+
+    async def convert_member(file_name, file_content):
+        converting.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append((file_name, upload.aborted))
+            raise
+
+    monkeypatch.setattr(migration_job, "convert_member", convert_member)
+    request = ConvertFileRequest(file_uuid="f-1", s3_link="s3://in/a.zip")
+    with pytest.raises(ConnectionError):
+        run(asyncio.wait_for(convert(request), timeout=5))
+
+    assert cancelled == [("a.calculationview", False)]
+    assert upload.aborted
@@ -0,0 +1,74 @@
+import asyncio
+import pathlib
+
+import pytest
+
+from app.services import migration_service
+from app.services.scheduler import FairScheduler, scheduled_job
+from app.services.view_translator import UnsupportedViewError
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def view_xml(monkeypatch):
+    monkeypatch.setattr(migration_service, "VIEW_CHUNK_MIN_NODES", 2)
+    return (FIXTURES / "rank.calculationview").read_bytes()
+
+
+def test_view_is_converted_as_a_whole_when_a_node_fails(run, monkeypatch, view_xml):
+    async def convert_node(node, node_xml, inputs):
+        return None
+
+    async def convert_view(xml):
+        return 'CREATE OR REPLACE PROCEDURE "CV_TOP_ORDERS"() RETURNS TABLE () AS $$ $$;'
+
+    monkeypatch.setattr(migration_service, "_convert_view_node", convert_node)
+    monkeypatch.setattr(migration_service, "_convert_view", convert_view)
+
+    sql = run(migration_service.convert_view_into_snowflake(view_xml))
+    assert sql.startswith('CREATE OR REPLACE PROCEDURE "CV_TOP_ORDERS"()')
+
+
+@pytest.mark.parametrize("slots, concurrent", [(1, 1), (3, 2)])
+def test_node_conversions_take_slots_of_the_job(run, monkeypatch, view_xml, slots, concurrent):
+    scheduler = FairScheduler(max_concurrency=slots)
+    running = []
+    peak = []
+
+    def render_node_query(view, node):
+        raise UnsupportedViewError("converted by the LLM")
+
+    async def convert_node(node, node_xml, inputs):
+        running.append(node.id)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(node.id)
+        return f'SELECT 1 AS "{node.id}"'
+
+    monkeypatch.setattr(migration_service, "conversion_scheduler", scheduler)
+    monkeypatch.setattr(migration_service, "render_node_query", render_node_query)
+    monkeypatch.setattr(migration_service, "_convert_view_node", convert_node)
+
+    async def main():
+        # The slot the member holds.
+        job = scheduler.job("f-1")
+        scheduled_job.set(job)
+        async with scheduler.slot(job):
+            return await migration_service.convert_view_into_snowflake(view_xml)
+
+    assert 'SELECT 1 AS "Rank_1"' in run(main())
+    assert max(peak) == concurrent
+    assert scheduler.running == 0
+
+
+def test_packed_members_are_cached_under_the_pack_prompt_version(monkeypatch):
+    packer = migration_service.function_packer
+    monkeypatch.setattr(packer, "enabled", True)
+    small, large = "x" * packer.max_member_bytes, "x" * (packer.max_member_bytes + 1)
+
+    monkeypatch.setattr(migration_service, "PACK_PROMPT_VERSION", "1")
+    first = migration_service._prompt_version(packer, small, "7")
+    monkeypatch.setattr(migration_service, "PACK_PROMPT_VERSION", "2")
+    assert migration_service._prompt_version(packer, small, "7") != first
+    assert migration_service._prompt_version(packer, large, "7") == "7"
@@ -0,0 +1,92 @@
+import asyncio
+import contextvars
+
+from app.services.request_packer import RequestPacker
+
+
+job = contextvars.ContextVar("job", default=None)
+
+
+def make_packer(convert_pack, convert_single):
+    return RequestPacker("hdbscalarfunction", convert_pack, convert_single, enabled=True,
+                         max_member_bytes=100, token_budget=1000, max_wait=0.01)
+
+
+async def submit(packer, name, content):
+    job.set(name)
+    return await packer.convert(content)
+
+
+def test_splits_pack_and_falls_back_per_member():
+    packs, singles = [], []
+
+    async def convert_pack(members):
+        packs.append(dict(members))
+        return {key: f"SELECT '{content}'" for key, content in members.items()
+                if content != "missing"} | {"m3": "SELECT ("}
+
+    async def convert_single(content):
+        singles.append((content, job.get()))
+        return f"SINGLE {content}"
+
+    async def main():
+        packer = make_packer(convert_pack, convert_single)
+        return await asyncio.gather(
+            submit(packer, "a", "one"), submit(packer, "b", "missing"),
+            submit(packer, "c", "invalid"), submit(packer, "d", "x" * 200))
+
+    assert asyncio.run(main()) == [
+        "SELECT 'one'", "SINGLE missing", "SINGLE invalid", f"SINGLE {'x' * 200}"]
+    assert packs == [{"m1": "one", "m2": "missing", "m3": "invalid"}]
+    # Fallbacks run in the context of the job that submitted the member.
+    assert sorted(singles) == [("invalid", "c"), ("missing", "b"), ("x" * 200, "d")]
+
+
+def test_pack_runs_outside_the_jobs_contexts():
+    seen = []
+
+    async def convert_pack(members):
+        seen.append(job.get())
+        return {key: "SELECT 1" for key in members}
+
+    async def main():
+        packer = make_packer(convert_pack, None)
+        return await asyncio.gather(submit(packer, "a", "one"), submit(packer, "b", "two"))
+
+    assert asyncio.run(main()) == ["SELECT 1", "SELECT 1"]
+    assert seen == [None]
+
+
+def test_cancelled_pack_request_falls_back():
+    async def convert_pack(members):
+        raise asyncio.CancelledError()
+
+    async def convert_single(content):
+        return f"SINGLE {content}"
+
+    async def main():
+        packer = make_packer(convert_pack, convert_single)
+        return await asyncio.wait_for(asyncio.gather(
+            submit(packer, "a", "one"), submit(packer, "b", "two")), timeout=5)
+
+    assert asyncio.run(main()) == ["SINGLE one", "SINGLE two"]
+
+
+def test_cancelled_pack_fails_its_members():
+    async def main():
+        request = asyncio.Event()
+
+        async def convert_pack(members):
+            request.set()
+            await asyncio.sleep(60)
+
+        packer = make_packer(convert_pack, None)
+        members = asyncio.gather(submit(packer, "a", "one"), submit(packer, "b", "two"),
+                                 return_exceptions=True)
+        await request.wait()
+        for task in packer._sending:
+            task.cancel()
+        return await asyncio.wait_for(members, timeout=5)
+
+    results = asyncio.run(main())
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
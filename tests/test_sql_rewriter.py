@@ -0,0 +1,67 @@
+import pytest
+
+from app.services.sql_rewriter import check_sql, rewrite_sql
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ('SELECT * FROM t WHERE ISNULL("Z")', 'SELECT * FROM t WHERE "Z" IS NULL'),
+    ("SELECT ISNULL(a + 1) FROM t", "SELECT (a + 1) IS NULL FROM t"),
+    ("SELECT ISNULL(a, 0) FROM t", "SELECT IFNULL(a, 0) FROM t"),
+    ("SELECT NVL(a, 0) FROM t", "SELECT IFNULL(a, 0) FROM t"),
+    ("SELECT NOT ISNULL(a) FROM t", "SELECT a IS NOT NULL FROM t"),
+    ("SELECT ADD_DAYS(d, n + 1) FROM t", "SELECT DATEADD(DAY, (n + 1), d) FROM t"),
+    ("SELECT LOCATE(s, 'x') FROM t", "SELECT POSITION('x', s) FROM t"),
+])
+def test_functions(sql, expected):
+    assert rewrite_sql(sql) == expected
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT CAST(x AS TIMESTAMP), y::SECONDDATE FROM t",
+     "SELECT CAST(x AS TIMESTAMP_TZ), y::TIMESTAMP_TZ FROM t"),
+    ('CREATE TABLE "S"."T" ("A" NVARCHAR(10), "B" TIMESTAMP NOT NULL)',
+     'CREATE TABLE "S"."T" ("A" VARCHAR(10), "B" TIMESTAMP_TZ NOT NULL)'),
+    ("CREATE FUNCTION f(p SECONDDATE) RETURNS NVARCHAR(5) AS $$ SELECT 1 $$",
+     "CREATE FUNCTION f(p TIMESTAMP_TZ) RETURNS VARCHAR(5) AS $$ SELECT 1 $$"),
+    ("CREATE PROCEDURE p() RETURNS TABLE (a TIMESTAMP) AS $$ DECLARE v TIMESTAMP; "
+     "w NVARCHAR(3); BEGIN RETURN 1; END; $$",
+     "CREATE PROCEDURE p() RETURNS TABLE (a TIMESTAMP_TZ) AS $$ DECLARE v TIMESTAMP_TZ; "
+     "w VARCHAR(3); BEGIN RETURN 1; END; $$"),
+    ("ALTER TABLE t ADD COLUMN c SECONDDATE", "ALTER TABLE t ADD COLUMN c TIMESTAMP_TZ"),
+])
+def test_types_in_type_positions(sql, expected):
+    assert rewrite_sql(sql) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT timestamp, x AS seconddate FROM t",
+    "SELECT COUNT(DISTINCT timestamp) FROM t WHERE timestamp > 0",
+    'CREATE TABLE t (timestamp TIMESTAMP_TZ, PRIMARY KEY (timestamp))',
+    "SELECT 'NVL(a, b) TIMESTAMP' AS \"NVARCHAR\" -- ISNULL(x)\nFROM t",
+    "SELECT t.nvl(a, b), t.timestamp FROM t",
+])
+def test_leaves_other_words_unchanged(sql):
+    assert rewrite_sql(sql) == sql
+
+
+@pytest.mark.parametrize("sql", [
+    'SELECT ISNULL("Z"), ISNULL(a, b), NOT ISNULL(c), ADD_DAYS(d, 1) FROM t',
+    'CREATE TABLE t ("A" NVARCHAR(10), "B" TIMESTAMP, "C" SECONDDATE)',
+    "SELECT CAST(TO_DATE(x) AS TIMESTAMP), NOW() FROM t",
+])
+def test_rewrite_is_idempotent(sql):
+    rewritten = rewrite_sql(sql)
+    assert rewritten != sql
+    assert rewrite_sql(rewritten) == rewritten
+
+
+@pytest.mark.parametrize("sql, problem", [
+    ("", "empty SQL"),
+    ("SELECT 'a FROM t", "unterminated string or identifier"),
+    ("SELECT (a FROM t", "unbalanced parentheses"),
+    ("SELECT a) FROM t", "unbalanced parentheses"),
+    ("CREATE FUNCTION f() AS $$ SELECT 1", "unterminated $$ body"),
+    ("SELECT (a) FROM t", None),
+])
+def test_check_sql(sql, problem):
+    assert check_sql(sql) == problem
@@ -0,0 +1,70 @@
+import pathlib
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from app.services.view_pruner import compact_element, prune_calculation_view
+
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+
+def read(name):
+    return (FIXTURES / f"{name}.calculationview").read_bytes()
+
+
+def test_drops_editor_state_and_keeps_the_view_description():
+    root = ET.fromstring(prune_calculation_view(read("join_aggregation")))
+
+    assert root.tag == "scenario"
+    assert root.find("layout") is None
+    assert root.find("metadata") is None
+    assert [d.get("defaultDescription") for d in root.iter("descriptions")] == [
+        "Revenue by customer"]
+    assert root.attrib == {
+        "id": "CV_REVENUE", "dataCategory": "CUBE", "outputViewType": "Aggregation"}
+    # Empty elements left behind carry nothing for the conversion.
+    assert root.find(
+        "calculationViews/calculationView[@id='Join_1']/calculatedViewAttributes") is None
+
+
+def test_simplifies_types_and_attributes():
+    pruned = prune_calculation_view(read("join_aggregation"))
+
+    assert "xmlns" not in pruned
+    assert "xsi:" not in pruned
+    assert '<calculationView type="JoinView" id="Join_1" joinType="leftOuter">' in pruned
+    assert '<mapping target="CUSTOMER_ID" source="CUSTOMER.ID" />' in pruned
+    # The formula's syntax depends on its expression language.
+    assert ('<calculatedViewAttribute id="REVENUE_GROSS" datatype="DECIMAL" '
+            'expressionLanguage="SQL">'
+            '<formula>"REVENUE" * 1.2</formula></calculatedViewAttribute>') in pruned
+    assert "\n" not in pruned
+
+
+def test_keeps_non_default_mapping_types():
+    pruned = prune_calculation_view(read("union"))
+
+    assert '<mapping type="ConstantAttributeMapping" target="SOURCE" value="current" />' in pruned
+
+
+@pytest.mark.parametrize("name", ["projection_filter", "join_aggregation", "union"])
+def test_pruning_is_idempotent(name):
+    pruned = prune_calculation_view(read(name))
+
+    assert prune_calculation_view(pruned) == pruned
+
+
+def test_unparseable_view_is_returned_unchanged():
+    assert prune_calculation_view(b"<scenario><broken>") == "<scenario><broken>"
+
+
+def test_compact_element_prunes_a_copy():
+    root = ET.fromstring(read("rank"))
+    node = root.find("calculationViews/calculationView[@id='Projection_1']")
+
+    assert compact_element(node) == (
+        '<calculationView type="ProjectionView" id="Projection_1"><viewAttributes>'
+        '<viewAttribute id="ID" /><viewAttribute id="REGION" /><viewAttribute id="AMOUNT" />'
+        '</viewAttributes><input node="#Orders" /></calculationView>')
+    assert node.find("descriptions") is not None
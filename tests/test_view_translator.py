@@ -0,0 +1,99 @@
+import pathlib
+
+import pytest
+
+from app.services import migration_service
+from app.services.view_translator import (
+    UnsupportedViewError,
+    parse_calculation_view,
+    translate_calculation_view,
+)
+
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+
+def translate(name):
+    return translate_calculation_view((FIXTURES / f"{name}.calculationview").read_bytes())
+
+
+def test_projection_with_filter():
+    sql = translate("projection_filter")
+
+    assert sql.startswith('CREATE OR REPLACE PROCEDURE "CV_ORDERS"()\nRETURNS TABLE ()')
+    assert (
+        'CREATE OR REPLACE VIEW "CV_ORDERS_Projection_1" AS\n'
+        '    SELECT * FROM (SELECT "ID" AS "ORDER_ID", "REGION", "AMOUNT" '
+        'FROM "SALES"."my.pkg::Sales.Orders") t '
+        "WHERE \"REGION\" = 'EMEA' AND \"AMOUNT\" > 0;"
+    ) in sql
+    assert 'res := (SELECT "ORDER_ID", "REGION", "AMOUNT" FROM "CV_ORDERS_Projection_1");' in sql
+    assert sql.endswith("RETURN TABLE(res);\nEND;\n$$;")
+
+
+def test_join_feeding_an_aggregation_with_calculated_attributes():
+    sql = translate("join_aggregation")
+
+    assert sql.startswith('CREATE OR REPLACE PROCEDURE "Revenue_by_customer"()')
+    assert (
+        'CREATE OR REPLACE VIEW "Revenue_by_customer_Join_1" AS\n'
+        '    WITH "Join_1_cte" AS (\n'
+        '        SELECT l."CUSTOMER.ID" AS "CUSTOMER_ID", r."NAME" AS "NAME", '
+        'l."AMOUNT" AS "AMOUNT" FROM "SALES"."my.pkg::Sales.Orders" l '
+        'LEFT OUTER JOIN "SALES"."my.pkg::Sales.Customers" r ON l."CUSTOMER.ID" = r."ID"\n'
+        '    )\n'
+        '    SELECT * FROM "Join_1_cte";'
+    ) in sql
+    assert (
+        '        SELECT t.*, "REVENUE" * 1.2 AS "REVENUE_GROSS" FROM '
+        '(SELECT "NAME", SUM("AMOUNT") AS "REVENUE" FROM "Revenue_by_customer_Join_1" '
+        'GROUP BY "NAME") t\n'
+    ) in sql
+    # The aggregation reads the join's view, so it must be created after it.
+    assert sql.index('VIEW "Revenue_by_customer_Join_1"') < sql.index(
+        'VIEW "Revenue_by_customer_Aggregation_1"')
+    # The aggregation node's output is already aggregated.
+    assert (
+        'res := (SELECT "NAME", "REVENUE", "REVENUE_GROSS" '
+        'FROM "Revenue_by_customer_Aggregation_1");'
+    ) in sql
+
+
+def test_union_fills_unmapped_columns():
+    sql = translate("union")
+
+    assert (
+        '        SELECT "ID" AS "ORDER_ID", "AMOUNT", \'current\' AS "SOURCE" '
+        'FROM "SALES"."my.pkg::Sales.Orders" UNION ALL '
+        'SELECT "ORDER_NO" AS "ORDER_ID", NULL AS "AMOUNT", \'archive\' AS "SOURCE" '
+        'FROM "ARCHIVE"."ORDERS_2020"\n'
+    ) in sql
+    assert 'res := (SELECT "ORDER_ID", "AMOUNT", "SOURCE" FROM "CV_ALL_ORDERS_Union_1");' in sql
+
+
+def test_rank_view_is_not_translated_locally():
+    xml = (FIXTURES / "rank.calculationview").read_bytes()
+
+    with pytest.raises(UnsupportedViewError, match="RankView"):
+        translate_calculation_view(xml)
+    # The view itself is well formed; only the rank node needs the LLM.
+    nodes = parse_calculation_view(xml).nodes
+    assert {node_id: node.node_type for node_id, node in nodes.items()} == {
+        "Projection_1": "ProjectionView", "Rank_1": "RankView"}
+
+
+def test_rank_view_goes_to_the_llm(run, monkeypatch):
+    prompts = []
+
+    async def convert_view(xml):
+        prompts.append(xml)
+        return 'CREATE OR REPLACE PROCEDURE "CV_TOP_ORDERS"() RETURNS TABLE () AS $$ $$;'
+
+    monkeypatch.setattr(migration_service, "_convert_view", convert_view)
+    sql = run(migration_service.convert_view_into_snowflake(
+        (FIXTURES / "rank.calculationview").read_bytes()))
+
+    assert sql.startswith('CREATE OR REPLACE PROCEDURE "CV_TOP_ORDERS"()')
+    assert len(prompts) == 1
+    assert "RankView" in prompts[0]
+    assert "<layout" not in prompts[0]
@@ -0,0 +1,92 @@
+import asyncio
+
+import redis
+
+import app.worker as worker
+from app.services.job_queue import Job
+
+
+class FakeQueue:
+    visibility_timeout = 0.03
+
+    def __init__(self, extends):
+        self.extends = extends
+        self.calls = []
+
+    async def extend(self, job):
+        extends = self.extends.pop(0) if isinstance(self.extends, list) else self.extends
+        if isinstance(extends, Exception):
+            raise extends
+        return extends
+
+    async def ack(self, job):
+        self.calls.append("ack")
+
+    async def fail(self, job, error, retryable=True):
+        self.calls.append("fail")
+
+
+def run_job(monkeypatch, queue, convert):
+    monkeypatch.setattr(worker, "job_queue", queue)
+    monkeypatch.setattr(worker, "process_sap_hana_file", convert)
+    job = Job("f-1", {"file_uuid": "f-1", "s3_link": "s3://bucket/a.zip"}, attempts=1)
+    asyncio.run(asyncio.wait_for(worker.run_job(job), timeout=5))
+
+
+def test_job_is_cancelled_when_its_lease_is_lost(monkeypatch):
+    cancelled = []
+
+    async def convert(request):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(request.file_uuid)
+            raise
+
+    queue = FakeQueue(extends=False)
+    run_job(monkeypatch, queue, convert)
+    assert cancelled == ["f-1"]
+    assert queue.calls == []
+
+
+def test_job_is_acknowledged_while_it_holds_its_lease(monkeypatch):
+    async def convert(request):
+        await asyncio.sleep(0.1)
+
+    queue = FakeQueue(extends=True)
+    run_job(monkeypatch, queue, convert)
+    assert queue.calls == ["ack"]
+
+
+def test_failed_job_is_reported(monkeypatch):
+    async def convert(request):
+        raise RuntimeError("S3 unavailable")
+
+    queue = FakeQueue(extends=True)
+    run_job(monkeypatch, queue, convert)
+    assert queue.calls == ["fail"]
+
+
+def test_lease_is_retried_after_a_redis_error(monkeypatch):
+    async def convert(request):
+        await asyncio.sleep(0.1)
+
+    queue = FakeQueue(extends=[redis.ConnectionError("connection reset")] + [True] * 20)
+    run_job(monkeypatch, queue, convert)
+    assert queue.calls == ["ack"]
+
+
+def test_job_is_cancelled_when_redis_stays_unreachable(monkeypatch):
+    cancelled = []
+
+    async def convert(request):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(request.file_uuid)
+            raise
+
+    queue = FakeQueue(extends=redis.ConnectionError("connection reset"))
+    run_job(monkeypatch, queue, convert)
+    assert cancelled == ["f-1"]
+    assert queue.calls == []